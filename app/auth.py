@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-from .deps import get_db, current_user
+from .deps import get_db, current_principal, invalidate_token
 from .models import User
-from .security import hash_password, verify_password, make_session_token
+from .security import HashingBusy, hash_password_async, verify_password_async, make_session_token
 from .config import SESSION_COOKIE_NAME, SESSION_COOKIE_SECURE, SESSION_COOKIE_SAMESITE
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -16,23 +17,47 @@ class LoginIn(BaseModel):
     email: EmailStr
     password: str
 
+def _busy() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server busy, try again shortly.",
+                         headers={"Retry-After": "1"})
+
+def _credentials_for(db: Session, email: str):
+    try:
+        return db.query(User.id, User.password_hash).filter(User.email == email).first()
+    finally:
+        db.close()  # hand the pooled connection back before the slow hashing step
+
+def _insert_user(db: Session, email: str, password_hash: str) -> User:
+    u = User(email=email, password_hash=password_hash)
+    db.add(u); db.commit(); db.refresh(u)
+    return u
+
+# Async handlers: DB work goes to the request threadpool, PBKDF2 to the dedicated hashing pool,
+# so a login burst can't occupy every threadpool slot.
 @router.post("/register")
-def register(data: RegisterIn, db: Session = Depends(get_db)):
+async def register(data: RegisterIn, db: Session = Depends(get_db)):
     email = data.email.lower().strip()
     if len(data.password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters.")
-    existing = db.query(User).filter(User.email == email).first()
+    existing = await run_in_threadpool(_credentials_for, db, email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered.")
-    u = User(email=email, password_hash=hash_password(data.password))
-    db.add(u); db.commit(); db.refresh(u)
+    try:
+        password_hash = await hash_password_async(data.password)
+    except HashingBusy:
+        raise _busy()
+    u = await run_in_threadpool(_insert_user, db, email, password_hash)
     return {"id": u.id, "email": u.email}
 
 @router.post("/login")
-def login(data: LoginIn, response: Response, db: Session = Depends(get_db)):
+async def login(data: LoginIn, response: Response, db: Session = Depends(get_db)):
     email = data.email.lower().strip()
-    u = db.query(User).filter(User.email == email).first()
-    if not u or not verify_password(data.password, u.password_hash):
+    u = await run_in_threadpool(_credentials_for, db, email)
+    try:
+        ok = bool(u) and await verify_password_async(data.password, u.password_hash)
+    except HashingBusy:
+        raise _busy()
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     token = make_session_token(u.id)
     response.set_cookie(
@@ -46,6 +71,7 @@ def login(data: LoginIn, response: Response, db: Session = Depends(get_db)):
     return {"ok": True}
 
 @router.post("/logout")
-def logout(response: Response, user=Depends(current_user)):
+def logout(request: Request, response: Response, user=Depends(current_principal)):
+    invalidate_token(request.cookies.get(SESSION_COOKIE_NAME))
     response.delete_cookie(SESSION_COOKIE_NAME, path="/")
     return {"ok": True}
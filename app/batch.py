@@ -0,0 +1,153 @@
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from .config import PLAN_AVOID_RECENT, PLAN_BATCH_CHUNK, PLAN_BATCH_WORKERS
+from .etags import bump_user_version
+from .models import Plan, PlanRecipe, GroceryItem
+from .plan_view import NewPlan, store_new_snapshots
+from .planner import sample_week, merge_vectors, new_seed, plan_recipe_rows, grocery_rows, refresh_recipe_vectors
+from .queries import VectorRow, recipe_rows_by_user, setting_values_by_user, recent_plan_recipe_ids_by_user
+from .settings_service import CUISINE_CAPS
+
+# Batch plan generation: prefetch a slice of users' inputs in a few bulk queries, sample and
+# aggregate in worker processes (pure CPU, no DB access), then write each slice back in one
+# transaction with one executemany per table, plan snapshots included.
+
+class PlanJob(NamedTuple):
+    user_id: int
+    days: int = 7
+    seed: int | None = None
+    caps: Dict[str, int] | None = None  # None uses the user's saved caps
+    weights: Dict[int, float] | None = None  # per-recipe draw weights; None draws uniformly
+
+class PlanResult(NamedTuple):
+    user_id: int
+    plan_id: int | None  # None when the user had no recipes
+    seed: int
+
+class BatchStats:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.created = 0
+        self.skipped = 0
+        self.timings = {"prefetch": 0.0, "generate": 0.0, "write": 0.0}
+        self._t0 = time.perf_counter()
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self._t0
+        return {
+            "total": self.total, "done": self.done, "created": self.created, "skipped": self.skipped,
+            "elapsed_s": round(elapsed, 4),
+            "plans_per_s": round(self.created / elapsed, 1) if elapsed else 0.0,
+            **{f"{k}_s": round(v, 4) for k, v in self.timings.items()},
+        }
+
+def _caps_from(raw: str | None) -> Dict[str, int]:
+    # Same fallback as settings_service.get_cuisine_caps
+    try:
+        caps = json.loads(raw) if raw else None
+    except ValueError:
+        caps = None
+    return dict(caps) if isinstance(caps, dict) else {}
+
+def _build(task: Tuple[int, int, Dict[str, int], List[VectorRow], set, Dict[int, float] | None]) -> Tuple[List[int], Dict[tuple, dict]]:
+    # Runs in a worker process: everything it needs is in the task tuple
+    days, seed, caps, recipes, avoid, weights = task
+    chosen = sample_week(recipes, days, caps, random.Random(seed), weights, avoid=avoid)
+    agg = merge_vectors(json.loads(r.vector) for r in chosen if r.vector)
+    return [r.id for r in chosen], agg
+
+def _prefetch(db: Session, jobs: Sequence[PlanJob], avoid_recent: int):
+    user_ids = sorted({j.user_id for j in jobs})
+    recipes = recipe_rows_by_user(db, user_ids)
+    stale = [r.id for rows in recipes.values() for r in rows if r.vector is None]
+    if stale:
+        vectors = refresh_recipe_vectors(db, stale)
+        recipes = {uid: [r._replace(vector=json.dumps(vectors[r.id])) if r.vector is None else r for r in rows]
+                   for uid, rows in recipes.items()}
+    need_caps = [j.user_id for j in jobs if j.caps is None]
+    caps = setting_values_by_user(db, need_caps, CUISINE_CAPS) if need_caps else {}
+    recent = recent_plan_recipe_ids_by_user(db, user_ids, avoid_recent)
+    return recipes, caps, recent
+
+def _write(db: Session, jobs: Sequence[PlanJob], seeds: List[int], built: List[Tuple[List[int], Dict[tuple, dict]]],
+           has_recipes: List[bool]) -> List[int | None]:
+    # Like create_plan: only users without recipes are skipped; caps that leave nothing to
+    # pick still get their (empty) plan
+    todo = [i for i, ok in enumerate(has_recipes) if ok]
+    plan_ids: List[int | None] = [None] * len(jobs)
+    if todo:
+        # Plain RETURNING keeps SQLite's multi-row INSERT (sort_by_parameter_order would go row by row);
+        # rows are matched back by their column values, and identical rows are interchangeable
+        returned = db.execute(insert(Plan).returning(Plan.id, Plan.user_id, Plan.days, Plan.seed), [
+            {"user_id": jobs[i].user_id, "days": jobs[i].days, "locked": 1, "seed": seeds[i]} for i in todo
+        ]).all()
+        by_key: Dict[tuple, List[int]] = defaultdict(list)
+        for pid, uid, days, seed in sorted(returned, reverse=True):
+            by_key[(uid, days, seed)].append(pid)
+        recipe_rows, item_rows = [], []
+        for i in todo:
+            pid = by_key[(jobs[i].user_id, jobs[i].days, seeds[i])].pop()
+            plan_ids[i] = pid
+            ids, agg = built[i]
+            recipe_rows += plan_recipe_rows(pid, ids)
+            item_rows += grocery_rows(pid, agg)
+        if recipe_rows:
+            db.execute(insert(PlanRecipe), recipe_rows)
+        if item_rows:
+            db.execute(insert(GroceryItem), item_rows)
+        store_new_snapshots(db, [NewPlan(plan_ids[i], jobs[i].days, seeds[i], built[i][0]) for i in todo])
+        bump_user_version(db, *{jobs[i].user_id for i in todo})
+    db.commit()
+    return plan_ids
+
+def _chunks(seq: Sequence, size: int) -> Iterator[Sequence]:
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+def generate_plans(db: Session, jobs: Sequence[PlanJob], workers: int | None = None, chunk_size: int | None = None,
+                   avoid_recent: int | None = None,
+                   progress: Callable[[dict], None] | None = None) -> Tuple[List[PlanResult], dict]:
+    workers = PLAN_BATCH_WORKERS if workers is None else workers
+    chunk_size = chunk_size or PLAN_BATCH_CHUNK
+    avoid_recent = PLAN_AVOID_RECENT if avoid_recent is None else avoid_recent
+    stats = BatchStats(len(jobs))
+    results: List[PlanResult] = []
+    # workers <= 1 samples inline; forking is pure overhead on a single core
+    pool: Executor | None = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        for chunk in _chunks(jobs, chunk_size):
+            t0 = time.perf_counter()
+            recipes, caps, recent = _prefetch(db, chunk, avoid_recent)
+            seeds = [new_seed() if j.seed is None else j.seed for j in chunk]
+            tasks = [(j.days, seed, j.caps if j.caps is not None else _caps_from(caps.get(j.user_id)),
+                      recipes[j.user_id], recent[j.user_id], j.weights) for j, seed in zip(chunk, seeds)]
+            t1 = time.perf_counter()
+            if pool is None:
+                built = [_build(t) for t in tasks]
+            else:
+                built = list(pool.map(_build, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+            t2 = time.perf_counter()
+            plan_ids = _write(db, chunk, seeds, built, [bool(recipes[j.user_id]) for j in chunk])
+            t3 = time.perf_counter()
+
+            stats.timings["prefetch"] += t1 - t0
+            stats.timings["generate"] += t2 - t1
+            stats.timings["write"] += t3 - t2
+            for j, seed, pid in zip(chunk, seeds, plan_ids):
+                results.append(PlanResult(j.user_id, pid, seed))
+            stats.done += len(chunk)
+            stats.created += sum(pid is not None for pid in plan_ids)
+            stats.skipped = stats.done - stats.created
+            if progress:
+                progress(stats.as_dict())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results, stats.as_dict()
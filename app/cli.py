@@ -0,0 +1,228 @@
+import argparse
+import json
+import sys
+import time
+
+# Maintenance entry point: python -m app.cli <command> [options]
+# Only argparse/json load up front. models/database/planner (and with them SQLAlchemy and the
+# engine) are imported inside each command, so --help and usage errors start fast, and nothing
+# here pulls in FastAPI or runs app.main's import-time side effects.
+
+SEED_CUISINES = ["Mexican", "Asian", "Italian", "Indian", "American", "Thai", "French", "Greek"]
+SEED_UNITS = ["g", "kg", "cup", "tbsp", "tsp", "pcs", "ml", "lb", "oz"]
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+def _log(msg: str) -> None:
+    print(msg, file=sys.stderr, flush=True)
+
+def cmd_seed(args) -> dict:
+    import random
+    from sqlalchemy import func, insert, select
+    from .database import SessionLocal, engine
+    from .migrations import migrate
+    from .models import User, Recipe, RecipeIngredient
+    from .planner import refresh_recipe_vectors
+    from .queries import resolve_ingredients
+    from .search import refresh_recipe_search
+    from .security import hash_password
+
+    migrate(engine)
+    rng = random.Random(args.seed)
+    password_hash = hash_password(args.password)  # one PBKDF2 run shared by every synthetic user
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        offset = db.scalar(select(func.max(User.id))) or 0
+        ingredient_ids = list(resolve_ingredients(db, [f"{args.prefix} ingredient {i}" for i in range(args.ingredients)]).values())
+        db.commit()
+        items = min(args.items, len(ingredient_ids))
+        users = [f"{args.prefix}{offset + i}@example.com" for i in range(args.users)]
+        for n, emails in enumerate(_chunks(users, args.chunk)):
+            user_ids = db.scalars(insert(User).returning(User.id), [
+                {"email": e, "password_hash": password_hash} for e in emails]).all()
+            db.execute(insert(Recipe), [
+                {"user_id": uid, "name": f"Recipe {i}", "cuisine": rng.choice(SEED_CUISINES), "notes": ""}
+                for uid in user_ids for i in range(args.recipes)
+            ])
+            recipe_ids = db.scalars(select(Recipe.id).where(Recipe.user_id.in_(user_ids))).all()
+            if items:
+                db.execute(insert(RecipeIngredient), [
+                    {"recipe_id": rid, "ingredient_id": iid, "quantity": rng.randint(1, 40) / 4, "unit": rng.choice(SEED_UNITS)}
+                    for rid in recipe_ids for iid in rng.sample(ingredient_ids, items)
+                ])
+                refresh_recipe_vectors(db, recipe_ids)
+            refresh_recipe_search(db, recipe_ids)
+            db.commit()
+            _log(f"seed: {min((n + 1) * args.chunk, len(users))}/{len(users)} users")
+    return {"users": args.users, "recipes": args.users * args.recipes, "ingredients": len(ingredient_ids),
+            "elapsed_s": round(time.perf_counter() - t0, 3)}
+
+def cmd_migrate(args) -> dict:
+    from .database import engine
+    from .migrations import LATEST, current_version, migrate
+
+    if args.status:
+        with engine.connect() as conn:
+            return {"version": current_version(conn), "latest": LATEST}
+    t0 = time.perf_counter()
+    applied = migrate(engine)
+    return {"applied": applied, "version": LATEST, "elapsed_s": round(time.perf_counter() - t0, 3)}
+
+def cmd_plans(args) -> dict:
+    from sqlalchemy import select
+    from .batch import PlanJob, generate_plans
+    from .database import SessionLocal
+    from .models import User
+
+    with SessionLocal() as db:
+        if args.users:
+            user_ids = [int(x) for x in args.users.split(",")]
+        else:
+            user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+        jobs = [PlanJob(uid, args.days) for uid in user_ids]
+        caps = json.loads(args.caps) if args.caps else None
+        if caps is not None:
+            jobs = [j._replace(caps=caps) for j in jobs]
+
+        def progress(stats: dict) -> None:
+            _log(f"plans: {stats['done']}/{stats['total']} ({stats['plans_per_s']} plans/s)")
+
+        _, stats = generate_plans(db, jobs, workers=args.workers, chunk_size=args.chunk,
+                                  avoid_recent=args.avoid_recent, progress=progress)
+    return stats
+
+def cmd_prune(args) -> dict:
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import delete, func, select
+    from .database import SessionLocal
+    from .models import Plan, PlanRecipe, GroceryItem
+
+    # Latest --keep plans per user always survive; --older-than narrows what else is removed.
+    # Children are deleted explicitly: SQLite only honours ON DELETE CASCADE with foreign_keys=ON.
+    ranked = select(Plan.id, Plan.created_at,
+                    func.row_number().over(partition_by=Plan.user_id, order_by=Plan.id.desc()).label("rn")).subquery()
+    stmt = select(ranked.c.id).where(ranked.c.rn > args.keep)
+    if args.older_than is not None:
+        # created_at comes from CURRENT_TIMESTAMP, i.e. naive UTC
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=args.older_than)
+        stmt = stmt.where(ranked.c.created_at < cutoff)
+    removed = {"plans": 0, "plan_recipes": 0, "grocery_items": 0}
+    with SessionLocal() as db:
+        plan_ids = db.scalars(stmt.order_by(ranked.c.id)).all()
+        if args.dry_run:
+            return {"would_remove_plans": len(plan_ids)}
+        for ids in _chunks(plan_ids, args.chunk):
+            removed["grocery_items"] += db.execute(delete(GroceryItem).where(GroceryItem.plan_id.in_(ids))).rowcount
+            removed["plan_recipes"] += db.execute(delete(PlanRecipe).where(PlanRecipe.plan_id.in_(ids))).rowcount
+            removed["plans"] += db.execute(delete(Plan).where(Plan.id.in_(ids))).rowcount
+            db.commit()
+    return removed
+
+def cmd_rebuild_search(args) -> dict:
+    from .database import engine
+    from .search import rebuild_search
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        indexed = rebuild_search(conn)
+    return {"indexed": indexed, "elapsed_s": round(time.perf_counter() - t0, 3)}
+
+def _sqlite_file_size(engine):
+    import os
+    db = engine.url.database
+    return os.path.getsize(db) if db and db != ":memory:" and os.path.exists(db) else None
+
+def cmd_vacuum(args) -> dict:
+    from sqlalchemy import text
+    from .database import engine
+
+    before = _sqlite_file_size(engine)
+    t0 = time.perf_counter()
+    # VACUUM can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    return {"bytes_before": before, "bytes_after": _sqlite_file_size(engine), "elapsed_s": round(time.perf_counter() - t0, 3)}
+
+def cmd_analyze(args) -> dict:
+    from sqlalchemy import text
+    from .database import engine
+
+    t0 = time.perf_counter()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA optimize"))
+    return {"elapsed_s": round(time.perf_counter() - t0, 3)}
+
+def cmd_stats(args) -> dict:
+    from sqlalchemy import func, select, text
+    from .database import Base, engine
+    from . import models
+
+    out: dict = {"url": engine.url.render_as_string(hide_password=True), "tables": {}}
+    with engine.connect() as conn:
+        for table in Base.metadata.sorted_tables:
+            out["tables"][table.name] = conn.scalar(select(func.count()).select_from(table))
+        per_user = select(func.count().label("n")).select_from(models.Plan).group_by(models.Plan.user_id).subquery()
+        avg, most = conn.execute(select(func.avg(per_user.c.n), func.max(per_user.c.n))).one()
+        out["plans_per_user"] = {"avg": round(avg or 0, 2), "max": most or 0}
+        if engine.dialect.name == "sqlite":
+            out["sqlite"] = {p: conn.scalar(text(f"PRAGMA {p}")) for p in ("page_size", "page_count", "freelist_count", "journal_mode")}
+            out["sqlite"]["file_bytes"] = _sqlite_file_size(engine)
+    return out
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Family Meal Planner maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="apply pending schema migrations")
+    p.add_argument("--status", action="store_true", help="only report the current version")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("seed", help="insert synthetic users, recipes and ingredients")
+    p.add_argument("--users", type=int, default=100)
+    p.add_argument("--recipes", type=int, default=30, help="recipes per user")
+    p.add_argument("--ingredients", type=int, default=500)
+    p.add_argument("--items", type=int, default=8, help="ingredients per recipe")
+    p.add_argument("--prefix", default="synthetic", help="email / ingredient name prefix")
+    p.add_argument("--password", default="SuperSecret1")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--chunk", type=int, default=500, help="users per transaction")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("plans", help="generate plans for many users (app.batch)")
+    p.add_argument("--users", help="comma-separated user ids (default: all)")
+    p.add_argument("--days", type=int, default=7)
+    p.add_argument("--caps", help="JSON cuisine caps overriding each user's saved caps")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--chunk", type=int, default=None)
+    p.add_argument("--avoid-recent", type=int, default=None)
+    p.set_defaults(func=cmd_plans)
+
+    p = sub.add_parser("prune", help="delete old plans, keeping each user's latest")
+    p.add_argument("--keep", type=int, default=4)
+    p.add_argument("--older-than", type=float, default=None, metavar="DAYS")
+    p.add_argument("--chunk", type=int, default=500)
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_prune)
+
+    sub.add_parser("rebuild-search", help="repopulate the recipe full-text index").set_defaults(func=cmd_rebuild_search)
+    sub.add_parser("vacuum", help="rebuild the database file").set_defaults(func=cmd_vacuum)
+    sub.add_parser("analyze", help="refresh planner statistics").set_defaults(func=cmd_analyze)
+    sub.add_parser("stats", help="row counts and storage figures").set_defaults(func=cmd_stats)
+    return parser
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "plans" and not 1 <= args.days <= 14:
+        parser.error("--days must be between 1 and 14")
+    print(json.dumps(args.func(args), indent=2, default=str))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,3 +8,59 @@ SESSION_COOKIE_SAMESITE = os.getenv("SESSION_COOKIE_SAMESITE", "lax")  # "lax" |
 
 # Local default uses a file in the repo; Docker will set /data path
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mealplanner.db")
+
+# In-process read-through cache for per-user settings (entries, seconds)
+SETTINGS_CACHE_SIZE = int(os.getenv("SETTINGS_CACHE_SIZE", "4096"))
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "300"))
+
+# Verified session token -> (user id, email); bounds how long a deleted user stays signed in elsewhere
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+
+# Password hashing: PBKDF2 rounds (blank = passlib default) and the dedicated worker pool
+# that keeps hashing off the request threadpool. Requests beyond workers + queue get a 503.
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS") or 0) or None
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+# SQLite tuning, applied as PRAGMAs on every new connection (ignored for other databases)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # negative = KiB
+
+# Connection pool (file databases); in-memory SQLite always shares one connection
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Opt-in async DB stack for the JSON API (needs an async driver, e.g. aiosqlite for SQLite).
+# ASYNC_DATABASE_URL defaults to DATABASE_URL with the matching async driver swapped in.
+ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() == "true"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+# Plan generation: recipes used on the user's last N plans are only picked once fresh ones run out
+PLAN_AVOID_RECENT = int(os.getenv("PLAN_AVOID_RECENT", "2"))
+
+# Keep each plan's rendered view as JSON on the plan row so reading it is one primary-key lookup
+PLAN_SNAPSHOTS = os.getenv("PLAN_SNAPSHOTS", "true").lower() == "true"
+
+# Batch plan generation (app.batch): worker processes for sampling (<= 1 runs inline) and plans per write transaction
+PLAN_BATCH_WORKERS = int(os.getenv("PLAN_BATCH_WORKERS", str(os.cpu_count() or 1)))
+PLAN_BATCH_CHUNK = int(os.getenv("PLAN_BATCH_CHUNK", "500"))
+
+# Apply pending schema migrations when the app starts. Turn off when a deploy step runs
+# `python -m app.cli migrate` before the workers boot.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+
+# Request/SQL instrumentation and the Prometheus /metrics endpoint; statements slower than
+# SLOW_QUERY_MS are logged (logger "app.metrics") and counted
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Plan event streams (GET /plans/{pid}/events): events buffered per subscriber before it is
+# dropped as too slow, and the keep-alive interval for idle streams
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "64"))
+SSE_PING_SECONDS = float(os.getenv("SSE_PING_SECONDS", "15"))
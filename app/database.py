@@ -1,11 +1,45 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
-from .config import DATABASE_URL
+from sqlalchemy.pool import QueuePool, StaticPool
+from .config import (
+    DATABASE_URL, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+)
+
+def sqlite_pragmas() -> list[str]:
+    return [
+        f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+    ]
+
+def make_engine(url: str = DATABASE_URL, tuned: bool = True) -> Engine:
+    u = make_url(url)
+    if u.get_backend_name() != "sqlite":
+        return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                             pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
+    if u.database in (None, "", ":memory:"):
+        # Every connection to :memory: is a new empty database, so all sessions share one
+        eng = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        # A queue of long-lived connections keeps per-connection pragmas and page cache warm
+        eng = create_engine(url, connect_args=connect_args, poolclass=QueuePool, pool_size=DB_POOL_SIZE,
+                            max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    if tuned:
+        event.listen(eng, "connect", apply_sqlite_pragmas)
+    return eng
+
+def apply_sqlite_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    for stmt in sqlite_pragmas():
+        cur.execute(stmt)
+    cur.close()
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
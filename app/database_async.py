@@ -0,0 +1,42 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from .config import DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, METRICS_ENABLED
+from .database import apply_sqlite_pragmas
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+def async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if u.get_driver_name() in ASYNC_DRIVERS.values():
+        return url
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend!r}; set ASYNC_DATABASE_URL")
+    return u.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+_engine = None
+_sessionmaker = None
+
+def get_async_engine():
+    # Built on first use so the async driver stays an optional dependency of the sync app
+    global _engine
+    if _engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        url = ASYNC_DATABASE_URL or async_url(DATABASE_URL)
+        if make_url(url).get_backend_name() == "sqlite":
+            _engine = create_async_engine(url)
+            event.listen(_engine.sync_engine, "connect", apply_sqlite_pragmas)
+        else:
+            _engine = create_async_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                                          pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+        if METRICS_ENABLED:
+            from .metrics import instrument_engine
+            instrument_engine(_engine.sync_engine)
+    return _engine
+
+def get_async_sessionmaker():
+    global _sessionmaker
+    if _sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _sessionmaker = async_sessionmaker(get_async_engine(), expire_on_commit=False, autoflush=False)
+    return _sessionmaker
@@ -1,10 +1,20 @@
+from typing import NamedTuple
 from fastapi import Depends, HTTPException, status, Request
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session
+from .cache import TTLCache, MISSING
 from .database import SessionLocal
 from .models import User
-from .config import SESSION_COOKIE_NAME
+from .config import SESSION_COOKIE_NAME, AUTH_CACHE_SIZE, AUTH_CACHE_TTL
 from .security import read_session_token
 
+class Principal(NamedTuple):
+    id: int
+    email: str
+
+# Session token -> Principal (or None for tokens whose user no longer exists)
+principal_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -12,14 +22,61 @@ def get_db():
     finally:
         db.close()
 
-def current_user_optional(request: Request, db: Session = Depends(get_db)) -> User | None:
+async def get_async_db():
+    from .database_async import get_async_sessionmaker
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+def invalidate_token(token: str | None) -> None:
+    if token:
+        principal_cache.pop(token)
+
+def invalidate_user(user_id: int) -> None:
+    principal_cache.discard_if(lambda _, p: p is not None and p.id == user_id)
+
+@event.listens_for(User, "after_delete")
+def _forget_deleted_user(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
+def current_principal_optional(request: Request, db: Session = Depends(get_db)) -> Principal | None:
     token = request.cookies.get(SESSION_COOKIE_NAME)
     if not token:
         return None
-    uid = read_session_token(token)
-    if not uid:
+    principal = principal_cache.get(token)
+    if principal is MISSING:
+        uid = read_session_token(token)
+        if not uid:
+            return None  # forged tokens are not cached, so they can't flood the cache
+        row = db.query(User.id, User.email).filter(User.id == uid).first()
+        principal = Principal(*row) if row else None
+        principal_cache.set(token, principal)
+    return principal
+
+def current_principal(request: Request, db: Session = Depends(get_db)) -> Principal:
+    principal = current_principal_optional(request, db)
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return principal
+
+async def current_principal_async(request: Request, db=Depends(get_async_db)) -> Principal:
+    token = request.cookies.get(SESSION_COOKIE_NAME)
+    principal = principal_cache.get(token) if token else None
+    if principal is MISSING:
+        principal = None
+        uid = read_session_token(token)
+        if uid:
+            row = (await db.execute(select(User.id, User.email).where(User.id == uid))).first()
+            principal = Principal(*row) if row else None
+            principal_cache.set(token, principal)
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    return principal
+
+def current_user_optional(request: Request, db: Session = Depends(get_db)) -> User | None:
+    principal = current_principal_optional(request, db)
+    if not principal:
         return None
-    return db.get(User, uid)
+    return db.get(User, principal.id)
 
 def current_user(request: Request, db: Session = Depends(get_db)) -> User:
     user = current_user_optional(request, db)
@@ -0,0 +1,32 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from .models import User, Plan
+
+# Version stamps behind the ETags on GET /recipes and GET /plans/{pid}. users.version moves on
+# every recipe write and plan generation; plans.version on every change to one plan (toggles,
+# swaps, rerolls). Both live in the database, so every worker agrees on them, and checking one
+# is a single primary-key read instead of the listing queries.
+
+def bump_user_version(db: Session, *user_ids: int) -> None:
+    db.execute(update(User).where(User.id.in_(user_ids)).values(version=User.version + 1)
+               .execution_options(synchronize_session=False))
+
+def bump_plan_version(plan: Plan) -> None:
+    # Evaluated in SQL at flush, so concurrent bumps don't collide; called after the snapshot is
+    # patched, it rides along in the same UPDATE of the plan row
+    plan.version = Plan.version + 1
+
+def bump_plan_versions(db: Session, *plan_ids: int) -> None:
+    db.execute(update(Plan).where(Plan.id.in_(plan_ids)).values(version=Plan.version + 1)
+               .execution_options(synchronize_session=False))
+
+def make_etag(*parts) -> str:
+    return '"' + ".".join(str(p) for p in parts) + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2), so W/"x" matches "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
@@ -0,0 +1,90 @@
+import asyncio
+import itertools
+import json
+import threading
+from typing import Any, Dict, Hashable, Set
+from .config import SSE_QUEUE_SIZE
+
+# In-process pub/sub behind GET /plans/{pid}/events. Publishers never wait: each subscriber has
+# a bounded queue, and one that falls a full queue behind is dropped (it gets a final "dropped"
+# event and the client reconnects and refetches) so a stalled phone can't hold memory or slow a
+# toggle down. Per process, like the caches: with several workers a client only hears about
+# writes that landed on its own worker.
+
+class Subscription:
+    __slots__ = ("topic", "queue", "dropped")
+
+    def __init__(self, topic: Hashable, size: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+        self.dropped = False
+
+class EventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._topics: Dict[Hashable, Set[Subscription]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: Hashable) -> Subscription:
+        # Event loop only, like everything that touches the subscriber sets. Changes to them
+        # also hold the lock so stats() can read them from a /metrics threadpool worker.
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(topic, self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._topics.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[sub.topic]
+
+    def publish(self, topic: Hashable, event: str, data: Any) -> None:
+        # Safe from request threadpool workers (sync handlers) as well as the loop. Call after
+        # the commit, so listeners never see a write that could still roll back.
+        if topic not in self._topics:
+            return
+        with self._lock:
+            message = (next(self._ids), event, json.dumps(data))
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._deliver(topic, message)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, topic, message)
+
+    def _deliver(self, topic: Hashable, message: tuple) -> None:
+        self.published += 1
+        for sub in list(self._topics.get(topic, ())):
+            try:
+                sub.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(sub)
+
+    def _drop(self, sub: Subscription) -> None:
+        self.unsubscribe(sub)
+        self.dropped += 1
+        sub.dropped = True
+        # Whatever it hadn't read is stale now; make room for the goodbye
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"topics": len(self._topics), "subscribers": sum(len(s) for s in self._topics.values()),
+                    "published": self.published, "dropped": self.dropped}
+
+hub = EventHub(SSE_QUEUE_SIZE)
+
+def plan_topic(plan_id: int) -> tuple:
+    return ("plan", plan_id)
@@ -1,27 +1,49 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
-from fastapi.responses import JSONResponse
-from .database import Base, engine
-from .models import User
-from .deps import current_user
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .config import ASYNC_DB, AUTO_MIGRATE, METRICS_ENABLED
+from .database import engine
+from .deps import Principal, current_principal
 from .auth import router as auth_router
 from .routers.recipes import router as recipes_router
 from .routers.settings import router as settings_router
 from .routers.plans import router as plans_router
 from .routers.grocery import router as grocery_router
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Schema changes run here (or via `python -m app.cli migrate`), never at import time
+    if AUTO_MIGRATE:
+        from .migrations import migrate
+        migrate(engine)
+    yield
 
-app = FastAPI(title="Family Meal Planner", version="0.2.0")
+app = FastAPI(title="Family Meal Planner", version="0.2.0", lifespan=lifespan)
 
 @app.get("/health")
 def health():
     return JSONResponse({"status": "ok"})
 
+if METRICS_ENABLED:
+    from . import deps, events, metrics, settings_service
+    metrics.instrument_engine(engine)
+    metrics.register_collector("fmp_cache", "In-process cache stats", lambda: {
+        "settings": settings_service.cache.stats(), "principal": deps.principal_cache.stats()})
+    metrics.register_collector("fmp_events", "Plan event hub stats", lambda: {"plans": events.hub.stats()})
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/me")
-def me(user: User = Depends(current_user)):
+def me(user: Principal = Depends(current_principal)):
     return {"id": user.id, "email": user.email}
 
 # mount routers
+if ASYNC_DB:
+    from .routers.async_routes import router as async_router
+    app.include_router(async_router)
 app.include_router(auth_router)
 app.include_router(recipes_router)
 app.include_router(settings_router)
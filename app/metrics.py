@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .config import SLOW_QUERY_MS
+
+# In-process request/DB instrumentation rendered as Prometheus text at /metrics. Per-worker
+# numbers: scrape each worker (or run one) rather than expecting them to be aggregated here.
+
+logger = logging.getLogger("app.metrics")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v:g}" for k, v in items]
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Histogram:
+    # Cumulative buckets are only built at render time; observe() bumps one slot
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def count(self, labels: tuple = ()) -> int:
+        s = self._series.get(labels)
+        return s[2] if s else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, n) in items:
+            running = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {n}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+REQUEST_LATENCY = Histogram("fmp_http_request_duration_seconds", "HTTP request latency by route template.",
+                            ("method", "route", "status"))
+REQUEST_QUERIES = Histogram("fmp_http_request_db_queries", "SQL statements executed per HTTP request.",
+                            ("method", "route"), QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram("fmp_http_request_db_seconds", "Time spent in SQL per HTTP request.", ("method", "route"))
+DB_QUERIES = Counter("fmp_db_queries_total", "SQL statements executed.")
+DB_TIME = Counter("fmp_db_query_seconds_total", "Time spent executing SQL statements.")
+SLOW_QUERIES = Counter("fmp_db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS.")
+METRICS = [REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, DB_QUERIES, DB_TIME, SLOW_QUERIES]
+
+# Extra gauge sources: name -> callable returning {label value: {field: number}} (see cache stats)
+_collectors: Dict[str, Tuple[str, Callable[[], Dict[str, dict]]]] = {}
+
+def register_collector(name: str, help: str, fn: Callable[[], Dict[str, dict]]) -> None:
+    _collectors[name] = (help, fn)
+
+# ---------- Per-request DB accounting ----------
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+# Set by the middleware; Starlette copies the context into threadpool workers, and the object is
+# shared (not copied), so sync handlers' queries land on the request that issued them
+current_request: ContextVar[RequestStats | None] = ContextVar("fmp_request_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._fmp_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._fmp_started
+    DB_QUERIES.inc()
+    DB_TIME.inc(amount=elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        logger.warning("slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:1000])
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+# ---------- ASGI middleware ----------
+
+class MetricsMiddleware:
+    # Pure ASGI (no BaseHTTPMiddleware) so streaming responses pass through untouched. Routes are
+    # labelled by their template ("/plans/{pid}") to keep the series count bounded.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                message["headers"] = list(message.get("headers", [])) + [(
+                    b"server-timing",
+                    f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", app;dur={elapsed:.2f}'.encode(),
+                )]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.observe(time.perf_counter() - started, (method, path, str(status)))
+            REQUEST_QUERIES.observe(stats.queries, (method, path))
+            REQUEST_DB_TIME.observe(stats.db_time, (method, path))
+
+def render() -> str:
+    lines: List[str] = []
+    for m in METRICS:
+        lines += m.render()
+    for name, (help, fn) in sorted(_collectors.items()):
+        series = fn()
+        fields = sorted({f for values in series.values() for f in values})
+        for field in fields:
+            metric = f"{name}_{field}"
+            lines += [f"# HELP {metric} {help} ({field})", f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{name="{_escape(label)}"}} {values[field]:g}'
+                      for label, values in sorted(series.items()) if field in values]
+    return "\n".join(lines) + "\n"
+
+def reset() -> None:
+    for m in METRICS:
+        m.clear()
@@ -0,0 +1,164 @@
+import contextlib
+import time
+from typing import Callable, Iterator, List, NamedTuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from .database import Base
+from . import models  # noqa: F401  (registers every table on Base.metadata)
+from .search import rebuild_search
+
+# Versioned schema migrations, run once per deploy (python -m app.cli migrate) or at app startup
+# (AUTO_MIGRATE) instead of create_all on every import. A fresh database gets create_all and is
+# stamped with the latest version; a database that predates this table is treated as version 1
+# (the original schema) and brought forward step by step. Steps check what already exists, so
+# databases created by create_all from any earlier revision upgrade cleanly too.
+
+VERSION_TABLE = "schema_migrations"
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if column not in _columns(conn, table):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+def _create_index(conn: Connection, name: str, table: str, columns: List[str], unique: bool = False) -> None:
+    conn.exec_driver_sql(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+def _baseline(conn: Connection) -> None:
+    pass
+
+def _ingredient_name_normalized(conn: Connection) -> None:
+    _add_column(conn, "ingredients", "name_normalized", "VARCHAR(255)")
+    # Old rows may differ only by case/whitespace ("Salt" vs "salt "). Fold each group onto its
+    # lowest id before the unique index goes on; a recipe that linked both keeps the first link.
+    conn.exec_driver_sql("""
+        CREATE TEMP TABLE ingredient_merge AS
+        SELECT i.id AS old_id, k.keep_id AS new_id
+        FROM ingredients i
+        JOIN (SELECT lower(trim(name)) AS norm, min(id) AS keep_id FROM ingredients GROUP BY lower(trim(name))) k
+          ON k.norm = lower(trim(i.name))
+        WHERE i.id != k.keep_id
+    """)
+    if conn.exec_driver_sql("SELECT count(*) FROM ingredient_merge").scalar():
+        conn.exec_driver_sql("""
+        DELETE FROM recipe_ingredients
+        WHERE id NOT IN (SELECT min(ri.id) FROM recipe_ingredients ri
+                         LEFT JOIN ingredient_merge m ON m.old_id = ri.ingredient_id
+                         GROUP BY ri.recipe_id, coalesce(m.new_id, ri.ingredient_id))
+        """)
+        conn.exec_driver_sql("""
+        UPDATE recipe_ingredients
+        SET ingredient_id = (SELECT new_id FROM ingredient_merge WHERE old_id = recipe_ingredients.ingredient_id)
+        WHERE ingredient_id IN (SELECT old_id FROM ingredient_merge)
+        """)
+        conn.exec_driver_sql("DELETE FROM ingredients WHERE id IN (SELECT old_id FROM ingredient_merge)")
+    conn.exec_driver_sql("DROP TABLE ingredient_merge")
+    conn.exec_driver_sql("UPDATE ingredients SET name_normalized = lower(trim(name)) WHERE name_normalized IS NULL OR name_normalized != lower(trim(name))")
+    _create_index(conn, "ix_ingredients_name_normalized", "ingredients", ["name_normalized"], unique=True)
+
+def _recipe_ingredient_vector(conn: Connection) -> None:
+    # Left NULL: planner.load_recipe_vectors backfills rows the first time they're planned
+    _add_column(conn, "recipes", "ingredient_vector", "TEXT")
+
+def _recipe_listing_index(conn: Connection) -> None:
+    _create_index(conn, "ix_recipes_user_cuisine_name", "recipes", ["user_id", "cuisine", "name", "id"])
+
+def _plan_seed_and_recent_index(conn: Connection) -> None:
+    _add_column(conn, "plans", "seed", "INTEGER")
+    _create_index(conn, "ix_plans_user_id_id", "plans", ["user_id", "id"])
+
+def _grocery_name_index(conn: Connection) -> None:
+    _create_index(conn, "ix_grocery_items_plan_name", "grocery_items", ["plan_id", "name"])
+
+def _plan_snapshot(conn: Connection) -> None:
+    # Left NULL: plan_view builds and stores it on first read
+    _add_column(conn, "plans", "snapshot", "TEXT")
+
+def _version_stamps(conn: Connection) -> None:
+    _add_column(conn, "users", "version", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "plans", "version", "INTEGER NOT NULL DEFAULT 0")
+
+def _vector_unit_factors(conn: Connection) -> None:
+    # Vector lines gained their unit group and factor; old ones are rebuilt lazily, like new rows
+    conn.exec_driver_sql("UPDATE recipes SET ingredient_vector = NULL WHERE ingredient_vector IS NOT NULL")
+
+def _recipe_search(conn: Connection) -> None:
+    rebuild_search(conn)
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "ingredient_name_normalized", _ingredient_name_normalized),
+    Migration(3, "recipe_ingredient_vector", _recipe_ingredient_vector),
+    Migration(4, "recipe_listing_index", _recipe_listing_index),
+    Migration(5, "plan_seed_and_recent_index", _plan_seed_and_recent_index),
+    Migration(6, "grocery_name_index", _grocery_name_index),
+    Migration(7, "plan_snapshot", _plan_snapshot),
+    Migration(8, "version_stamps", _version_stamps),
+    Migration(9, "recipe_search", _recipe_search),
+    Migration(10, "vector_unit_factors", _vector_unit_factors),
+]
+LATEST = MIGRATIONS[-1].version
+
+@contextlib.contextmanager
+def _locked(engine: Engine) -> Iterator[Connection]:
+    # One transaction for the whole run. On SQLite, BEGIN IMMEDIATE takes the write lock up front so
+    # workers booting together queue behind each other (busy_timeout) instead of racing the DDL;
+    # the driver's own transaction handling is bypassed because it would commit around DDL.
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+        else:
+            with conn.begin():
+                yield conn
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} "
+                         "(version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at FLOAT NOT NULL)")
+
+def _stamp(conn: Connection, m: Migration) -> None:
+    conn.execute(text(f"INSERT INTO {VERSION_TABLE} (version, name, applied_at) VALUES (:v, :n, :t)"),
+                 {"v": m.version, "n": m.name, "t": time.time()})
+
+def current_version(conn: Connection) -> int | None:
+    if not inspect(conn).has_table(VERSION_TABLE):
+        return None
+    return conn.exec_driver_sql(f"SELECT max(version) FROM {VERSION_TABLE}").scalar() or 0
+
+def migrate(engine: Engine) -> List[str]:
+    # Returns the names of the steps applied (empty when already current)
+    with engine.connect() as conn:
+        if current_version(conn) == LATEST:
+            return []  # the common boot path: one catalog lookup and one SELECT
+    applied: List[str] = []
+    with _locked(engine) as conn:
+        version = current_version(conn)
+        if version is None:
+            fresh = not inspect(conn).has_table("users")
+            _ensure_version_table(conn)
+            if fresh:
+                Base.metadata.create_all(bind=conn)
+                for m in MIGRATIONS:
+                    _stamp(conn, m)
+                return ["create_all"]
+            _stamp(conn, MIGRATIONS[0])
+            version = MIGRATIONS[0].version
+        for m in MIGRATIONS:
+            if m.version > version:
+                m.apply(conn)
+                _stamp(conn, m)
+                applied.append(m.name)
+    return applied
@@ -1,13 +1,18 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DateTime, func, ForeignKey, Float, UniqueConstraint
+from sqlalchemy import DDL, Integer, String, DateTime, event, func, ForeignKey, Float, Text, UniqueConstraint, Index
 from .database import Base
 
+def normalize_ingredient_name(name: str) -> str:
+    return (name or "").strip().lower()
+
 class User(Base):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     password_hash: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Bumped by recipe writes and plan generation; see app.etags
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     recipes = relationship("Recipe", back_populates="owner", cascade="all, delete-orphan")
     settings = relationship("Setting", back_populates="owner", cascade="all, delete-orphan")
@@ -18,6 +23,11 @@ class Ingredient(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     # Global namespace is simplest; if you want per-user ingredients later, add user_id
     name: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    # Case-folded lookup key; equality on this column can use its index, unlike ilike(name)
+    name_normalized: Mapped[str] = mapped_column(
+        String(255), unique=True, index=True,
+        default=lambda ctx: normalize_ingredient_name(ctx.get_current_parameters()["name"]),
+    )
     links = relationship("RecipeIngredient", back_populates="ingredient")
 
 class Recipe(Base):
@@ -27,11 +37,17 @@ class Recipe(Base):
     name: Mapped[str] = mapped_column(String(255), index=True)
     cuisine: Mapped[str] = mapped_column(String(100), index=True)
     notes: Mapped[str] = mapped_column(String(1000), default="")
+    # Denormalized grocery lines, JSON [[key, name, unit, qty, group, factor], ...]; see planner.refresh_recipe_vectors
+    ingredient_vector: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     owner = relationship("User", back_populates="recipes")
     items = relationship("RecipeIngredient", back_populates="recipe", cascade="all, delete-orphan")
 
-    __table_args__ = (UniqueConstraint("user_id", "name", name="uq_recipe_per_user_name"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_recipe_per_user_name"),
+        # Keyset listing filtered by cuisine: WHERE user_id, cuisine ORDER BY name, id
+        Index("ix_recipes_user_cuisine_name", "user_id", "cuisine", "name", "id"),
+    )
 
 class RecipeIngredient(Base):
     __tablename__ = "recipe_ingredients"
@@ -63,11 +79,20 @@ class Plan(Base):
     days: Mapped[int] = mapped_column(Integer, default=7)
     created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
     locked: Mapped[int] = mapped_column(Integer, default=1)  # 1=locked/active, 0=draft (simple flag)
+    # RNG seed of the last generation/reroll; replaying it over the same inputs gives the same days
+    seed: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Rendered plan view as JSON (see app.plan_view); NULL = rebuild on next read
+    snapshot: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Bumped by every change to this plan (toggles, swaps, rerolls); see app.etags
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     owner = relationship("User", back_populates="plans")
     plan_recipes = relationship("PlanRecipe", back_populates="plan", cascade="all, delete-orphan")
     groceries = relationship("GroceryItem", back_populates="plan", cascade="all, delete-orphan")
 
+    # Latest plans per user: WHERE user_id ORDER BY id DESC LIMIT k
+    __table_args__ = (Index("ix_plans_user_id_id", "user_id", "id"),)
+
 class PlanRecipe(Base):
     __tablename__ = "plan_recipes"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -90,3 +115,12 @@ class GroceryItem(Base):
     checked: Mapped[int] = mapped_column(Integer, default=0)  # 0/1
 
     plan = relationship("Plan", back_populates="groceries")
+
+    # Plan delta lookups: WHERE plan_id AND name IN (...)
+    __table_args__ = (Index("ix_grocery_items_plan_name", "plan_id", "name"),)
+
+# Full-text index over recipes (rowid = recipe id), SQLite only; kept in sync by app.search
+RECIPE_SEARCH_DDL = ("CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5("
+                     "name, cuisine, notes, ingredients, owner, tokenize='unicode61 remove_diacritics 2')")
+event.listen(Base.metadata, "after_create", DDL(RECIPE_SEARCH_DDL).execute_if(dialect="sqlite"))
+event.listen(Base.metadata, "before_drop", DDL("DROP TABLE IF EXISTS recipe_search").execute_if(dialect="sqlite"))
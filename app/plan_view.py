@@ -0,0 +1,166 @@
+import json
+from typing import Dict, List, NamedTuple, Sequence
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+from .config import PLAN_SNAPSHOTS
+from .etags import make_etag
+from .models import GroceryItem, Plan, PlanRecipe, Recipe, User
+
+# The plan as GET /plans/{pid} and the home page show it. load_plan fetches the plan, its days
+# with their recipes (one joined query) and its grocery lines (one selectin query). With
+# PLAN_SNAPSHOTS the rendered view is also kept as JSON on plans.snapshot: written when a plan is
+# created (batch plans included) or rerolled and patched in place by grocery toggles and recipe
+# edits, always inside the writing transaction. A NULL snapshot (plans from before the snapshot
+# migration) is built on first read.
+
+def load_plan(db: Session, user_id: int, plan_id: int | None = None) -> Plan | None:
+    # plan_id None = the user's latest plan
+    q = (db.query(Plan)
+         .options(joinedload(Plan.plan_recipes).joinedload(PlanRecipe.recipe), selectinload(Plan.groceries))
+         .filter(Plan.user_id == user_id)
+         .execution_options(populate_existing=True))
+    if plan_id is None:
+        plan_id = select(func.max(Plan.id)).where(Plan.user_id == user_id).scalar_subquery()
+    # No LIMIT: with a joined collection that would wrap the whole query in a subquery
+    return q.filter(Plan.id == plan_id).one_or_none()
+
+def build_plan_view(plan: Plan) -> dict:
+    return _view(plan.id, plan.days, plan.seed,
+                 [(pr.day_index, pr.recipe_id, pr.recipe.name, pr.recipe.cuisine) for pr in plan.plan_recipes if pr.recipe is not None],
+                 [(g.id, g.name, g.unit, g.quantity, g.checked) for g in plan.groceries])
+
+def _view(plan_id: int, days: int, seed: int | None, recipes: Sequence[tuple], groceries: Sequence[tuple]) -> dict:
+    # recipes: (day_index, id, name, cuisine); groceries: (id, name, unit, quantity, checked)
+    return {
+        "id": plan_id,
+        "days": days,
+        "seed": seed,
+        "recipes": [{"day_index": d, "id": rid, "name": name, "cuisine": cuisine} for d, rid, name, cuisine in sorted(recipes)],
+        "groceries": [{"id": gid, "name": name, "unit": unit, "quantity": round(qty, 2), "checked": bool(checked)}
+                      for gid, name, unit, qty, checked in sorted(groceries, key=lambda g: (g[1], g[0]))],
+    }
+
+class PlanHead(NamedTuple):
+    id: int
+    etag: str
+    snapshot: str | None
+
+def plan_head(db: Session, user_id: int, plan_id: int | None = None) -> PlanHead | None:
+    # The version stamps and the snapshot in one read. The user's version is part of the ETag
+    # because recipe renames show up in the plan, and because plan ids can be reused after a delete.
+    q = (select(Plan.id, User.version, Plan.version, Plan.snapshot)
+         .join(User, User.id == Plan.user_id).where(Plan.user_id == user_id))
+    q = q.where(Plan.id == plan_id) if plan_id is not None else q.order_by(Plan.id.desc()).limit(1)
+    row = db.execute(q).first()
+    if row is None:
+        return None
+    pid, user_version, plan_version, snapshot = row
+    return PlanHead(pid, make_etag("p", pid, user_version, plan_version), snapshot)
+
+def plan_view(db: Session, user_id: int, plan_id: int | None = None, head: PlanHead | None = None) -> dict | None:
+    if not PLAN_SNAPSHOTS:
+        plan = load_plan(db, user_id, head.id if head else plan_id)
+        return build_plan_view(plan) if plan else None
+    row = head or plan_head(db, user_id, plan_id)
+    if row is None:
+        return None
+    if row.snapshot is not None:
+        return json.loads(row.snapshot)
+    # Take the write lock before reading the rows, so a toggle can't commit between the read
+    # and the store and leave the snapshot behind the table
+    _lock_plans(db, Plan.id == row.id)
+    plan = load_plan(db, user_id, row.id)
+    view = build_plan_view(plan) if plan.snapshot is None else json.loads(plan.snapshot)
+    plan.snapshot = json.dumps(view)
+    db.commit()
+    return view
+
+def store_snapshot(db: Session, plan: Plan) -> None:
+    # Call with the plan's rows written (flushed); reloads them so the snapshot matches the database
+    if PLAN_SNAPSHOTS:
+        db.flush()
+        plan.snapshot = json.dumps(build_plan_view(load_plan(db, plan.user_id, plan.id)))
+
+class NewPlan(NamedTuple):
+    id: int
+    days: int
+    seed: int | None
+    recipe_ids: List[int]  # by day index
+
+def store_new_snapshots(db: Session, plans: Sequence[NewPlan]) -> None:
+    # Bulk writers (batch.generate_plans) call this after inserting the plans' rows: one read of
+    # recipe names, one of the fresh (unticked) grocery lines and one executemany cover them all
+    if not PLAN_SNAPSHOTS or not plans:
+        return
+    ids = {rid for p in plans for rid in p.recipe_ids}
+    recipes = {rid: (name, cuisine) for rid, name, cuisine in
+               db.execute(select(Recipe.id, Recipe.name, Recipe.cuisine).where(Recipe.id.in_(ids)))} if ids else {}
+    groceries: Dict[int, list] = {p.id: [] for p in plans}
+    for pid, gid, name, unit, qty, checked in db.execute(
+            select(GroceryItem.plan_id, GroceryItem.id, GroceryItem.name, GroceryItem.unit, GroceryItem.quantity, GroceryItem.checked)
+            .where(GroceryItem.plan_id.in_(list(groceries)))).all():
+        groceries[pid].append((gid, name, unit, qty, checked))
+    _write_snapshots(db, [
+        {"pid": p.id, "snapshot": json.dumps(_view(p.id, p.days, p.seed, [(d, rid, *recipes[rid]) for d, rid in enumerate(p.recipe_ids)],
+                                                   groceries[p.id]))}
+        for p in plans
+    ])
+
+def _lock_plans(db: Session, where) -> None:
+    # A no-op UPDATE: the plan rows stay locked until commit, on SQLite and on row-locking databases alike
+    db.execute(update(Plan).where(where).values(snapshot=Plan.snapshot).execution_options(synchronize_session=False))
+
+def _write_snapshots(db: Session, rows: List[dict]) -> None:
+    if rows:
+        t = Plan.__table__
+        db.execute(update(t).where(t.c.id == bindparam("pid")).values(snapshot=bindparam("snapshot")), rows)
+
+def patch_snapshot_items(db: Session, plan: Plan, checked: Dict[int, bool]) -> None:
+    # Call after the grocery rows are flushed. The plan row is locked before the snapshot is
+    # re-read, so another patch can't interleave and lose its update
+    if not PLAN_SNAPSHOTS:
+        return
+    db.flush()
+    _lock_plans(db, Plan.id == plan.id)
+    db.refresh(plan, ["snapshot"])
+    if plan.snapshot is not None:
+        plan.snapshot = _with_checked(plan.snapshot, checked)
+
+def patch_snapshots_items(db: Session, checked_by_plan: Dict[int, Dict[int, bool]]) -> None:
+    # Many plans at once: plan id -> {item id: checked}. Same contract as patch_snapshot_items,
+    # and the same locking: every plan row first, then the snapshots
+    if not PLAN_SNAPSHOTS or not checked_by_plan:
+        return
+    db.flush()
+    plans = Plan.id.in_(list(checked_by_plan))
+    _lock_plans(db, plans)
+    rows = db.execute(select(Plan.id, Plan.snapshot).where(plans, Plan.snapshot.is_not(None))).all()
+    _write_snapshots(db, [{"pid": pid, "snapshot": _with_checked(raw, checked_by_plan[pid])} for pid, raw in rows])
+
+def _with_checked(raw: str, checked: Dict[int, bool]) -> str:
+    view = json.loads(raw)
+    for g in view["groceries"]:
+        if g["id"] in checked:
+            g["checked"] = checked[g["id"]]
+    return json.dumps(view)
+
+def patch_snapshot_recipe(db: Session, recipe_id: int, name: str | None = None, cuisine: str | None = None) -> None:
+    # Rewrites the recipe's name/cuisine in every snapshot that shows it; with name None the
+    # recipe is being deleted (call before the delete) and its days are dropped, as load_plan drops them
+    if not PLAN_SNAPSHOTS:
+        return
+    showing = Plan.id.in_(select(PlanRecipe.plan_id).where(PlanRecipe.recipe_id == recipe_id))
+    # Lock first, as in plan_view, so a concurrent toggle's patch isn't overwritten
+    _lock_plans(db, showing)
+    rows = db.execute(select(Plan.id, Plan.snapshot).where(showing, Plan.snapshot.is_not(None))).all()
+    patched = []
+    for pid, raw in rows:
+        view = json.loads(raw)
+        if name is None:
+            view["recipes"] = [r for r in view["recipes"] if r["id"] != recipe_id]
+        else:
+            for r in view["recipes"]:
+                if r["id"] == recipe_id:
+                    r["name"], r["cuisine"] = name, cuisine
+        patched.append({"pid": pid, "snapshot": json.dumps(view)})
+    _write_snapshots(db, patched)
@@ -1,75 +1,275 @@
+import heapq
+import json
 import random
 from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, Iterable, List, Sequence
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
-from .models import Recipe, Plan, PlanRecipe, GroceryItem, Setting
-import json
+from .models import Recipe, Plan, PlanRecipe, GroceryItem
+from .config import PLAN_AVOID_RECENT
+from .settings_service import get_cuisine_caps
+from .units import convert, resolve_unit, unit_group
+from .etags import bump_plan_version, bump_user_version
+from .plan_view import store_snapshot
+from .queries import RecipeRow, IngredientLine, recipe_rows_for_user, ingredient_lines_for_recipes, recent_plan_recipe_ids
 
-def _caps_for_user(db: Session, user_id: int) -> Dict[str, int]:
-    rec = db.query(Setting).filter(Setting.user_id == user_id, Setting.key == "cuisine_caps").first()
-    if not rec:
-        return {}
-    try:
-        return json.loads(rec.value) or {}
-    except Exception:
-        return {}
-
-def choose_week(recipes: List[Recipe], days: int, caps: Dict[str, int]) -> List[Recipe]:
-    # Group in insertion order (recipes is already ordered by id ascending)
-    by_cuisine: Dict[str, List[Recipe]] = defaultdict(list)
-    for r in recipes:
-        by_cuisine[r.cuisine].append(r)
-
-    chosen: List[Recipe] = []
-
-    # First pass: satisfy caps in deterministic order
-    for cuisine, cap in caps.items():
-        if cap <= 0:
-            continue
-        pool = by_cuisine.get(cuisine, [])
-        chosen.extend(pool[:cap])
+def new_seed() -> int:
+    return random.getrandbits(31)
 
-    # Second pass: fill remaining with any recipes not yet chosen, still respecting caps
-    for r in recipes:
-        if len(chosen) >= days:
-            break
-        if r in chosen:
-            continue
+def _draw_order(pool: List[RecipeRow], rng: random.Random, weights: Dict[int, float] | None):
+    # Lazily yields pool in random order, so a week costs O(picks) draws rather than O(n)
+    if weights is None:
+        pool = list(pool)
+        for i in range(len(pool)):
+            j = rng.randrange(i, len(pool))
+            pool[i], pool[j] = pool[j], pool[i]
+            yield pool[i]
+        return
+    # Weighted: exponential clocks with rate = weight, earliest first, so P(next) is proportional
+    # to weight; non-positive weights are never drawn
+    heap = [(rng.expovariate(w), i) for i, w in enumerate(weights.get(r.id, 1.0) for r in pool) if w > 0]
+    heapq.heapify(heap)
+    while heap:
+        yield pool[heapq.heappop(heap)[1]]
+
+def sample_week(recipes: List[RecipeRow], days: int, caps: Dict[str, int], rng: random.Random,
+                weights: Dict[int, float] | None = None, avoid: set[int] = frozenset()) -> List[RecipeRow]:
+    # Seeded sampling without replacement. Caps are ceilings (uncapped cuisines are unlimited) and
+    # avoided recipes are held back, in draw order, until the rest are exhausted. Each recipe is drawn
+    # at most once, so infeasible caps end in O(n) with fewer than `days` picks instead of retrying.
+    chosen: List[RecipeRow] = []
+    per_cuisine: Dict[str, int] = defaultdict(int)
+    deferred: List[RecipeRow] = []
+
+    def take(r: RecipeRow) -> None:
         if r.cuisine in caps:
-            already = sum(1 for x in chosen if x.cuisine == r.cuisine)
-            if already >= caps[r.cuisine]:
-                continue
+            if per_cuisine[r.cuisine] >= caps[r.cuisine]:
+                return
+            per_cuisine[r.cuisine] += 1
         chosen.append(r)
 
-    return chosen[:days]
+    for r in _draw_order(recipes, rng, weights):
+        if len(chosen) >= days:
+            return chosen
+        if r.id in avoid:
+            deferred.append(r)
+        else:
+            take(r)
+    for r in deferred:
+        if len(chosen) >= days:
+            break
+        take(r)
+    return chosen
 
-def aggregate_groceries(recipes: List[Recipe]) -> Dict[tuple, dict]:
+def aggregate_groceries(recipe_lines: Iterable[Iterable[IngredientLine]]) -> Dict[tuple, dict]:
+    # Keyed by (name, unit group): convertible units merge into the first-seen unit's line
     agg = {}
-    for r in recipes:
-        for it in r.items:
-            name = it.ingredient.name.strip()
-            unit = (it.unit or "").strip().lower()
-            key = (name.lower(), unit)
-            if key not in agg:
-                agg[key] = {"name": name, "unit": unit, "quantity": 0.0}
-            agg[key]["quantity"] += float(it.quantity or 0.0)
+    factors: Dict[tuple, float] = {}
+    for lines in recipe_lines:
+        for it in lines:
+            name = it.name.strip()
+            unit = resolve_unit(it.unit)
+            qty = float(it.quantity or 0.0)
+            key = (name.lower(), unit.dimension)
+            entry = agg.get(key)
+            if entry is None:
+                agg[key] = {"name": name, "unit": unit.canonical, "quantity": qty}
+                factors[key] = unit.factor
+            elif unit.canonical == entry["unit"]:
+                entry["quantity"] += qty
+            else:
+                entry["quantity"] += qty * unit.factor / factors[key]
+    return agg
+
+# ---------- Precomputed ingredient vectors ----------
+# Each recipe stores its grocery lines already normalized and summed, so building a plan
+# is a merge of small lists instead of a join plus per-item string work.
+
+def build_vector(lines: Iterable[IngredientLine]) -> list:
+    # Lines carry their unit group and factor, so merging never goes back to the unit registry
+    return [[key, meta["name"], meta["unit"], meta["quantity"], group, resolve_unit(meta["unit"]).factor]
+            for (key, group), meta in aggregate_groceries([lines]).items()]
+
+def refresh_recipe_vectors(db: Session, recipe_ids: Sequence[int]) -> Dict[int, list]:
+    # Call after writing a recipe's items, inside the same transaction
+    lines = ingredient_lines_for_recipes(db, recipe_ids)
+    vectors = {rid: build_vector(lines[rid]) for rid in lines}
+    if vectors:
+        db.execute(update(Recipe), [{"id": rid, "ingredient_vector": json.dumps(v)} for rid, v in vectors.items()])
+    return vectors
+
+def load_recipe_vectors(db: Session, recipe_ids: Sequence[int]) -> Dict[int, list]:
+    rows = db.execute(select(Recipe.id, Recipe.ingredient_vector).where(Recipe.id.in_(list(set(recipe_ids))))).all()
+    vectors = {rid: json.loads(raw) for rid, raw in rows if raw is not None}
+    stale = [rid for rid, raw in rows if raw is None]
+    if stale:
+        # Rows written before vectors existed: compute once and keep them
+        vectors.update(refresh_recipe_vectors(db, stale))
+    return vectors
+
+def merge_vectors(vectors: Iterable[list]) -> Dict[tuple, dict]:
+    agg: Dict[tuple, dict] = {}
+    factors: Dict[tuple, float] = {}
+    for vec in vectors:
+        for key, name, unit, qty, group, factor in vec:
+            k = (key, group)
+            entry = agg.get(k)
+            if entry is None:
+                agg[k] = {"name": name, "unit": unit, "quantity": qty}
+                factors[k] = factor
+            elif unit == entry["unit"]:
+                entry["quantity"] += qty
+            else:
+                entry["quantity"] += qty * factor / factors[k]
     return agg
 
-def create_plan(db: Session, user_id: int, days: int, caps_override: Dict[str, int] | None = None) -> Plan:
-    caps = caps_override if caps_override is not None else _caps_for_user(db, user_id)
-    recipes = db.query(Recipe).filter(Recipe.user_id == user_id).order_by(Recipe.id.asc()).all()
+def create_plan(db: Session, user_id: int, days: int, caps_override: Dict[str, int] | None = None,
+                seed: int | None = None, avoid_recent: int | None = None,
+                weights: Dict[int, float] | None = None) -> Plan:
+    caps = caps_override if caps_override is not None else get_cuisine_caps(db, user_id)
+    recipes = recipe_rows_for_user(db, user_id)
     if not recipes:
         raise ValueError("No recipes found for user.")
-    chosen = choose_week(recipes, days, caps)
-    plan = Plan(user_id=user_id, days=days, locked=1)
+    seed = new_seed() if seed is None else seed
+    recent = recent_plan_recipe_ids(db, user_id, PLAN_AVOID_RECENT if avoid_recent is None else avoid_recent)
+    chosen = sample_week(recipes, days, caps, random.Random(seed), weights, avoid=recent)
+    plan = Plan(user_id=user_id, days=days, locked=1, seed=seed)
     db.add(plan); db.flush()
 
-    for idx, r in enumerate(chosen):
-        db.add(PlanRecipe(plan_id=plan.id, recipe_id=r.id, day_index=idx))
-
-    agg = aggregate_groceries(chosen)
-    for (_, _), meta in agg.items():
-        db.add(GroceryItem(plan_id=plan.id, name=meta["name"], unit=meta["unit"], quantity=round(meta["quantity"], 2), checked=0))
+    vectors = load_recipe_vectors(db, [r.id for r in chosen])
+    agg = merge_vectors(vectors.get(r.id, []) for r in chosen)
+    write_plan_rows(db, plan.id, chosen, agg)
+    bump_user_version(db, user_id)
+    store_snapshot(db, plan)
 
     db.commit(); db.refresh(plan)
     return plan
+
+def plan_recipe_rows(plan_id: int, recipe_ids: Iterable[int]) -> List[dict]:
+    return [{"plan_id": plan_id, "recipe_id": rid, "day_index": idx} for idx, rid in enumerate(recipe_ids)]
+
+def grocery_rows(plan_id: int, agg: Dict[tuple, dict]) -> List[dict]:
+    return [{"plan_id": plan_id, "name": meta["name"], "unit": meta["unit"], "quantity": meta["quantity"], "checked": 0}
+            for meta in agg.values()]
+
+def write_plan_rows(db: Session, plan_id: int, chosen: List[RecipeRow], agg: Dict[tuple, dict]) -> None:
+    # Core-style executemany: one statement per table instead of per-object unit-of-work flushes
+    if chosen:
+        db.execute(insert(PlanRecipe), plan_recipe_rows(plan_id, [r.id for r in chosen]))
+    if agg:
+        db.execute(insert(GroceryItem), grocery_rows(plan_id, agg))
+
+# ---------- Incremental plan mutation ----------
+# Swapping or rerolling days touches only the changed PlanRecipe rows and the grocery lines
+# whose (name, unit) key those recipes contribute to; every other item keeps its checked flag.
+
+def _owned_plan(db: Session, user_id: int, plan_id: int) -> Plan:
+    plan = db.query(Plan).filter(Plan.id == plan_id, Plan.user_id == user_id).first()
+    if not plan:
+        raise LookupError("Plan not found.")
+    return plan
+
+# Quantities are stored at full precision (rounded only for display); this absorbs the float
+# residue of adding and then subtracting the same amounts
+QTY_EPSILON = 1e-9
+
+def apply_grocery_delta(db: Session, plan_id: int, removed: Dict[tuple, dict], added: Dict[tuple, dict]) -> None:
+    delta: Dict[tuple, dict] = {k: dict(v) for k, v in added.items()}
+    for key, meta in removed.items():
+        entry = delta.setdefault(key, {**meta, "quantity": 0.0})
+        entry["quantity"] -= convert(meta["quantity"], meta["unit"], entry["unit"])
+    delta = {k: v for k, v in delta.items() if abs(v["quantity"]) > QTY_EPSILON}
+    if not delta:
+        return
+    # Ingredient names are unique case-insensitively, so the display name matches stored rows exactly
+    names = {meta["name"] for meta in delta.values()}
+    # Plans built before unit groups can hold several rows for one (name, group); keep them all
+    rows: Dict[tuple, List[GroceryItem]] = {}
+    for g in db.query(GroceryItem).filter(GroceryItem.plan_id == plan_id, GroceryItem.name.in_(names)).order_by(GroceryItem.id):
+        rows.setdefault((g.name.strip().lower(), unit_group(g.unit)), []).append(g)
+    new_rows = []
+    for key, meta in delta.items():
+        group = rows.get(key)
+        if not group:
+            if meta["quantity"] > 0:
+                new_rows.append({"plan_id": plan_id, "name": meta["name"], "unit": meta["unit"],
+                                 "quantity": meta["quantity"], "checked": 0})
+            continue
+        if meta["quantity"] > 0:
+            g = group[0]
+            g.quantity += convert(meta["quantity"], meta["unit"], g.unit)
+            g.checked = 0  # more is needed than what was ticked off
+            continue
+        # drain removals across the rows in id order
+        left = -meta["quantity"]
+        for g in group:
+            take = min(g.quantity, convert(left, meta["unit"], g.unit))
+            left -= convert(take, g.unit, meta["unit"])
+            if g.quantity - take <= QTY_EPSILON:
+                db.delete(g)
+            else:
+                g.quantity -= take
+            if left <= QTY_EPSILON:
+                break
+    if new_rows:
+        db.execute(insert(GroceryItem), new_rows)
+
+def _replace_days(db: Session, plan: Plan, replacements: Dict[int, int]) -> None:
+    # replacements: day_index -> new recipe id
+    current = {pr.day_index: pr for pr in db.query(PlanRecipe).filter(
+        PlanRecipe.plan_id == plan.id, PlanRecipe.day_index.in_(list(replacements)))}
+    old_ids = [current[d].recipe_id for d in replacements if d in current]
+    vectors = load_recipe_vectors(db, old_ids + list(replacements.values()))
+    removed = merge_vectors(vectors.get(rid, []) for rid in old_ids)
+    added = merge_vectors(vectors.get(rid, []) for rid in replacements.values())
+    for day, rid in replacements.items():
+        if day in current:
+            current[day].recipe_id = rid
+        else:
+            db.add(PlanRecipe(plan_id=plan.id, recipe_id=rid, day_index=day))
+    apply_grocery_delta(db, plan.id, removed, added)
+
+def swap_day(db: Session, user_id: int, plan_id: int, day_index: int, recipe_id: int) -> Plan:
+    plan = _owned_plan(db, user_id, plan_id)
+    if not 0 <= day_index < plan.days:
+        raise ValueError("day_index out of range")
+    if not db.query(Recipe.id).filter(Recipe.id == recipe_id, Recipe.user_id == user_id).first():
+        raise LookupError("Recipe not found.")
+    _replace_days(db, plan, {day_index: recipe_id})
+    store_snapshot(db, plan)
+    bump_plan_version(plan)
+    db.commit()
+    return plan
+
+def reroll_days(db: Session, user_id: int, plan_id: int, day_indexes: List[int] | None = None,
+                caps_override: Dict[str, int] | None = None, seed: int | None = None,
+                avoid_recent: int | None = None, weights: Dict[int, float] | None = None) -> List[int]:
+    plan = _owned_plan(db, user_id, plan_id)
+    days = sorted(set(range(plan.days) if day_indexes is None else day_indexes))
+    if any(not 0 <= d < plan.days for d in days):
+        raise ValueError("day_index out of range")
+    caps = caps_override if caps_override is not None else get_cuisine_caps(db, user_id)
+    recipes = recipe_rows_for_user(db, user_id)
+    planned = dict(db.query(PlanRecipe.day_index, PlanRecipe.recipe_id).filter(PlanRecipe.plan_id == plan.id).all())
+    kept = {rid for d, rid in planned.items() if d not in days}
+    by_id = {r.id: r for r in recipes}
+    # Caps apply to the whole plan, so the kept days use up part of each cuisine's allowance
+    remaining = dict(caps)
+    for rid in kept:
+        r = by_id.get(rid)
+        if r is not None and r.cuisine in remaining:
+            remaining[r.cuisine] -= 1
+    # Prefer recipes neither in this plan nor in recent ones; fall back to those being replaced
+    # plan.seed stays the one the plan was generated from; the reroll seed is the caller's to report
+    rng = random.Random(new_seed() if seed is None else seed)
+    avoid = set(planned.values()) | recent_plan_recipe_ids(
+        db, user_id, PLAN_AVOID_RECENT if avoid_recent is None else avoid_recent, exclude_plan_id=plan.id)
+    chosen = sample_week([r for r in recipes if r.id not in kept], len(days), remaining,
+                         rng, weights, avoid=avoid)
+    replacements = {d: r.id for d, r in zip(days, chosen) if planned.get(d) != r.id}
+    if replacements:
+        _replace_days(db, plan, replacements)
+    store_snapshot(db, plan)
+    bump_plan_version(plan)
+    db.commit()
+    return sorted(replacements)
@@ -0,0 +1,143 @@
+import base64
+import json
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import select, insert, or_, and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import Recipe, RecipeIngredient, Ingredient, Plan, PlanRecipe, Setting, normalize_ingredient_name
+
+# Column-projected reads for the planner. These return plain tuples instead of ORM
+# entities so plan generation never touches lazy relationships.
+
+class RecipeRow(NamedTuple):
+    id: int
+    cuisine: str
+
+class IngredientLine(NamedTuple):
+    name: str
+    quantity: float
+    unit: str
+
+def recipe_rows_for_user(db: Session, user_id: int) -> List[RecipeRow]:
+    stmt = select(Recipe.id, Recipe.cuisine).where(Recipe.user_id == user_id).order_by(Recipe.id.asc())
+    return [RecipeRow(rid, cuisine) for rid, cuisine in db.execute(stmt)]
+
+def recent_plan_recipe_ids(db: Session, user_id: int, k: int, exclude_plan_id: int | None = None) -> set[int]:
+    # Recipes on the user's last k plans; ix_plans_user_id_id and uq_plan_day keep both lookups on indexes
+    if k <= 0:
+        return set()
+    recent = select(Plan.id).where(Plan.user_id == user_id)
+    if exclude_plan_id is not None:
+        recent = recent.where(Plan.id != exclude_plan_id)
+    recent = recent.order_by(Plan.id.desc()).limit(k)
+    return set(db.scalars(select(PlanRecipe.recipe_id).where(PlanRecipe.plan_id.in_(recent))))
+
+# Bulk variants for batch generation: one query per table for a whole slice of users
+
+class VectorRow(NamedTuple):
+    id: int
+    cuisine: str
+    vector: Optional[str]  # raw Recipe.ingredient_vector JSON
+
+def recipe_rows_by_user(db: Session, user_ids: Sequence[int]) -> Dict[int, List[VectorRow]]:
+    out: Dict[int, List[VectorRow]] = {uid: [] for uid in user_ids}
+    stmt = (select(Recipe.user_id, Recipe.id, Recipe.cuisine, Recipe.ingredient_vector)
+            .where(Recipe.user_id.in_(list(out))).order_by(Recipe.user_id, Recipe.id))
+    for uid, rid, cuisine, vector in db.execute(stmt):
+        out[uid].append(VectorRow(rid, cuisine, vector))
+    return out
+
+def setting_values_by_user(db: Session, user_ids: Sequence[int], key: str) -> Dict[int, str]:
+    stmt = select(Setting.user_id, Setting.value).where(Setting.user_id.in_(list(user_ids)), Setting.key == key)
+    return dict(db.execute(stmt).all())
+
+def recent_plan_recipe_ids_by_user(db: Session, user_ids: Sequence[int], k: int) -> Dict[int, set[int]]:
+    out: Dict[int, set[int]] = {uid: set() for uid in user_ids}
+    if k <= 0 or not out:
+        return out
+    ranked = (select(Plan.id, Plan.user_id, func.row_number().over(partition_by=Plan.user_id, order_by=Plan.id.desc()).label("rn"))
+              .where(Plan.user_id.in_(list(out))).subquery())
+    stmt = (select(ranked.c.user_id, PlanRecipe.recipe_id)
+            .join(PlanRecipe, PlanRecipe.plan_id == ranked.c.id).where(ranked.c.rn <= k))
+    for uid, rid in db.execute(stmt):
+        out[uid].add(rid)
+    return out
+
+class RecipeListRow(NamedTuple):
+    id: int
+    name: str
+    cuisine: str
+    notes: str
+
+def encode_recipe_cursor(name: str, rid: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name, rid]).encode()).decode().rstrip("=")
+
+def decode_recipe_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        name, rid = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(name), int(rid)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def recipe_page(db: Session, user_id: int, limit: int, cursor: Optional[str] = None,
+                cuisine: Optional[str] = None, name_prefix: Optional[str] = None) -> Tuple[List[RecipeListRow], Optional[str]]:
+    # Keyset page ordered by (name, id); served by uq_recipe_per_user_name or ix_recipes_user_cuisine_name
+    stmt = select(Recipe.id, Recipe.name, Recipe.cuisine, Recipe.notes).where(Recipe.user_id == user_id)
+    if cuisine:
+        stmt = stmt.where(Recipe.cuisine == cuisine)
+    if name_prefix:
+        # Range instead of LIKE so the name index stays usable
+        stmt = stmt.where(Recipe.name >= name_prefix, Recipe.name < name_prefix + "\U0010ffff")
+    if cursor:
+        after_name, after_id = decode_recipe_cursor(cursor)
+        stmt = stmt.where(or_(Recipe.name > after_name, and_(Recipe.name == after_name, Recipe.id > after_id)))
+    rows = [RecipeListRow(*row) for row in db.execute(stmt.order_by(Recipe.name, Recipe.id).limit(limit + 1))]
+    next_cursor = encode_recipe_cursor(rows[limit - 1].name, rows[limit - 1].id) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def ingredient_lines_for_recipes(db: Session, recipe_ids: Sequence[int]) -> Dict[int, List[IngredientLine]]:
+    out: Dict[int, List[IngredientLine]] = {rid: [] for rid in recipe_ids}
+    if not out:
+        return out
+    stmt = (
+        select(RecipeIngredient.recipe_id, Ingredient.name, RecipeIngredient.quantity, RecipeIngredient.unit)
+        .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+        .where(RecipeIngredient.recipe_id.in_(list(out)))
+        .order_by(RecipeIngredient.recipe_id, RecipeIngredient.id)
+    )
+    for rid, name, qty, unit in db.execute(stmt):
+        out[rid].append(IngredientLine(name, qty, unit))
+    return out
+
+def _insert_ignoring_conflicts(db: Session, rows: List[dict]) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        # No portable upsert: insert one by one inside savepoints and let the loser of a race re-read
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Ingredient), [row])
+            except IntegrityError:
+                pass
+        return
+    db.execute(dialect_insert(Ingredient).on_conflict_do_nothing(), rows)
+
+# Map normalized ingredient name -> id for a whole recipe at once, creating any that are missing
+def resolve_ingredients(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    wanted: Dict[str, str] = {}
+    for name in names:
+        wanted.setdefault(normalize_ingredient_name(name), (name or "").strip())
+    if not wanted:
+        return {}
+    lookup = select(Ingredient.name_normalized, Ingredient.id)
+    found = dict(db.execute(lookup.where(Ingredient.name_normalized.in_(list(wanted)))).all())
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        # Concurrent writers may create the same names; conflicts are ignored and re-read below
+        _insert_ignoring_conflicts(db, [{"name": wanted[key], "name_normalized": key} for key in missing])
+        found.update(db.execute(lookup.where(Ingredient.name_normalized.in_(missing))).all())
+    return found
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from typing import Optional
+from sqlalchemy import select, update
+from ..deps import Principal, current_principal_async, get_async_db
+from ..models import GroceryItem, Plan
+from ..events import hub, plan_topic
+from ..etags import bump_plan_version
+from ..plan_view import patch_snapshot_items
+from . import recipes, plans, settings
+
+# Async twins of the JSON API handlers, mounted ahead of the sync routers when ASYNC_DB is on.
+# Anything not redefined here (bulk import, export, ...) falls through to the sync routes.
+# Handlers with real logic reuse the sync implementation through AsyncSession.run_sync, which
+# drives the same Session code on the async driver without holding a threadpool thread.
+router = APIRouter()
+
+@router.get("/recipes", response_model=list[dict], tags=["recipes"])
+async def list_recipes(
+    request: Request,
+    response: Response,
+    limit: int = Query(recipes.DEFAULT_PAGE_SIZE, ge=1, le=recipes.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    prefix: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    user: Principal = Depends(current_principal_async),
+    db=Depends(get_async_db),
+):
+    return await db.run_sync(lambda s: recipes.list_recipes(
+        request=request, response=response, limit=limit, cursor=cursor, cuisine=cuisine, prefix=prefix, fields=fields,
+        if_none_match=if_none_match, user=user, db=s))
+
+@router.post("/recipes", response_model=dict, tags=["recipes"])
+async def create_recipe(data: recipes.RecipeIn, user: Principal = Depends(current_principal_async), db=Depends(get_async_db)):
+    return await db.run_sync(lambda s: recipes.create_recipe(data=data, user=user, db=s))
+
+@router.patch("/recipes/{rid}", response_model=dict, tags=["recipes"])
+async def update_recipe(rid: int, data: recipes.RecipeIn, user: Principal = Depends(current_principal_async), db=Depends(get_async_db)):
+    return await db.run_sync(lambda s: recipes.update_recipe(rid=rid, data=data, user=user, db=s))
+
+@router.delete("/recipes/{rid}", response_model=dict, tags=["recipes"])
+async def delete_recipe(rid: int, user: Principal = Depends(current_principal_async), db=Depends(get_async_db)):
+    return await db.run_sync(lambda s: recipes.delete_recipe(rid=rid, user=user, db=s))
+
+@router.post("/plans", response_model=dict, tags=["plans"])
+async def generate_plan(data: plans.PlanIn, user: Principal = Depends(current_principal_async), db=Depends(get_async_db)):
+    return await db.run_sync(lambda s: plans.generate_plan(data=data, user=user, db=s))
+
+@router.get("/plans/{pid}", response_model=dict, tags=["plans"])
+async def get_plan(pid: int, response: Response, if_none_match: Optional[str] = Header(None),
+                   user: Principal = Depends(current_principal_async), db=Depends(get_async_db)):
+    return await db.run_sync(lambda s: plans.get_plan(pid=pid, response=response, if_none_match=if_none_match, user=user, db=s))
+
+@router.post("/grocery/{item_id}/toggle", response_model=dict, tags=["grocery"])
+async def toggle_item(item_id: int, user: Principal = Depends(current_principal_async), db=Depends(get_async_db)):
+    row = (await db.execute(
+        select(GroceryItem.id, GroceryItem.plan_id, Plan.user_id).join(Plan, Plan.id == GroceryItem.plan_id).where(GroceryItem.id == item_id)
+    )).first()
+    if not row:
+        raise HTTPException(404, "Not found")
+    if row.user_id != user.id:
+        raise HTTPException(403, "Forbidden")
+    checked = (await db.execute(
+        update(GroceryItem).where(GroceryItem.id == item_id)
+        .values(checked=1 - GroceryItem.checked).returning(GroceryItem.checked)
+    )).scalar_one()
+
+    def touch_plan(s):
+        plan = s.get(Plan, row.plan_id)
+        patch_snapshot_items(s, plan, {item_id: bool(checked)})
+        bump_plan_version(plan)
+    await db.run_sync(touch_plan)
+    await db.commit()
+    hub.publish(plan_topic(row.plan_id), "items", {"items": [{"id": item_id, "checked": bool(checked)}]})
+    return {"id": item_id, "checked": bool(checked)}
+
+@router.post("/settings/caps", response_model=dict, tags=["settings"])
+async def set_caps(data: settings.CapsIn, user: Principal = Depends(current_principal_async), db=Depends(get_async_db)):
+    return await db.run_sync(lambda s: settings.set_caps(data=data, user=user, db=s))
@@ -1,12 +1,57 @@
+from collections import defaultdict
+from typing import Dict, List
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import case, select, update
 from sqlalchemy.orm import Session
-from ..deps import current_user, get_db
-from ..models import User, GroceryItem, Plan
+from ..deps import Principal, current_principal, get_db
+from ..models import GroceryItem, Plan
+from ..events import hub, plan_topic
+from ..etags import bump_plan_version, bump_plan_versions
+from ..plan_view import patch_snapshot_items, patch_snapshots_items
 
 router = APIRouter(prefix="/grocery", tags=["grocery"])
 
+MAX_PATCH_ITEMS = 500
+
+class ItemPatchIn(BaseModel):
+    id: int
+    checked: bool | None = None  # set to this value (idempotent); omitted/null flips the item
+
+@router.patch("", response_model=dict)
+def patch_items(data: List[ItemPatchIn], user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    if not 1 <= len(data) <= MAX_PATCH_ITEMS:
+        raise HTTPException(400, f"Send between 1 and {MAX_PATCH_ITEMS} items.")
+    ids = [p.id for p in data]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(400, "Duplicate item id.")
+    new_value = case(*[(GroceryItem.id == p.id, (1 - GroceryItem.checked) if p.checked is None else int(p.checked)) for p in data],
+                     else_=GroceryItem.checked)
+    # Ownership is part of the WHERE: other users' (and unknown) ids just don't match
+    rows = db.execute(
+        update(GroceryItem)
+        .where(GroceryItem.id.in_(ids), GroceryItem.plan_id.in_(select(Plan.id).where(Plan.user_id == user.id)))
+        .values(checked=new_value)
+        .returning(GroceryItem.id, GroceryItem.plan_id, GroceryItem.checked)
+        .execution_options(synchronize_session=False)
+    ).all()
+    states: Dict[int, bool] = {}
+    by_plan: Dict[int, Dict[int, bool]] = defaultdict(dict)
+    for item_id, plan_id, checked in rows:
+        states[item_id] = by_plan[plan_id][item_id] = bool(checked)
+    if by_plan:
+        patch_snapshots_items(db, by_plan)
+        bump_plan_versions(db, *by_plan)
+    db.commit()
+    for pid, checked in by_plan.items():
+        hub.publish(plan_topic(pid), "items", {"items": [{"id": i, "checked": c} for i, c in checked.items()]})
+    return {
+        "items": [{"id": i, "checked": states[i]} for i in ids if i in states],
+        "not_found": [i for i in ids if i not in states],
+    }
+
 @router.post("/{item_id}/toggle", response_model=dict)
-def toggle_item(item_id: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def toggle_item(item_id: int, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     gi = db.query(GroceryItem).filter(GroceryItem.id == item_id).first()
     if not gi:
         raise HTTPException(404, "Not found")
@@ -15,5 +60,9 @@ def toggle_item(item_id: int, user: User = Depends(current_user), db: Session =
     if not plan:
         raise HTTPException(403, "Forbidden")
     gi.checked = 0 if gi.checked else 1
+    patch_snapshot_items(db, plan, {gi.id: bool(gi.checked)})
+    bump_plan_version(plan)
+    state, topic = {"id": gi.id, "checked": bool(gi.checked)}, plan_topic(gi.plan_id)
     db.commit()
-    return {"id": gi.id, "checked": bool(gi.checked)}
+    hub.publish(topic, "items", {"items": [state]})
+    return state
@@ -1,34 +1,133 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import Dict
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated, Dict, List
 from sqlalchemy.orm import Session
-from ..deps import current_user, get_db
-from ..models import User, Plan, PlanRecipe, GroceryItem
-from ..planner import create_plan
+from ..config import SSE_PING_SECONDS
+from ..deps import Principal, current_principal, get_db
+from ..events import hub, plan_topic
+from ..models import Plan
+from ..batch import PlanJob, generate_plans
+from ..etags import etag_matches
+from ..plan_view import plan_head, plan_view
+from ..planner import create_plan, new_seed, swap_day, reroll_days
 
 router = APIRouter(prefix="/plans", tags=["plans"])
 
+# Plan.seed is a signed 64-bit INTEGER column
+Seed = Annotated[int, Field(ge=0, lt=2**63)]
+# Relative odds of drawing a recipe, by id; unlisted recipes weigh 1 and 0 means never
+RecipeWeights = Dict[int, Annotated[float, Field(ge=0, allow_inf_nan=False)]]
+
 class PlanIn(BaseModel):
     days: int = 7
     cuisine_caps: Dict[str, int] | None = None
+    seed: Seed | None = None  # replay a previous plan's seed; random when omitted
+    avoid_recent: int | None = None
+    recipe_weights: RecipeWeights | None = None
+
+MAX_BATCH_PLANS = 20
+
+class BatchIn(BaseModel):
+    count: int = 3  # candidate plans to build
+    days: int = 7
+    cuisine_caps: Dict[str, int] | None = None
+    seeds: List[Seed] | None = None  # one per candidate; random when omitted
+    recipe_weights: RecipeWeights | None = None
+
+class SwapIn(BaseModel):
+    recipe_id: int
+
+class RerollIn(BaseModel):
+    day_indexes: List[int] | None = None  # None rerolls every day
+    cuisine_caps: Dict[str, int] | None = None
+    seed: Seed | None = None
+    avoid_recent: int | None = None
+    recipe_weights: RecipeWeights | None = None
 
 @router.post("", response_model=dict)
-def generate_plan(data: PlanIn, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def generate_plan(data: PlanIn, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     if data.days < 1 or data.days > 14:
         raise HTTPException(400, "days must be between 1 and 14")
-    plan = create_plan(db, user.id, data.days, data.cuisine_caps)
-    return {"id": plan.id, "days": plan.days}
+    plan = create_plan(db, user.id, data.days, data.cuisine_caps, data.seed, data.avoid_recent, data.recipe_weights)
+    return {"id": plan.id, "days": plan.days, "seed": plan.seed}
+
+@router.post("/batch", response_model=dict)
+def generate_plan_batch(data: BatchIn, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    if data.days < 1 or data.days > 14:
+        raise HTTPException(400, "days must be between 1 and 14")
+    seeds = data.seeds if data.seeds is not None else [None] * data.count
+    if not 1 <= len(seeds) <= MAX_BATCH_PLANS:
+        raise HTTPException(400, f"count must be between 1 and {MAX_BATCH_PLANS}")
+    # A handful of plans for one user: sampling inline beats shipping the recipe list to a process pool
+    results, stats = generate_plans(db, [PlanJob(user.id, data.days, s, data.cuisine_caps, data.recipe_weights) for s in seeds], workers=0)
+    if results[0].plan_id is None:
+        raise HTTPException(400, "No recipes found for user.")
+    return {"plans": [{"id": r.plan_id, "seed": r.seed} for r in results], "timings": stats}
 
 @router.get("/{pid}", response_model=dict)
-def get_plan(pid: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    plan = db.query(Plan).filter(Plan.id == pid, Plan.user_id == user.id).first()
-    if not plan:
+def get_plan(pid: int, response: Response, if_none_match: str | None = Header(None),
+             user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    head = plan_head(db, user.id, pid)
+    if head is None:
+        raise HTTPException(404, "Not found")
+    headers = {"ETag": head.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, head.etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return plan_view(db, user.id, pid, head)
+
+async def _event_stream(pid: int):
+    # Runs on the event loop after the handler (and its DB session) are done; the client
+    # disconnecting cancels it, which unsubscribes
+    sub = hub.subscribe(plan_topic(pid))
+    try:
+        yield f"retry: 3000\nevent: ready\ndata: {{\"plan_id\": {pid}}}\n\n".encode()
+        while True:
+            try:
+                async with asyncio.timeout(SSE_PING_SECONDS):
+                    message = await sub.queue.get()
+            except TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if message is None:
+                yield b"event: dropped\ndata: {}\n\n"
+                return
+            eid, event, data = message
+            yield f"id: {eid}\nevent: {event}\ndata: {data}\n\n".encode()
+    finally:
+        hub.unsubscribe(sub)
+
+@router.get("/{pid}/events")
+def plan_events(pid: int, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    # Server-Sent Events: "items" when grocery items change, "plan" when days are swapped or
+    # rerolled (refetch the plan), "dropped" if this client fell too far behind (reconnect)
+    if not db.query(Plan.id).filter(Plan.id == pid, Plan.user_id == user.id).first():
         raise HTTPException(404, "Not found")
-    recipes = db.query(PlanRecipe).filter(PlanRecipe.plan_id == plan.id).order_by(PlanRecipe.day_index).all()
-    groceries = db.query(GroceryItem).filter(GroceryItem.plan_id == plan.id).order_by(GroceryItem.name).all()
-    return {
-        "id": plan.id,
-        "days": plan.days,
-        "recipes": [{"day_index": pr.day_index, "id": pr.recipe_id, "name": pr.recipe.name, "cuisine": pr.recipe.cuisine} for pr in recipes],
-        "groceries": [{"id": g.id, "name": g.name, "unit": g.unit, "quantity": g.quantity, "checked": bool(g.checked)} for g in groceries],
-    }
+    return StreamingResponse(_event_stream(pid), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.put("/{pid}/days/{day_index}", response_model=dict)
+def swap_plan_day(pid: int, day_index: int, data: SwapIn, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    try:
+        swap_day(db, user.id, pid, day_index, data.recipe_id)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    hub.publish(plan_topic(pid), "plan", {"changed": [day_index]})
+    return {"id": pid, "changed": [day_index]}
+
+@router.post("/{pid}/reroll", response_model=dict)
+def reroll_plan(pid: int, data: RerollIn, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    seed = new_seed() if data.seed is None else data.seed
+    try:
+        changed = reroll_days(db, user.id, pid, data.day_indexes, data.cuisine_caps, seed, data.avoid_recent,
+                              data.recipe_weights)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    hub.publish(plan_topic(pid), "plan", {"changed": changed})
+    return {"id": pid, "changed": changed, "seed": seed}
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import List
+import json
+import zlib
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from ..deps import current_user, get_db
-from ..models import Recipe, Ingredient, RecipeIngredient, User
+from ..database import SessionLocal
+from ..deps import Principal, current_principal, get_db
+from ..etags import bump_user_version, etag_matches, make_etag
+from ..models import Recipe, RecipeIngredient, Ingredient, User, normalize_ingredient_name
+from ..planner import refresh_recipe_vectors
+from ..plan_view import patch_snapshot_recipe
+from ..queries import resolve_ingredients, recipe_page, ingredient_lines_for_recipes
+from ..search import refresh_recipe_search, remove_from_search, search_recipes
 
 router = APIRouter(prefix="/recipes", tags=["recipes"])
 
@@ -18,59 +30,248 @@ class RecipeIn(BaseModel):
     notes: str = ""
     items: List[RecipeItemIn] = []
 
+RECIPE_FIELDS = ("id", "name", "cuisine", "notes", "items")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 @router.get("", response_model=list[dict])
-def list_recipes(user: User = Depends(current_user), db: Session = Depends(get_db)):
-    rows = db.query(Recipe).filter(Recipe.user_id == user.id).order_by(Recipe.name).all()
+def list_recipes(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    prefix: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    user: Principal = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    wanted = RECIPE_FIELDS if not fields else tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = set(wanted) - set(RECIPE_FIELDS)
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+    # Same user version + same query string = same page, so the listing queries can be skipped
+    version = db.query(User.version).filter(User.id == user.id).scalar()
+    etag = make_etag("r", user.id, version, f"{zlib.crc32(request.url.query.encode()):08x}")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    try:
+        rows, next_cursor = recipe_page(db, user.id, limit, cursor, cuisine, prefix)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    lines = ingredient_lines_for_recipes(db, [r.id for r in rows]) if "items" in wanted else {}
     out = []
     for r in rows:
-        out.append({
-            "id": r.id,
-            "name": r.name,
-            "cuisine": r.cuisine,
-            "notes": r.notes,
-            "items": [{"ingredient_name": it.ingredient.name, "quantity": it.quantity, "unit": it.unit} for it in r.items],
-        })
+        doc = {f: getattr(r, f) for f in wanted if f != "items"}
+        if "items" in wanted:
+            doc["items"] = [{"ingredient_name": it.name, "quantity": it.quantity, "unit": it.unit} for it in lines[r.id]]
+        out.append(doc)
     return out
 
+@router.get("/search", response_model=list[dict])
+def search(
+    response: Response,
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user: Principal = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    # Ranked best match first (bm25 over name, cuisine, notes and ingredient names)
+    try:
+        rows, next_cursor = search_recipes(db, user.id, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [r._asdict() for r in rows]
+
+BULK_CHUNK_SIZE = 200
+EXPORT_BATCH_SIZE = 500
+
+async def _bulk_rows(request: Request) -> AsyncIterator[Tuple[int, object]]:
+    # Yields (row number, parsed JSON or exception). NDJSON is parsed line by line as it
+    # arrives; a JSON array has to be read whole.
+    if request.headers.get("content-type", "").split(";")[0].strip() == "application/json":
+        try:
+            rows = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(400, f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise HTTPException(400, "Expected a JSON array of recipes.")
+        for n, row in enumerate(rows, start=1):
+            yield n, row
+        return
+    buf = b""
+    n = 0
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            n += 1
+            if line.strip():
+                yield n, _parse_line(line)
+    if buf.strip():
+        yield n + 1, _parse_line(buf)
+
+def _parse_line(line: bytes) -> object:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+def _import_chunk(db: Session, user_id: int, chunk: List[Tuple[int, object]]) -> Tuple[int, List[dict]]:
+    errors: List[dict] = []
+    valid: List[Tuple[int, RecipeIn]] = []
+    for n, raw in chunk:
+        if isinstance(raw, Exception):
+            errors.append({"row": n, "error": f"Invalid JSON: {raw}"}); continue
+        try:
+            data = RecipeIn.model_validate(raw)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append({"row": n, "error": detail}); continue
+        keys = [normalize_ingredient_name(i.ingredient_name) for i in data.items]
+        if len(keys) != len(set(keys)):
+            errors.append({"row": n, "error": "Duplicate ingredient in recipe."}); continue
+        valid.append((n, data))
+
+    names = [data.name.strip() for _, data in valid]
+    taken = set(db.scalars(select(Recipe.name).where(Recipe.user_id == user_id, Recipe.name.in_(names))))
+    batch: List[Tuple[int, RecipeIn]] = []
+    for n, data in valid:
+        name = data.name.strip()
+        if name in taken:
+            errors.append({"row": n, "error": "Recipe name already exists."}); continue
+        taken.add(name)
+        batch.append((n, data))
+    if not batch:
+        return 0, errors
+
+    try:
+        ids = db.scalars(insert(Recipe).returning(Recipe.id, sort_by_parameter_order=True), [
+            {"user_id": user_id, "name": d.name.strip(), "cuisine": d.cuisine.strip(), "notes": d.notes.strip()}
+            for _, d in batch
+        ]).all()
+        ing_ids = resolve_ingredients(db, [i.ingredient_name for _, d in batch for i in d.items])
+        links = [
+            {"recipe_id": rid, "ingredient_id": ing_ids[normalize_ingredient_name(i.ingredient_name)],
+             "quantity": float(i.quantity or 0), "unit": (i.unit or "").strip()}
+            for rid, (_, d) in zip(ids, batch) for i in d.items
+        ]
+        if links:
+            db.execute(insert(RecipeIngredient), links)
+        refresh_recipe_vectors(db, ids)
+        refresh_recipe_search(db, ids)
+        bump_user_version(db, user_id)
+        db.commit()
+    except IntegrityError:
+        # Lost a race on uq_recipe_per_user_name; the chunk is all-or-nothing
+        db.rollback()
+        errors.extend({"row": n, "error": "Conflicting concurrent write; retry this row."} for n, _ in batch)
+        return 0, errors
+    return len(batch), errors
+
+@router.post("/bulk", response_model=dict)
+async def bulk_import(request: Request, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    created = 0
+    errors: List[dict] = []
+    chunk: List[Tuple[int, object]] = []
+    async for row in _bulk_rows(request):
+        chunk.append(row)
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            ok, errs = await run_in_threadpool(_import_chunk, db, user.id, chunk)
+            created += ok; errors.extend(errs); chunk = []
+    if chunk:
+        ok, errs = await run_in_threadpool(_import_chunk, db, user.id, chunk)
+        created += ok; errors.extend(errs)
+    errors.sort(key=lambda e: e["row"])
+    return {"created": created, "errors": errors}
+
+def _export_lines(user_id: int) -> Iterator[bytes]:
+    # Runs after the request's own session is closed, so it owns a session for the stream
+    db = SessionLocal()
+    try:
+        stmt = (
+            select(Recipe.id, Recipe.name, Recipe.cuisine, Recipe.notes,
+                   Ingredient.name, RecipeIngredient.quantity, RecipeIngredient.unit)
+            .outerjoin(RecipeIngredient, RecipeIngredient.recipe_id == Recipe.id)
+            .outerjoin(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+            .where(Recipe.user_id == user_id)
+            .order_by(Recipe.id, RecipeIngredient.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        current, doc = None, None
+        for rid, name, cuisine, notes, ing_name, qty, unit in db.execute(stmt):
+            if rid != current:
+                if doc is not None:
+                    yield json.dumps(doc).encode() + b"\n"
+                current, doc = rid, {"name": name, "cuisine": cuisine, "notes": notes, "items": []}
+            if ing_name is not None:
+                doc["items"].append({"ingredient_name": ing_name, "quantity": qty, "unit": unit})
+        if doc is not None:
+            yield json.dumps(doc).encode() + b"\n"
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_recipes(user: Principal = Depends(current_principal)):
+    return StreamingResponse(_export_lines(user.id), media_type="application/x-ndjson")
+
 @router.post("", response_model=dict)
-def create_recipe(data: RecipeIn, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def create_recipe(data: RecipeIn, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     existing = db.query(Recipe).filter(Recipe.user_id == user.id, Recipe.name == data.name.strip()).first()
     if existing:
         raise HTTPException(400, "Recipe name already exists.")
     r = Recipe(user_id=user.id, name=data.name.strip(), cuisine=data.cuisine.strip(), notes=data.notes.strip())
     db.add(r); db.flush()
 
+    ing_ids = resolve_ingredients(db, [i.ingredient_name for i in data.items])
     for i in data.items:
-        ing = db.query(Ingredient).filter(Ingredient.name.ilike(i.ingredient_name.strip())).first()
-        if not ing:
-            ing = Ingredient(name=i.ingredient_name.strip())
-            db.add(ing); db.flush()
-        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing.id, quantity=float(i.quantity or 0), unit=(i.unit or "").strip()))
+        ing_id = ing_ids[normalize_ingredient_name(i.ingredient_name)]
+        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing_id, quantity=float(i.quantity or 0), unit=(i.unit or "").strip()))
+    db.flush()
+    refresh_recipe_vectors(db, [r.id])
+    refresh_recipe_search(db, [r.id])
+    bump_user_version(db, user.id)
     db.commit(); db.refresh(r)
     return {"id": r.id}
 
 @router.patch("/{rid}", response_model=dict)
-def update_recipe(rid: int, data: RecipeIn, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def update_recipe(rid: int, data: RecipeIn, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     r = db.query(Recipe).filter(Recipe.id == rid, Recipe.user_id == user.id).first()
     if not r:
         raise HTTPException(404, "Not found")
+    if (r.name, r.cuisine) != (data.name.strip(), data.cuisine.strip()):
+        patch_snapshot_recipe(db, r.id, data.name.strip(), data.cuisine.strip())
     r.name = data.name.strip()
     r.cuisine = data.cuisine.strip()
     r.notes = data.notes.strip()
-    for link in list(r.items):
-        db.delete(link)
+    # Delete old links up front so re-adding the same ingredient can't hit uq_recipe_ing
+    db.query(RecipeIngredient).filter(RecipeIngredient.recipe_id == r.id).delete(synchronize_session=False)
+    ing_ids = resolve_ingredients(db, [i.ingredient_name for i in data.items])
     for i in data.items:
-        ing = db.query(Ingredient).filter(Ingredient.name.ilike(i.ingredient_name.strip())).first()
-        if not ing:
-            ing = Ingredient(name=i.ingredient_name.strip()); db.add(ing); db.flush()
-        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing.id, quantity=float(i.quantity or 0), unit=(i.unit or "").strip()))
+        ing_id = ing_ids[normalize_ingredient_name(i.ingredient_name)]
+        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing_id, quantity=float(i.quantity or 0), unit=(i.unit or "").strip()))
+    db.flush()
+    refresh_recipe_vectors(db, [r.id])
+    refresh_recipe_search(db, [r.id])
+    bump_user_version(db, user.id)
     db.commit()
     return {"ok": True}
 
 @router.delete("/{rid}", response_model=dict)
-def delete_recipe(rid: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def delete_recipe(rid: int, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     r = db.query(Recipe).filter(Recipe.id == rid, Recipe.user_id == user.id).first()
     if not r:
         return {"ok": True}
+    patch_snapshot_recipe(db, r.id)
+    remove_from_search(db, [r.id])
+    bump_user_version(db, user.id)
     db.delete(r); db.commit()
     return {"ok": True}
@@ -2,9 +2,8 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from typing import Dict
 from sqlalchemy.orm import Session
-from ..deps import current_user, get_db
-from ..models import Setting, User
-import json
+from ..deps import Principal, current_principal, get_db
+from ..settings_service import set_cuisine_caps
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -12,13 +11,6 @@ class CapsIn(BaseModel):
     cuisine_caps: Dict[str, int] = {}
 
 @router.post("/caps", response_model=dict)
-def set_caps(data: CapsIn, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    rec = db.query(Setting).filter(Setting.user_id == user.id, Setting.key == "cuisine_caps").first()
-    payload = json.dumps(data.cuisine_caps)
-    if not rec:
-        rec = Setting(user_id=user.id, key="cuisine_caps", value=payload)
-        db.add(rec)
-    else:
-        rec.value = payload
-    db.commit()
+def set_caps(data: CapsIn, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    set_cuisine_caps(db, user.id, data.cuisine_caps)
     return {"ok": True}
@@ -0,0 +1,120 @@
+import base64
+import json
+import re
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import and_, bindparam, exists, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from .models import Ingredient, Recipe, RecipeIngredient, RECIPE_SEARCH_DDL
+from .queries import RecipeListRow, decode_recipe_cursor, encode_recipe_cursor
+
+# Recipe search over name, cuisine, notes and ingredient names. On SQLite it is an FTS5 table
+# (recipe_search, rowid = recipe id) ranked with bm25; the recipe write paths call
+# refresh_recipe_search / remove_from_search next to refresh_recipe_vectors, and
+# `python -m app.cli rebuild-search` repopulates it wholesale. Other databases fall back to a
+# LIKE scan (search_recipes_like), which is also the baseline in benchmarks/bench_search.py.
+# Each row carries an "owner" token (u<user id>), so a query only walks its user's postings.
+
+MAX_TERMS = 8
+# bm25 weights, in column order: name, cuisine, notes, ingredients, owner
+BM25_WEIGHTS = (10.0, 4.0, 1.0, 3.0, 0.0)
+_TERM = re.compile(r"\w+")
+
+_INDEX_ROWS = """
+    SELECT r.id, r.name, r.cuisine, r.notes,
+           coalesce((SELECT group_concat(i.name, ', ') FROM recipe_ingredients ri
+                     JOIN ingredients i ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id), ''),
+           'u' || r.user_id
+    FROM recipes r
+"""
+_INSERT = "INSERT INTO recipe_search (rowid, name, cuisine, notes, ingredients, owner) "
+
+def search_terms(q: str) -> List[str]:
+    return _TERM.findall(q)[:MAX_TERMS]
+
+def match_expression(user_id: int, terms: Sequence[str]) -> str:
+    # Every term is a quoted prefix query, so user input can't inject FTS5 syntax and
+    # "chick" finds "chickpeas". Terms only look at the content columns: "u" must not match
+    # every recipe through its owner token.
+    return f"owner:u{user_id} AND {{name cuisine notes ingredients}}:(" + " AND ".join(f'"{t}"*' for t in terms) + ")"
+
+def _uses_fts(bind) -> bool:
+    dialect = bind.get_bind().dialect if isinstance(bind, Session) else bind.dialect
+    return dialect.name == "sqlite"
+
+def refresh_recipe_search(db: Session, recipe_ids: Sequence[int]) -> None:
+    # Call after the recipe and its ingredient links are flushed
+    if not recipe_ids or not _uses_fts(db):
+        return
+    ids = list(recipe_ids)
+    remove_from_search(db, ids)
+    db.execute(text(_INSERT + _INDEX_ROWS + "WHERE r.id IN :ids").bindparams(bindparam("ids", expanding=True)), {"ids": ids})
+
+def remove_from_search(db: Session, recipe_ids: Sequence[int]) -> None:
+    if recipe_ids and _uses_fts(db):
+        db.execute(text("DELETE FROM recipe_search WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+                   {"ids": list(recipe_ids)})
+
+def rebuild_search(conn: Connection) -> int:
+    if not _uses_fts(conn):
+        return 0
+    conn.exec_driver_sql(RECIPE_SEARCH_DDL)
+    conn.exec_driver_sql("DELETE FROM recipe_search")
+    conn.exec_driver_sql(_INSERT + _INDEX_ROWS)
+    conn.exec_driver_sql("INSERT INTO recipe_search (recipe_search) VALUES ('optimize')")
+    return conn.exec_driver_sql("SELECT count(*) FROM recipe_search").scalar()
+
+def _encode_cursor(score: float, rid: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, rid]).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, rid = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(score), int(rid)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def search_recipes(db: Session, user_id: int, q: str, limit: int,
+                   cursor: Optional[str] = None) -> Tuple[List[RecipeListRow], Optional[str]]:
+    # Best match first; keyset pages on (score, id) so results don't shift between pages
+    terms = search_terms(q)
+    if not terms:
+        return [], None
+    if not _uses_fts(db):
+        return search_recipes_like(db, user_id, terms, limit, cursor)
+    after = _decode_cursor(cursor) if cursor else None
+    sql = f"""
+        SELECT r.id, r.name, r.cuisine, r.notes, s.score
+        FROM (SELECT rowid AS id, bm25(recipe_search, {', '.join(map(str, BM25_WEIGHTS))}) AS score
+              FROM recipe_search WHERE recipe_search MATCH :match) s
+        JOIN recipes r ON r.id = s.id
+        WHERE r.user_id = :uid {"AND (s.score, r.id) > (:score, :rid)" if after else ""}
+        ORDER BY s.score, r.id
+        LIMIT :n
+    """
+    params = {"match": match_expression(user_id, terms), "uid": user_id, "n": limit + 1}
+    if after:
+        params["score"], params["rid"] = after
+    rows = db.execute(text(sql), params).all()
+    next_cursor = _encode_cursor(rows[limit - 1].score, rows[limit - 1].id) if len(rows) > limit else None
+    return [RecipeListRow(*row[:4]) for row in rows[:limit]], next_cursor
+
+def _like(term: str) -> str:
+    return "%" + term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def search_recipes_like(db: Session, user_id: int, terms: Sequence[str], limit: int,
+                        cursor: Optional[str] = None) -> Tuple[List[RecipeListRow], Optional[str]]:
+    # Unranked: every term must appear in some field; ordered and paged by (name, id)
+    stmt = select(Recipe.id, Recipe.name, Recipe.cuisine, Recipe.notes).where(Recipe.user_id == user_id)
+    for term in terms:
+        pattern = _like(term)
+        in_ingredients = exists().where(RecipeIngredient.recipe_id == Recipe.id, Ingredient.id == RecipeIngredient.ingredient_id,
+                                        Ingredient.name_normalized.like(pattern, escape="\\"))
+        stmt = stmt.where(or_(Recipe.name.ilike(pattern, escape="\\"), Recipe.cuisine.ilike(pattern, escape="\\"),
+                              Recipe.notes.ilike(pattern, escape="\\"), in_ingredients))
+    if cursor:
+        after_name, after_id = decode_recipe_cursor(cursor)
+        stmt = stmt.where(or_(Recipe.name > after_name, and_(Recipe.name == after_name, Recipe.id > after_id)))
+    rows = [RecipeListRow(*row) for row in db.execute(stmt.order_by(Recipe.name, Recipe.id).limit(limit + 1))]
+    next_cursor = encode_recipe_cursor(rows[limit - 1].name, rows[limit - 1].id) if len(rows) > limit else None
+    return rows[:limit], next_cursor
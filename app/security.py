@@ -1,9 +1,15 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from itsdangerous import URLSafeSerializer, BadSignature
-from .config import SECRET_KEY
+from .config import (
+    SECRET_KEY, PASSWORD_HASH_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, PASSWORD_HASH_TIMEOUT,
+)
 
 # Use PBKDF2-SHA256 for portability and zero native deps
-pwd_ctx = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+_rounds = {"pbkdf2_sha256__rounds": PASSWORD_HASH_ROUNDS} if PASSWORD_HASH_ROUNDS else {}
+pwd_ctx = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto", **_rounds)
 
 def hash_password(password: str) -> str:
     return pwd_ctx.hash(password)
@@ -11,14 +17,40 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, password_hash: str) -> bool:
     return pwd_ctx.verify(password, password_hash)
 
+class HashingBusy(Exception):
+    pass
+
+# hashlib's PBKDF2 releases the GIL, so a small thread pool gives real parallelism while
+# leaving the request threadpool free for everything else. The semaphore caps running + queued work.
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+async def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HashingBusy("Too many password operations in flight")
+    fut = _hash_pool.submit(fn, *args)
+    fut.add_done_callback(lambda _: _hash_slots.release())
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(fut), PASSWORD_HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        fut.cancel()  # only succeeds while still queued; a running hash finishes and frees its slot
+        raise HashingBusy("Password hashing timed out")
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _run_hashing(verify_password, password, password_hash)
+
+# Serializers are immutable once built; sharing one avoids re-deriving the signer per request
+_session_serializer = URLSafeSerializer(SECRET_KEY, salt="session")
+
 def make_session_token(user_id: int) -> str:
-    s = URLSafeSerializer(SECRET_KEY, salt="session")
-    return s.dumps({"uid": user_id})
+    return _session_serializer.dumps({"uid": user_id})
 
 def read_session_token(token: str) -> int | None:
-    s = URLSafeSerializer(SECRET_KEY, salt="session")
     try:
-        data = s.loads(token)
+        data = _session_serializer.loads(token)
         return int(data.get("uid"))
     except (BadSignature, ValueError, TypeError):
         return None
@@ -0,0 +1,48 @@
+import copy
+import json
+from typing import Any, Dict
+from sqlalchemy.orm import Session
+from .cache import TTLCache, MISSING
+from .config import SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL
+from .models import Setting
+
+CUISINE_CAPS = "cuisine_caps"
+
+# Keyed by (user_id, key) -> parsed JSON value (None when unset or unparsable).
+# Per process: other workers see a write once their entry expires (SETTINGS_CACHE_TTL).
+cache = TTLCache(SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL)
+
+def get_setting(db: Session, user_id: int, key: str) -> Any:
+    value = cache.get((user_id, key))
+    if value is MISSING:
+        generation = cache.generation  # before the read, so a write committed meanwhile wins
+        raw = db.query(Setting.value).filter(Setting.user_id == user_id, Setting.key == key).scalar()
+        try:
+            value = json.loads(raw) if raw else None
+        except ValueError:
+            value = None
+        cache.set((user_id, key), value, generation)
+    # Callers get their own copy; the cached value is shared by every request
+    return copy.deepcopy(value)
+
+def set_setting(db: Session, user_id: int, key: str, value: Any) -> None:
+    payload = json.dumps(value)
+    rec = db.query(Setting).filter(Setting.user_id == user_id, Setting.key == key).first()
+    if not rec:
+        db.add(Setting(user_id=user_id, key=key, value=payload))
+    else:
+        rec.value = payload
+    try:
+        db.commit()
+    except Exception:
+        cache.pop((user_id, key))
+        raise
+    # Write through with a private copy so callers can't mutate the cached value
+    cache.write((user_id, key), json.loads(payload))
+
+def get_cuisine_caps(db: Session, user_id: int) -> Dict[str, int]:
+    caps = get_setting(db, user_id, CUISINE_CAPS)
+    return dict(caps) if isinstance(caps, dict) else {}
+
+def set_cuisine_caps(db: Session, user_id: int, caps: Dict[str, int]) -> None:
+    set_setting(db, user_id, CUISINE_CAPS, caps)
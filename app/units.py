@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import Dict, NamedTuple
+
+# Unit registry for grocery aggregation. Quantities in the same dimension (mass, volume,
+# count) convert through a base unit (g, ml, pcs); anything unknown is kept verbatim
+# and only merges with the exact same unit string.
+
+class Unit(NamedTuple):
+    canonical: str
+    dimension: str
+    factor: float  # size of one unit in the dimension's base unit
+
+_REGISTRY = {
+    "mass": {
+        "mg": (0.001, ["milligram", "milligrams"]),
+        "g": (1.0, ["gram", "grams", "gr", "gm"]),
+        "kg": (1000.0, ["kilogram", "kilograms", "kilo", "kilos", "kgs"]),
+        "oz": (28.349523125, ["ounce", "ounces"]),
+        "lb": (453.59237, ["lbs", "pound", "pounds"]),
+    },
+    "volume": {
+        "ml": (1.0, ["milliliter", "milliliters", "millilitre", "millilitres", "cc"]),
+        "l": (1000.0, ["liter", "liters", "litre", "litres", "ltr"]),
+        "tsp": (4.92892159375, ["teaspoon", "teaspoons", "tsps"]),
+        "tbsp": (14.78676478125, ["tablespoon", "tablespoons", "tbs", "tbl", "tbsps"]),
+        "fl oz": (29.5735295625, ["floz", "fluid ounce", "fluid ounces"]),
+        "cup": (236.5882365, ["cups", "c"]),
+        "pint": (473.176473, ["pints", "pt"]),
+        "quart": (946.352946, ["quarts", "qt"]),
+        "gallon": (3785.411784, ["gallons", "gal"]),
+    },
+    "count": {
+        "pcs": (1.0, ["pc", "piece", "pieces", "each", "ea"]),
+        "dozen": (12.0, ["doz"]),
+    },
+}
+
+def _compile() -> Dict[str, Unit]:
+    table: Dict[str, Unit] = {}
+    for dimension, units in _REGISTRY.items():
+        for canonical, (factor, aliases) in units.items():
+            unit = Unit(canonical, dimension, factor)
+            for alias in [canonical, *aliases]:
+                table[alias] = unit
+    return table
+
+# alias -> Unit, built once; canonical spellings hit on the first dict probe
+UNITS: Dict[str, Unit] = _compile()
+
+def _clean(unit: str) -> str:
+    return " ".join(unit.lower().replace(".", " ").split())
+
+def lookup(unit: str) -> Unit | None:
+    found = UNITS.get(unit)
+    if found is None and unit:
+        found = UNITS.get(_clean(unit))
+    return found
+
+def normalize_unit(unit: str) -> str:
+    found = lookup(unit)
+    return found.canonical if found else (unit or "").strip().lower()
+
+def unit_group(unit: str) -> str:
+    # Merge key for a unit: its dimension if known, otherwise the literal unit
+    found = lookup(unit)
+    return found.dimension if found else (unit or "").strip().lower()
+
+@lru_cache(maxsize=1024)
+def resolve_unit(unit: str) -> Unit:
+    # Canonical unit, merge group and factor in one call, memoized per raw spelling. Unknown
+    # units come back as their own group with factor 1, so they only merge with themselves.
+    found = lookup(unit)
+    if found is None:
+        literal = (unit or "").strip().lower()
+        return Unit(literal, literal, 1.0)
+    return found
+
+def convert(quantity: float, from_unit: str, to_unit: str) -> float:
+    if from_unit == to_unit:
+        return quantity
+    src, dst = lookup(from_unit), lookup(to_unit)
+    if not src or not dst or src.dimension != dst.dimension:
+        raise ValueError(f"Cannot convert {from_unit!r} to {to_unit!r}")
+    return quantity * src.factor / dst.factor
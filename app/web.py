@@ -6,18 +6,26 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Optional
 import json
 
-from .deps import get_db, current_user, current_user_optional
-from .models import User, Recipe, Ingredient, RecipeIngredient, Setting, Plan, PlanRecipe, GroceryItem
-from .planner import create_plan
+from .deps import Principal, get_db, current_principal, current_principal_optional
+from .models import Recipe, RecipeIngredient, Plan, GroceryItem, normalize_ingredient_name
+from .planner import create_plan, reroll_days, refresh_recipe_vectors
+from .events import hub, plan_topic
+from .etags import bump_plan_version, bump_user_version
+from .plan_view import plan_view, patch_snapshot_items, patch_snapshot_recipe
+from .queries import resolve_ingredients, recipe_page
+from .search import refresh_recipe_search, remove_from_search
+from .settings_service import get_cuisine_caps, set_cuisine_caps
 
 router = APIRouter()
 
 # Jinja templates
 templates = Jinja2Templates(directory="app/templates")
 
+RECIPES_PAGE_SIZE = 50
+
 # ---------- Auth pages ----------
 @router.get("/login", response_class=HTMLResponse)
-def login_page(request: Request, user: Optional[User] = Depends(current_user_optional)):
+def login_page(request: Request, user: Optional[Principal] = Depends(current_principal_optional)):
     if user:
         return RedirectResponse("/", status_code=303)
     return templates.TemplateResponse("auth_login.html", {"request": request})
@@ -28,7 +36,7 @@ def login_post(request: Request):
     return RedirectResponse("/login", status_code=303)
 
 @router.get("/register", response_class=HTMLResponse)
-def register_page(request: Request, user: Optional[User] = Depends(current_user_optional)):
+def register_page(request: Request, user: Optional[Principal] = Depends(current_principal_optional)):
     if user:
         return RedirectResponse("/", status_code=303)
     return templates.TemplateResponse("auth_register.html", {"request": request})
@@ -40,37 +48,12 @@ def logout_form():
 
 # ---------- Home / Plan ----------
 @router.get("/", response_class=HTMLResponse)
-def home(request: Request, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    # Load caps (safe JSON parse)
-    caps_rec = db.query(Setting).filter(Setting.user_id == user.id, Setting.key == "cuisine_caps").first()
-    try:
-        caps = (json.loads(caps_rec.value) if caps_rec and caps_rec.value else {}) or {}
-    except Exception:
-        caps = {}
-
-    # Get latest plan (if any)
-    current_plan = (
-        db.query(Plan)
-        .filter(Plan.user_id == user.id)
-        .order_by(Plan.id.desc())
-        .first()
-    )
+def home(request: Request, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    caps = get_cuisine_caps(db, user.id)
 
-    plan_data = None
-    if current_plan:
-        recipes = (
-            db.query(PlanRecipe)
-            .filter(PlanRecipe.plan_id == current_plan.id)
-            .order_by(PlanRecipe.day_index)
-            .all()
-        )
-        groceries = (
-            db.query(GroceryItem)
-            .filter(GroceryItem.plan_id == current_plan.id)
-            .order_by(GroceryItem.name)
-            .all()
-        )
-        plan_data = {"plan": current_plan, "recipes": recipes, "groceries": groceries}
+    # Latest plan (if any), as the JSON API renders it
+    view = plan_view(db, user.id)
+    plan_data = {"plan": view, "recipes": view["recipes"], "groceries": view["groceries"]} if view else None
 
     # Always render the template; never return empty content
     return templates.TemplateResponse(
@@ -79,12 +62,13 @@ def home(request: Request, user: User = Depends(current_user), db: Session = Dep
     )
 
 @router.post("/plan/new")
-def plan_new(days: int = Form(7), request: Request = None, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    # replace any existing plan for simplicity (one active plan per user)
-    old = db.query(Plan).filter(Plan.user_id == user.id).all()
-    for p in old:
-        db.delete(p)
-    db.commit()
+def plan_new(days: int = Form(7), request: Request = None, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    # same length: reroll the latest plan in place so grocery ticks survive; otherwise add a new
+    # plan and keep the old ones (home shows the latest)
+    current = db.query(Plan).filter(Plan.user_id == user.id).order_by(Plan.id.desc()).first()
+    if current and current.days == days:
+        hub.publish(plan_topic(current.id), "plan", {"changed": reroll_days(db, user.id, current.id)})
+        return RedirectResponse("/", status_code=303)
     try:
         create_plan(db, user.id, days, None)
     except ValueError:
@@ -93,18 +77,17 @@ def plan_new(days: int = Form(7), request: Request = None, user: User = Depends(
     return RedirectResponse("/", status_code=303)
 
 @router.post("/plan/reroll")
-def plan_reroll(user: User = Depends(current_user), db: Session = Depends(get_db)):
-    # delete and recreate
+def plan_reroll(user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     current = db.query(Plan).filter(Plan.user_id == user.id).order_by(Plan.id.desc()).first()
-    days = current.days if current else 7
     if current:
-        db.delete(current); db.commit()
-    create_plan(db, user.id, days, None)
+        hub.publish(plan_topic(current.id), "plan", {"changed": reroll_days(db, user.id, current.id)})
+    else:
+        create_plan(db, user.id, 7, None)
     return RedirectResponse("/", status_code=303)
 
 # ---------- Grocery checkbox toggle ----------
 @router.post("/grocery/toggle")
-def grocery_toggle(item_id: int = Form(...), user: User = Depends(current_user), db: Session = Depends(get_db)):
+def grocery_toggle(item_id: int = Form(...), user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     gi = db.query(GroceryItem).filter(GroceryItem.id == item_id).first()
     if not gi:
         raise HTTPException(404, "Not found")
@@ -112,18 +95,21 @@ def grocery_toggle(item_id: int = Form(...), user: User = Depends(current_user),
     if not plan:
         raise HTTPException(403, "Forbidden")
     gi.checked = 0 if gi.checked else 1
+    patch_snapshot_items(db, plan, {gi.id: bool(gi.checked)})
+    bump_plan_version(plan)
+    state, topic = {"id": gi.id, "checked": bool(gi.checked)}, plan_topic(gi.plan_id)
     db.commit()
+    hub.publish(topic, "items", {"items": [state]})
     return RedirectResponse("/", status_code=303)
 
 # ---------- Settings (Cuisine caps) ----------
 @router.get("/settings", response_class=HTMLResponse)
-def settings_page(request: Request, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    rec = db.query(Setting).filter(Setting.user_id == user.id, Setting.key == "cuisine_caps").first()
-    text = rec.value if rec else "{}"
+def settings_page(request: Request, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    text = json.dumps(get_cuisine_caps(db, user.id))
     return templates.TemplateResponse("settings.html", {"request": request, "user": user, "caps_json": text})
 
 @router.post("/settings")
-def settings_save(cuisine_caps_json: str = Form("{}"), user: User = Depends(current_user), db: Session = Depends(get_db)):
+def settings_save(cuisine_caps_json: str = Form("{}"), user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     try:
         parsed = json.loads(cuisine_caps_json)
         assert isinstance(parsed, dict)
@@ -131,23 +117,22 @@ def settings_save(cuisine_caps_json: str = Form("{}"), user: User = Depends(curr
             assert isinstance(k, str) and isinstance(v, int) and v >= 0
     except Exception:
         raise HTTPException(400, "Invalid JSON for cuisine caps. Use e.g. {\"Mexican\":2, \"Asian\":1}")
-    rec = db.query(Setting).filter(Setting.user_id == user.id, Setting.key == "cuisine_caps").first()
-    if not rec:
-        rec = Setting(user_id=user.id, key="cuisine_caps", value=json.dumps(parsed))
-        db.add(rec)
-    else:
-        rec.value = json.dumps(parsed)
-    db.commit()
+    set_cuisine_caps(db, user.id, parsed)
     return RedirectResponse("/settings", status_code=303)
 
 # ---------- Recipes ----------
 @router.get("/recipes", response_class=HTMLResponse)
-def recipes_list(request: Request, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    recipes = db.query(Recipe).filter(Recipe.user_id == user.id).order_by(Recipe.name).all()
-    return templates.TemplateResponse("recipes.html", {"request": request, "user": user, "recipes": recipes})
+def recipes_list(request: Request, cursor: Optional[str] = None, cuisine: Optional[str] = None, prefix: Optional[str] = None,
+                 user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
+    try:
+        recipes, next_cursor = recipe_page(db, user.id, RECIPES_PAGE_SIZE, cursor, cuisine, prefix)
+    except ValueError:
+        return RedirectResponse("/recipes", status_code=303)
+    return templates.TemplateResponse("recipes.html", {"request": request, "user": user, "recipes": recipes,
+                                                       "next_cursor": next_cursor, "cuisine": cuisine, "prefix": prefix})
 
 @router.get("/recipes/new", response_class=HTMLResponse)
-def recipes_new(request: Request, user: User = Depends(current_user)):
+def recipes_new(request: Request, user: Principal = Depends(current_principal)):
     return templates.TemplateResponse("recipe_form.html", {"request": request, "user": user, "recipe": None, "items_json": "[]"} )
 
 @router.post("/recipes/new")
@@ -156,7 +141,7 @@ def recipes_create(
     cuisine: str = Form(...),
     notes: str = Form(""),
     items_json: str = Form("[]"),
-    user: User = Depends(current_user),
+    user: Principal = Depends(current_principal),
     db: Session = Depends(get_db),
 ):
     try:
@@ -165,20 +150,21 @@ def recipes_create(
         items = []
     r = Recipe(user_id=user.id, name=name.strip(), cuisine=cuisine.strip(), notes=notes.strip())
     db.add(r); db.flush()
+    items = [item for item in items if (item.get("ingredient_name") or "").strip()]
+    ing_ids = resolve_ingredients(db, [item["ingredient_name"] for item in items])
     for item in items:
-        iname = (item.get("ingredient_name") or "").strip()
-        if not iname:
-            continue
-        ing = db.query(Ingredient).filter(Ingredient.name.ilike(iname)).first()
-        if not ing:
-            ing = Ingredient(name=iname); db.add(ing); db.flush()
-        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing.id,
+        ing_id = ing_ids[normalize_ingredient_name(item["ingredient_name"])]
+        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing_id,
                                 quantity=float(item.get("quantity") or 0), unit=(item.get("unit") or "").strip()))
+    db.flush()
+    refresh_recipe_vectors(db, [r.id])
+    refresh_recipe_search(db, [r.id])
+    bump_user_version(db, user.id)
     db.commit()
     return RedirectResponse("/recipes", status_code=303)
 
 @router.get("/recipes/{rid}", response_class=HTMLResponse)
-def recipes_edit(rid: int, request: Request, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def recipes_edit(rid: int, request: Request, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     r = db.query(Recipe).filter(Recipe.id == rid, Recipe.user_id == user.id).first()
     if not r:
         raise HTTPException(404, "Not found")
@@ -196,36 +182,42 @@ def recipes_update(
     cuisine: str = Form(...),
     notes: str = Form(""),
     items_json: str = Form("[]"),
-    user: User = Depends(current_user),
+    user: Principal = Depends(current_principal),
     db: Session = Depends(get_db),
 ):
     r = db.query(Recipe).filter(Recipe.id == rid, Recipe.user_id == user.id).first()
     if not r:
         raise HTTPException(404, "Not found")
+    if (r.name, r.cuisine) != (name.strip(), cuisine.strip()):
+        patch_snapshot_recipe(db, r.id, name.strip(), cuisine.strip())
     r.name = name.strip()
     r.cuisine = cuisine.strip()
     r.notes = notes.strip()
-    for link in list(r.items):
-        db.delete(link)
+    # Delete old links up front so re-adding the same ingredient can't hit uq_recipe_ing
+    db.query(RecipeIngredient).filter(RecipeIngredient.recipe_id == r.id).delete(synchronize_session=False)
     try:
         items = json.loads(items_json)
     except Exception:
         items = []
+    items = [item for item in items if (item.get("ingredient_name") or "").strip()]
+    ing_ids = resolve_ingredients(db, [item["ingredient_name"] for item in items])
     for item in items:
-        iname = (item.get("ingredient_name") or "").strip()
-        if not iname:
-            continue
-        ing = db.query(Ingredient).filter(Ingredient.name.ilike(iname)).first()
-        if not ing:
-            ing = Ingredient(name=iname); db.add(ing); db.flush()
-        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing.id,
+        ing_id = ing_ids[normalize_ingredient_name(item["ingredient_name"])]
+        db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing_id,
                                 quantity=float(item.get("quantity") or 0), unit=(item.get("unit") or "").strip()))
+    db.flush()
+    refresh_recipe_vectors(db, [r.id])
+    refresh_recipe_search(db, [r.id])
+    bump_user_version(db, user.id)
     db.commit()
     return RedirectResponse("/recipes", status_code=303)
 
 @router.post("/recipes/{rid}/delete")
-def recipes_delete(rid: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
+def recipes_delete(rid: int, user: Principal = Depends(current_principal), db: Session = Depends(get_db)):
     r = db.query(Recipe).filter(Recipe.id == rid, Recipe.user_id == user.id).first()
     if r:
+        patch_snapshot_recipe(db, r.id)
+        remove_from_search(db, [r.id])
+        bump_user_version(db, user.id)
         db.delete(r); db.commit()
     return RedirectResponse("/recipes", status_code=303)
@@ -0,0 +1,72 @@
+"""Throughput and tail latency of the JSON API with the sync vs. the async DB stack.
+
+Each mode runs in a fresh interpreter (ASYNC_DB is read at import) against its own
+SQLite file, with CLIENTS concurrent clients mixing plan reads and grocery toggles.
+
+Run from the repo root:  python -m benchmarks.bench_async_db
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CLIENTS = 50
+REQUESTS_PER_CLIENT = 40
+
+
+async def _drive():
+    from httpx import AsyncClient, ASGITransport
+    from app.main import app
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as ac:
+        creds = {"email": "bench@example.com", "password": "SuperSecret1"}
+        await ac.post("/auth/register", json=creds)
+        ac.cookies = (await ac.post("/auth/login", json=creds)).cookies
+        rows = [{"name": f"Dish {i}", "cuisine": f"C{i % 6}",
+                 "items": [{"ingredient_name": f"Ing {(i + j) % 40}", "quantity": 1, "unit": "g"} for j in range(6)]}
+                for i in range(200)]
+        await ac.post("/recipes/bulk", json=rows)
+        pid = (await ac.post("/plans", json={"days": 14})).json()["id"]
+        items = [g["id"] for g in (await ac.get(f"/plans/{pid}")).json()["groceries"]]
+
+        latencies = []
+
+        async def client(n):
+            for i in range(REQUESTS_PER_CLIENT):
+                t0 = time.perf_counter()
+                if i % 4 == 0:
+                    r = await ac.post(f"/grocery/{items[(n + i) % len(items)]}/toggle")
+                else:
+                    r = await ac.get(f"/plans/{pid}")
+                assert r.status_code == 200, r.text
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(n) for n in range(CLIENTS)))
+        elapsed = time.perf_counter() - t0
+    q = statistics.quantiles(latencies, n=100)
+    return {"rps": len(latencies) / elapsed, "p50_ms": q[49] * 1000, "p95_ms": q[94] * 1000, "p99_ms": q[98] * 1000}
+
+
+def _child():
+    print(json.dumps(asyncio.run(_drive())))
+
+
+def main():
+    for mode in ("false", "true"):
+        env = dict(os.environ, ASYNC_DB=mode, DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/bench_async.db")
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_async_db", "--child"],
+                             env=env, capture_output=True, text=True, check=True)
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        label = "async" if mode == "true" else "sync"
+        print(f"{label:>5}: {res['rps']:7.0f} req/s  p50 {res['p50_ms']:6.1f} ms  "
+              f"p95 {res['p95_ms']:6.1f} ms  p99 {res['p99_ms']:6.1f} ms")
+
+
+if __name__ == "__main__":
+    _child() if "--child" in sys.argv else main()
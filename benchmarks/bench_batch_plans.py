@@ -0,0 +1,72 @@
+"""Batch plan generation for many users: create_plan per user vs. app.batch.generate_plans.
+
+Uses a temporary SQLite file with the production PRAGMAs so per-transaction commit cost is real.
+
+Run from the repo root:  python -m benchmarks.bench_batch_plans [workers]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.batch import PlanJob, generate_plans
+from app.database import Base, make_engine
+from app.models import User, Ingredient, Recipe, RecipeIngredient
+from app.planner import create_plan, refresh_recipe_vectors
+
+USERS = 2_000
+RECIPES_PER_USER = 40
+INGREDIENTS = 500
+ITEMS_PER_RECIPE = 8
+DAYS = 7
+CUISINES = ["Mexican", "Asian", "Italian", "Indian"]
+
+
+def seed(db):
+    rng = random.Random(5)
+    db.execute(insert(User), [{"email": f"u{i}@example.com", "password_hash": "x"} for i in range(USERS)])
+    db.execute(insert(Ingredient), [{"name": f"Ingredient {i}", "name_normalized": f"ingredient {i}"} for i in range(INGREDIENTS)])
+    db.execute(insert(Recipe), [{"user_id": u + 1, "name": f"Recipe {i}", "cuisine": rng.choice(CUISINES), "notes": ""}
+                                for u in range(USERS) for i in range(RECIPES_PER_USER)])
+    n = USERS * RECIPES_PER_USER
+    db.execute(insert(RecipeIngredient), [
+        {"recipe_id": r + 1, "ingredient_id": ing + 1, "quantity": rng.randint(1, 50), "unit": rng.choice(["g", "cup", "pcs"])}
+        for r in range(n) for ing in rng.sample(range(INGREDIENTS), ITEMS_PER_RECIPE)
+    ])
+    refresh_recipe_vectors(db, list(range(1, n + 1)))
+    db.commit()
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        with Session() as db:
+            seed(db)
+        users = list(range(1, USERS + 1))
+
+        with Session() as db:
+            t0 = time.perf_counter()
+            for uid in users:
+                create_plan(db, uid, DAYS, {"Mexican": 2})
+            single = time.perf_counter() - t0
+
+        print(f"{USERS} users x {RECIPES_PER_USER} recipes, {DAYS}-day plans")
+        print(f"  create_plan loop    : {USERS / single:8.0f} plans/s")
+        for w in sorted({0, workers} - {1}):
+            with Session() as db:
+                jobs = [PlanJob(uid, DAYS, caps={"Mexican": 2}) for uid in users]
+                _, stats = generate_plans(db, jobs, workers=w)
+            label = f"batch, {w} workers" if w else "batch, inline"
+            print(f"  {label:<20}: {stats['plans_per_s']:8.0f} plans/s  "
+                  f"(prefetch {stats['prefetch_s']:.2f}s, generate {stats['generate_s']:.2f}s, write {stats['write_s']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
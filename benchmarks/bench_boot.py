@@ -0,0 +1,49 @@
+"""Worker boot time: import-time create_all (old) vs. the migration version check (new).
+
+Each sample is a fresh interpreter, like a uvicorn/gunicorn worker starting, against an
+already-provisioned SQLite file. Reports import time and the schema step separately.
+
+Run from the repo root:  python -m benchmarks.bench_boot
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SAMPLES = 10
+
+STEPS = {
+    "create_all at boot": "Base.metadata.create_all(bind=engine)",
+    "migration check": "migrate(engine)",
+}
+
+SCRIPT = """
+import time
+t0 = time.perf_counter()
+import app.main
+from app.database import Base, engine
+from app.migrations import migrate
+t1 = time.perf_counter()
+{step}
+print(t1 - t0, time.perf_counter() - t1)
+"""
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/boot.db"}
+        subprocess.run([sys.executable, "-m", "app.cli", "migrate"], env=env, check=True, capture_output=True)
+        for label, step in STEPS.items():
+            samples = [
+                [float(x) for x in subprocess.run([sys.executable, "-c", SCRIPT.format(step=step)], env=env,
+                                                  check=True, capture_output=True, text=True).stdout.split()]
+                for _ in range(SAMPLES)
+            ]
+            imports = statistics.median(s[0] for s in samples)
+            schema = statistics.median(s[1] for s in samples)
+            print(f"{label:<20} imports {imports * 1000:7.1f} ms   schema step {schema * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Plan grocery aggregation from a 10k-recipe library: join + per-item normalization vs.
+precomputed per-recipe ingredient vectors.
+
+Run from the repo root:  python -m benchmarks.bench_grocery_vectors
+"""
+import random
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import User, Ingredient, Recipe, RecipeIngredient
+from app.planner import aggregate_groceries, load_recipe_vectors, merge_vectors, refresh_recipe_vectors
+from app.queries import ingredient_lines_for_recipes
+
+RECIPES = 10_000
+INGREDIENTS = 2_000
+ITEMS_PER_RECIPE = 10
+PLANS = 500
+DAYS = 14
+UNITS = ["g", "kg", "cup", "Tbsp", "tsp", "pcs", " ml ", ""]
+
+
+def seed():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(User(email="bench@example.com", password_hash="x")); db.flush()
+    db.execute(insert(Ingredient), [{"name": f"Ingredient {i}", "name_normalized": f"ingredient {i}"} for i in range(INGREDIENTS)])
+    db.execute(insert(Recipe), [{"user_id": 1, "name": f"Recipe {i}", "cuisine": "Any", "notes": ""} for i in range(RECIPES)])
+    rng = random.Random(7)
+    db.execute(insert(RecipeIngredient), [
+        {"recipe_id": r + 1, "ingredient_id": ing + 1, "quantity": rng.randint(1, 500) / 10, "unit": rng.choice(UNITS)}
+        for r in range(RECIPES) for ing in rng.sample(range(INGREDIENTS), ITEMS_PER_RECIPE)
+    ])
+    refresh_recipe_vectors(db, list(range(1, RECIPES + 1)))
+    db.commit()
+    return db
+
+
+def main():
+    db = seed()
+    rng = random.Random(11)
+    plans = [rng.sample(range(1, RECIPES + 1), DAYS) for _ in range(PLANS)]
+
+    t0 = time.perf_counter()
+    for ids in plans:
+        lines = ingredient_lines_for_recipes(db, ids)
+        legacy = aggregate_groceries(lines[i] for i in ids)
+    t_lines = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for ids in plans:
+        vectors = load_recipe_vectors(db, ids)
+        merged = merge_vectors(vectors[i] for i in ids)
+    t_vectors = time.perf_counter() - t0
+
+    assert {k: round(v["quantity"], 6) for k, v in legacy.items()} == {k: round(v["quantity"], 6) for k, v in merged.items()}
+    print(f"{PLANS} plans x {DAYS} days from {RECIPES} recipes ({ITEMS_PER_RECIPE} items each)")
+    print(f"  join + normalize : {t_lines * 1000 / PLANS:7.3f} ms/plan")
+    print(f"  vectors          : {t_vectors * 1000 / PLANS:7.3f} ms/plan  ({t_lines / t_vectors:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""HTTP benchmark suite for the hot endpoints, with JSON output for tracking regressions.
+
+Seeds a fresh SQLite file with synthetic users/recipes/ingredients (the same generator as
+`python -m app.cli seed`), then drives the app in-process through httpx.ASGITransport, or a
+running server with --url (point its DATABASE_URL at the same --db file). Each scenario issues
+--requests requests from --concurrency concurrent clients and reports throughput and
+p50/p95/p99 latency:
+
+  login        POST /auth/login
+  list_recipes GET  /recipes
+  add_recipe   POST /recipes
+  new_plan     POST /plans
+  get_plan     GET  /plans/{pid}
+  toggle       POST /grocery/{id}/toggle
+  check_all    PATCH /grocery      every item on the user's plan in one request
+  home         GET  /            (HTML; app.web is mounted for the run)
+  recipes_304  GET  /recipes       with If-None-Match: the ETag revalidation path
+  plan_304     GET  /plans/{pid}   with If-None-Match
+
+The tree ships home.html without its base.html layout, so the in-process run renders it inside
+a minimal stand-in layout; the route's queries and the page body are real.
+
+Run from the repo root:
+  python -m benchmarks.bench_http --users 50 --recipes 40 --out bench.json
+  python -m benchmarks.bench_http --compare bench.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+SCENARIOS = ["login", "list_recipes", "add_recipe", "new_plan", "get_plan", "toggle", "check_all", "home", "recipes_304", "plan_304"]
+PASSWORD = "SuperSecret1"
+
+
+def _parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.bench_http")
+    p.add_argument("--users", type=int, default=20)
+    p.add_argument("--recipes", type=int, default=40, help="recipes per user")
+    p.add_argument("--ingredients", type=int, default=500)
+    p.add_argument("--items", type=int, default=8, help="ingredients per recipe")
+    p.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--scenarios", default=",".join(SCENARIOS))
+    p.add_argument("--db", help="SQLite file to create (default: a temp file)")
+    p.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", help="also write the JSON report here")
+    p.add_argument("--compare", help="previous JSON report; print p95/throughput ratios against it")
+    p.add_argument("--max-regression", type=float, default=None,
+                   help="with --compare: exit 1 if any p95 grows by more than this fraction")
+    return p.parse_args(argv)
+
+
+def _percentile(sorted_ms, pct):
+    if not sorted_ms:
+        return None
+    k = max(0, min(len(sorted_ms) - 1, round(pct / 100 * len(sorted_ms) + 0.5) - 1))
+    return round(sorted_ms[k], 3)
+
+
+def _summary(latencies, errors, wall):
+    ms = sorted(x * 1000 for x in latencies)
+    return {
+        "requests": len(latencies), "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50_ms": _percentile(ms, 50), "p95_ms": _percentile(ms, 95), "p99_ms": _percentile(ms, 99),
+        "max_ms": round(ms[-1], 3) if ms else None,
+    }
+
+
+async def _run(n, concurrency, make_request):
+    # make_request(i) -> awaitable httpx.Response; non-2xx/3xx responses count as errors
+    latencies, errors = [], 0
+    counter = iter(range(n))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            r = await make_request(i)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summary(latencies, errors, time.perf_counter() - t0)
+
+
+async def _bench(args, client, emails):
+    results = {}
+    wanted = [s for s in args.scenarios.split(",") if s]
+    cookies = []
+    t0 = time.perf_counter()
+    for email in emails:
+        r = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+        r.raise_for_status()
+        cookies.append(dict(r.cookies))
+    print(f"logged in {len(emails)} users in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    user = lambda i: cookies[i % len(cookies)]
+
+    async def login(i):
+        return await client.post("/auth/login", json={"email": emails[i % len(emails)], "password": PASSWORD})
+
+    async def list_recipes(i):
+        return await client.get("/recipes", cookies=user(i))
+
+    async def add_recipe(i):
+        return await client.post("/recipes", cookies=user(i), json={
+            "name": f"Bench dish {i}", "cuisine": "Bench", "notes": "",
+            "items": [{"ingredient_name": f"synthetic ingredient {(i + j) % args.ingredients}", "quantity": 1, "unit": "g"}
+                      for j in range(min(args.items, args.ingredients))]})
+
+    plans = {}
+
+    async def new_plan(i):
+        r = await client.post("/plans", cookies=user(i), json={"days": 7})
+        if r.status_code == 200:
+            plans[i % len(cookies)] = r.json()["id"]
+        return r
+
+    async def get_plan(i):
+        return await client.get(f"/plans/{plans[i % len(cookies)]}", cookies=user(i))
+
+    groceries = {}
+
+    async def toggle(i):
+        items = groceries[i % len(cookies)]
+        return await client.post(f"/grocery/{items[(i // len(cookies)) % len(items)]}/toggle", cookies=user(i))
+
+    async def check_all(i):
+        items = groceries[i % len(cookies)]
+        checked = bool((i // len(cookies)) % 2)
+        return await client.patch("/grocery", cookies=user(i), json=[{"id": g, "checked": checked} for g in items])
+
+    async def home(i):
+        return await client.get("/", cookies=user(i))
+
+    etags = {}
+
+    async def recipes_304(i):
+        u = i % len(cookies)
+        if u not in etags:
+            etags[u] = (await client.get("/recipes", cookies=user(i))).headers["etag"]
+        return await client.get("/recipes", cookies=user(i), headers={"If-None-Match": etags[u]})
+
+    plan_etags = {}
+
+    async def plan_304(i):
+        u = i % len(cookies)
+        if u not in plan_etags:
+            plan_etags[u] = (await client.get(f"/plans/{plans[u]}", cookies=user(i))).headers["etag"]
+        return await client.get(f"/plans/{plans[u]}", cookies=user(i), headers={"If-None-Match": plan_etags[u]})
+
+    for name in wanted:
+        if name in ("get_plan", "toggle", "check_all", "plan_304") and len(plans) < len(cookies):
+            # Every user needs a plan (and its grocery ids) first
+            for u in range(len(cookies)):
+                if u not in plans:
+                    await new_plan(u)
+        if name in ("toggle", "check_all") and not groceries:
+            for u, pid in plans.items():
+                groceries[u] = [g["id"] for g in (await client.get(f"/plans/{pid}", cookies=user(u))).json()["groceries"]]
+        fn = locals()[name]
+        results[name] = await _run(args.requests, args.concurrency, fn)
+        print(f"{name:<13} {results[name]['throughput_rps']:>8} req/s  p50 {results[name]['p50_ms']} ms  "
+              f"p95 {results[name]['p95_ms']} ms  p99 {results[name]['p99_ms']} ms", file=sys.stderr)
+    return results
+
+
+def _compare(report, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        base = json.load(f)["results"]
+    worst = 0.0
+    for name, cur in report["results"].items():
+        old = base.get(name)
+        if not old or not old.get("p95_ms") or not cur.get("p95_ms"):
+            continue
+        p95 = cur["p95_ms"] / old["p95_ms"] - 1
+        rps = cur["throughput_rps"] / old["throughput_rps"] - 1 if old.get("throughput_rps") else 0.0
+        worst = max(worst, p95)
+        print(f"{name:<13} p95 {p95:+7.1%}  throughput {rps:+7.1%}", file=sys.stderr)
+    return max_regression is None or worst <= max_regression
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    tmp = None
+    if not args.db:
+        tmp = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmp.name, "bench.db")
+    # The app reads DATABASE_URL at import time, so set it before importing anything from app
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+
+    import httpx
+    from app import cli
+    from app.database import engine
+
+    seed_args = argparse.Namespace(users=args.users, recipes=args.recipes, ingredients=args.ingredients, items=args.items,
+                                   prefix="synthetic", password=PASSWORD, seed=args.seed, chunk=500)
+    seeded = cli.cmd_seed(seed_args)
+    emails = [f"synthetic{i}@example.com" for i in range(args.users)]
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from jinja2 import ChoiceLoader, DictLoader
+        from app import web
+        from app.main import app
+        web.templates.env.loader = ChoiceLoader([web.templates.env.loader, DictLoader(
+            {"base.html": "<!doctype html><html><body>{% block content %}{% endblock %}</body></html>"})])
+        app.include_router(web.router)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    async def go():
+        async with client:
+            return await _bench(args, client, emails)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "target": args.url or "in-process (httpx.ASGITransport)",
+            "users": args.users, "recipes_per_user": args.recipes, "ingredients": args.ingredients,
+            "items_per_recipe": args.items, "requests": args.requests, "concurrency": args.concurrency,
+            "seed_s": seeded["elapsed_s"],
+        },
+        "results": asyncio.run(go()),
+    }
+    engine.dispose()
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    ok = _compare(report, args.compare, args.max_regression) if args.compare else True
+    if tmp:
+        tmp.cleanup()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Latency of an unrelated endpoint (GET /me) while a burst of logins is hashing passwords.
+
+Compares hashing inline on the request threadpool (the previous behaviour) against the
+dedicated hashing pool in app.security.
+
+Run from the repo root:  python -m benchmarks.bench_login_storm
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_login.db")
+# Let the whole storm queue so both modes do the same amount of hashing
+os.environ.setdefault("PASSWORD_HASH_QUEUE", "10000")
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from httpx import AsyncClient, ASGITransport  # noqa: E402
+
+from app import auth  # noqa: E402
+from app.main import app  # noqa: E402
+from app.security import verify_password  # noqa: E402
+
+STORM = 300
+PROBES = 100
+PROBE_INTERVAL = 0.02
+CREDS = {"email": "storm@example.com", "password": "SuperSecret1"}
+
+
+async def _inline_verify(password, password_hash):
+    return await run_in_threadpool(verify_password, password, password_hash)
+
+
+def _pct(samples, p):
+    return statistics.quantiles(samples, n=100)[p - 1] * 1000
+
+
+async def run(mode):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as ac:
+        await ac.post("/auth/register", json=CREDS)
+        r = await ac.post("/auth/login", json=CREDS)
+        ac.cookies = r.cookies
+
+        async def login():
+            return (await ac.post("/auth/login", json=CREDS)).status_code
+
+        async def timed_me():
+            t0 = time.perf_counter()
+            await ac.get("/me")
+            return time.perf_counter() - t0
+
+        async def probe():
+            # Fire at a fixed rate rather than back-to-back, so one stalled request
+            # shows up as many slow samples instead of a single outlier
+            tasks = []
+            for _ in range(PROBES):
+                tasks.append(asyncio.create_task(timed_me()))
+                await asyncio.sleep(PROBE_INTERVAL)
+            return await asyncio.gather(*tasks)
+
+        t0 = time.perf_counter()
+        storm = asyncio.gather(*(login() for _ in range(STORM)))
+        samples = await probe()
+        codes = await storm
+        elapsed = time.perf_counter() - t0
+    print(f"{mode:>6}: /me p50 {_pct(samples, 50):7.1f} ms  p99 {_pct(samples, 99):7.1f} ms  max {max(samples) * 1000:7.1f} ms  "
+          f"| logins ok {codes.count(200)}, 503 {codes.count(503)}  | wall {elapsed:.2f}s")
+
+
+def main():
+    original = auth.verify_password_async
+    auth.verify_password_async = _inline_verify
+    asyncio.run(run("inline"))
+    auth.verify_password_async = original
+    asyncio.run(run("pool"))
+
+
+if __name__ == "__main__":
+    main()
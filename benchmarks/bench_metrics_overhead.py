@@ -0,0 +1,130 @@
+"""Overhead of request/SQL instrumentation, checked against a stated budget.
+
+Budget:
+  * MetricsMiddleware: <= 50 us per request (bare route, no DB)
+  * cursor hooks:      <= 15 us per statement (SELECT 1 on in-memory SQLite, the worst case;
+                       most of it is SQLAlchemy's event dispatch path, not our listener)
+  * end to end:        <= 5% on GET /plans/{pid} against a seeded SQLite file
+Exits non-zero when any is exceeded.
+
+Run from the repo root:  python -m benchmarks.bench_metrics_overhead
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}/metrics.db"
+os.environ["METRICS_ENABLED"] = "false"  # instrument by hand below, so both variants share one app
+
+from fastapi import FastAPI  # noqa: E402
+from httpx import AsyncClient, ASGITransport  # noqa: E402
+from sqlalchemy import create_engine, event, text  # noqa: E402
+
+from app import metrics  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.migrations import migrate  # noqa: E402
+
+REQUEST_BUDGET_US = 50
+QUERY_BUDGET_US = 15
+ENDPOINT_BUDGET = 0.05
+REQUESTS = 5_000
+QUERIES = 20_000
+PLAN_GETS = 1_000
+ROUNDS = 5
+
+
+async def _drive(asgi, path, n, headers=()):
+    # Bare ASGI calls so client/transport cost doesn't drown the difference
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    t0 = time.perf_counter()
+    for _ in range(n):
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+                 "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+                 "headers": list(headers), "client": ("127.0.0.1", 1), "server": ("test", 80)}
+        await asgi(scope, receive, send)
+    return (time.perf_counter() - t0) / n
+
+
+def _bare_app(instrumented):
+    a = FastAPI()
+
+    @a.get("/items/{iid}")
+    async def item(iid: int):
+        return {"id": iid}
+
+    if instrumented:
+        a.add_middleware(metrics.MetricsMiddleware)
+    return a
+
+
+def _queries(instrumented, n):
+    eng = create_engine("sqlite://")
+    if instrumented:
+        metrics.instrument_engine(eng)
+    with eng.connect() as conn:
+        stmt = text("SELECT 1")
+        t0 = time.perf_counter()
+        for _ in range(n):
+            conn.execute(stmt)
+        return (time.perf_counter() - t0) / n
+
+
+async def _seed_plan():
+    migrate(engine)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/auth/register", json={"email": "bench@example.com", "password": "SuperSecret1"})
+        ac.cookies = (await ac.post("/auth/login", json={"email": "bench@example.com", "password": "SuperSecret1"})).cookies
+        for i in range(20):
+            await ac.post("/recipes", json={"name": f"Dish {i}", "cuisine": "Any", "notes": "", "items": [
+                {"ingredient_name": f"Item {(i + j) % 30}", "quantity": 1, "unit": "g"} for j in range(6)]})
+        pid = (await ac.post("/plans", json={"days": 7})).json()["id"]
+        cookie = "; ".join(f"{k}={v}" for k, v in ac.cookies.items())
+    return f"/plans/{pid}", [(b"cookie", cookie.encode())]
+
+
+def _instrument_main(on):
+    if on:
+        metrics.instrument_engine(engine)
+    elif event.contains(engine, "before_cursor_execute", metrics._before_cursor_execute):
+        event.remove(engine, "before_cursor_execute", metrics._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", metrics._after_cursor_execute)
+
+
+def main():
+    path, headers = asyncio.run(_seed_plan())
+    plain, timed = _bare_app(False), _bare_app(True)
+    wrapped = metrics.MetricsMiddleware(app)
+    req, qry, end = ({False: [], True: []} for _ in range(3))
+    for _ in range(ROUNDS):  # interleave so drift hits both sides equally
+        for flag in (False, True):
+            req[flag].append(asyncio.run(_drive(timed if flag else plain, "/items/1", REQUESTS)))
+            qry[flag].append(_queries(flag, QUERIES))
+            _instrument_main(flag)
+            end[flag].append(asyncio.run(_drive(wrapped if flag else app, path, PLAN_GETS, headers)))
+            _instrument_main(False)
+
+    req_over = (min(req[True]) - min(req[False])) * 1e6
+    qry_over = (min(qry[True]) - min(qry[False])) * 1e6
+    end_over = min(end[True]) / min(end[False]) - 1
+    print(f"middleware : {min(req[False]) * 1e6:7.1f} -> {min(req[True]) * 1e6:7.1f} us/request  "
+          f"+{req_over:5.1f} us (budget {REQUEST_BUDGET_US} us)")
+    print(f"SQL hooks  : {min(qry[False]) * 1e6:7.1f} -> {min(qry[True]) * 1e6:7.1f} us/statement "
+          f"+{qry_over:5.1f} us (budget {QUERY_BUDGET_US} us)")
+    print(f"GET {path:<7}: {min(end[False]) * 1e6:7.1f} -> {min(end[True]) * 1e6:7.1f} us/request "
+          f"{end_over:+6.1%} (budget {ENDPOINT_BUDGET:.0%})")
+    ok = req_over <= REQUEST_BUDGET_US and qry_over <= QUERY_BUDGET_US and end_over <= ENDPOINT_BUDGET
+    print("within budget" if ok else "OVER BUDGET")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Micro-benchmark: ORM db.add() per row vs. bulk executemany for plan child rows.
+
+Run from the repo root:  python -m benchmarks.bench_plan_writes
+"""
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import User, Plan, PlanRecipe, GroceryItem
+from app.planner import write_plan_rows
+from app.queries import RecipeRow
+
+ROUNDS = 200
+DAYS = 14
+GROCERY_LINES = 120
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(User(email="bench@example.com", password_hash="x")); db.commit()
+    return db
+
+
+def _payload():
+    chosen = [RecipeRow(i + 1, "Any") for i in range(DAYS)]
+    agg = {(f"item {i}", "g"): {"name": f"Item {i}", "unit": "g", "quantity": float(i)} for i in range(GROCERY_LINES)}
+    return chosen, agg
+
+
+def orm_add(db, plan_id, chosen, agg):
+    for idx, r in enumerate(chosen):
+        db.add(PlanRecipe(plan_id=plan_id, recipe_id=r.id, day_index=idx))
+    for meta in agg.values():
+        db.add(GroceryItem(plan_id=plan_id, name=meta["name"], unit=meta["unit"], quantity=round(meta["quantity"], 2), checked=0))
+
+
+def run(writer):
+    db = _session()
+    chosen, agg = _payload()
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        plan = Plan(user_id=1, days=DAYS, locked=1)
+        db.add(plan); db.flush()
+        writer(db, plan.id, chosen, agg)
+        db.commit()
+    elapsed = time.perf_counter() - t0
+    db.close()
+    return elapsed
+
+
+def main():
+    orm = run(orm_add)
+    bulk = run(write_plan_rows)
+    print(f"{ROUNDS} plans x ({DAYS} plan_recipes + {GROCERY_LINES} grocery_items)")
+    print(f"  orm add : {orm * 1000 / ROUNDS:8.3f} ms/plan")
+    print(f"  bulk    : {bulk * 1000 / ROUNDS:8.3f} ms/plan  ({orm / bulk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Throughput benchmark for planner.sample_week (seeded weighted sampling under caps).
+
+Reports plans per second with and without an avoid set, plus the infeasible-caps case where
+every recipe is capped out and the sampler has to exhaust its heap.
+
+Run from the repo root:  python -m benchmarks.bench_sample_week
+"""
+import random
+import time
+from types import SimpleNamespace
+
+from app.planner import sample_week
+
+SIZES = [100, 1_000, 10_000, 100_000]
+CUISINES = ["Mexican", "Asian", "Italian", "Indian", "American", "Thai", "French", "Greek"]
+DAYS = 7
+
+
+def _rate(fn, budget=1.0):
+    n, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < budget:
+        fn()
+        n += 1
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    rng = random.Random(42)
+    caps = {c: 2 for c in CUISINES[:4]}
+    print(f"{'recipes':>8}  {'sample/s':>10}  {'+avoid/s':>10}  {'infeasible ms':>13}")
+    for n in SIZES:
+        recipes = [SimpleNamespace(id=i, cuisine=rng.choice(CUISINES)) for i in range(n)]
+        avoid = set(rng.sample(range(n), min(n, 3 * DAYS)))
+        seeds = iter(range(10**9))
+        smp = _rate(lambda: sample_week(recipes, DAYS, caps, random.Random(next(seeds))))
+        avd = _rate(lambda: sample_week(recipes, DAYS, caps, random.Random(next(seeds)), avoid=avoid))
+        blocked = {c: 0 for c in CUISINES}
+        t0 = time.perf_counter()
+        assert sample_week(recipes, DAYS, blocked, random.Random(0)) == []
+        infeasible = time.perf_counter() - t0
+        print(f"{n:>8}  {smp:>10.0f}  {avd:>10.0f}  {infeasible * 1000:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
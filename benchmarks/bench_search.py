@@ -0,0 +1,82 @@
+"""Recipe search: the FTS5 index (app.search.search_recipes) vs. a LIKE scan (search_recipes_like)
+over 50k recipes, first page of 50. All recipes belong to one user so the LIKE side can't lean on
+the user_id index; --users spreads them out instead. Also times the full index rebuild.
+
+The LIKE page is unranked and stops at the first 50 hits in name order, so common terms are cheap
+and rare ones scan everything; "like all" is the scan that ranking by relevance would need. FTS
+cost follows the number of matches, since bm25 scores each one before the page is cut.
+
+Run from the repo root:  python -m benchmarks.bench_search
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import User, Recipe, Ingredient, RecipeIngredient
+from app.search import rebuild_search, search_recipes, search_recipes_like, search_terms
+
+ROUNDS = 20
+WORDS = ("tomato basil garlic lemon chicken beef tofu rice noodle bean lentil potato onion ginger chili "
+         "coconut mushroom spinach pepper cheese yogurt honey butter mint cumin paprika soy miso leek pea").split()
+DISHES = "soup stew curry salad bake roast pie pasta bowl tacos stir-fry risotto".split()
+CUISINES = "Italian Indian Mexican Japanese Thai French Greek Chinese Any".split()
+QUERIES = ["curry", "lemon chicken", "chick", "miso soup", "coconut lentil curry", "zucchini"]
+
+
+def _seed(db, users, recipes, rng):
+    db.execute(insert(User), [{"email": f"bench{u}@example.com", "password_hash": "x"} for u in range(users)])
+    ing_ids = db.scalars(insert(Ingredient).returning(Ingredient.id),
+                         [{"name": w, "name_normalized": w} for w in WORDS]).all()
+    rows = []
+    for i in range(recipes):
+        words = rng.sample(WORDS, 2)
+        rows.append({"user_id": i % users + 1, "name": f"{words[0].title()} {words[1]} {rng.choice(DISHES)} {i}",
+                     "cuisine": rng.choice(CUISINES), "notes": " ".join(rng.choices(WORDS, k=rng.randint(0, 12)))})
+    db.execute(insert(Recipe), rows)
+    db.execute(insert(RecipeIngredient), [
+        {"recipe_id": rid, "ingredient_id": iid, "quantity": 1.0, "unit": "g"}
+        for rid in range(1, recipes + 1) for iid in rng.sample(ing_ids, 5)
+    ])
+    db.commit()
+
+
+def _time(fn):
+    samples = []
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        rows = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), len(rows)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks.bench_search")
+    p.add_argument("--recipes", type=int, default=50_000)
+    p.add_argument("--users", type=int, default=1)
+    p.add_argument("--limit", type=int, default=50)
+    args = p.parse_args(argv)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    _seed(db, args.users, args.recipes, random.Random(0))
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_search(conn)
+    print(f"{args.recipes} recipes, {args.users} user(s); index rebuild {time.perf_counter() - t0:.2f} s\n")
+
+    print(f"{'query':<22}{'fts ms':>9}{'like ms':>10}{'like all ms':>13}{'matches':>9}")
+    for q in QUERIES:
+        fts_ms, _ = _time(lambda: search_recipes(db, 1, q, args.limit)[0])
+        like_ms, _ = _time(lambda: search_recipes_like(db, 1, search_terms(q), args.limit)[0])
+        all_ms, matches = _time(lambda: search_recipes_like(db, 1, search_terms(q), args.recipes)[0])
+        print(f"{q:<22}{fts_ms:9.2f}{like_ms:10.2f}{all_ms:13.2f}{matches:9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Concurrent read/write stress on a file SQLite DB: baseline engine vs. app.database.make_engine.
+
+Each worker thread runs short transactions that insert grocery rows and read their plan
+back, the same shape as plan generation plus grocery toggles.
+
+Run from the repo root:  python -m benchmarks.bench_sqlite_concurrency
+"""
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, make_engine
+from app.models import GroceryItem
+
+THREADS = 16
+TXNS_PER_THREAD = 150
+ROWS_PER_TXN = 20
+
+
+def baseline_engine(url):
+    # What app/database.py did before: defaults plus check_same_thread=False
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def run(label, engine):
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    errors = {"locked": 0}
+    lock = threading.Lock()
+
+    def worker(n):
+        for t in range(TXNS_PER_THREAD):
+            db = Session()
+            try:
+                plan_id = n * TXNS_PER_THREAD + t
+                db.execute(insert(GroceryItem), [
+                    {"plan_id": plan_id, "name": f"item {i}", "unit": "g", "quantity": 1.0, "checked": 0}
+                    for i in range(ROWS_PER_TXN)
+                ])
+                db.commit()
+                db.scalar(select(func.count()).select_from(GroceryItem).where(GroceryItem.plan_id == plan_id))
+            except OperationalError as e:
+                db.rollback()
+                if "locked" in str(e).lower():
+                    with lock:
+                        errors["locked"] += 1
+                else:
+                    raise
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    t0 = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t0
+    ok = THREADS * TXNS_PER_THREAD - errors["locked"]
+    print(f"{label:>8}: {ok / elapsed:8.0f} txn/s  {ok * ROWS_PER_TXN / elapsed:9.0f} rows/s  "
+          f"locked errors {errors['locked']}")
+    engine.dispose()
+
+
+def main():
+    run("baseline", baseline_engine(f"sqlite:///{tempfile.mkdtemp()}/baseline.db"))
+    run("tuned", make_engine(f"sqlite:///{tempfile.mkdtemp()}/tuned.db"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Fan-out latency of the plan event hub (app.events) at 1k and 10k subscribers on one topic.
+
+Each subscriber is a task blocked on its queue, like an open /plans/{pid}/events stream. Latency
+is publish() to the subscriber's task waking up with the event, for events published on the loop
+and from a worker thread (how the sync route handlers publish). SSE framing and socket writes are
+not included.
+
+Run from the repo root:  python -m benchmarks.bench_sse_fanout
+"""
+import asyncio
+import statistics
+import time
+
+from app.events import EventHub
+
+ROUNDS = 20
+
+
+async def fanout(n: int, from_thread: bool):
+    hub = EventHub(64)
+    subs = [hub.subscribe("plan") for _ in range(n)]
+    per_sub, last = [], []
+    for _ in range(ROUNDS):
+        arrived = []
+
+        async def listen(sub):
+            await sub.queue.get()
+            arrived.append(time.perf_counter())
+
+        tasks = [asyncio.create_task(listen(s)) for s in subs]
+        await asyncio.sleep(0)
+        t0 = time.perf_counter()
+        if from_thread:
+            await asyncio.to_thread(hub.publish, "plan", "items", {"items": [{"id": 1, "checked": True}]})
+        else:
+            hub.publish("plan", "items", {"items": [{"id": 1, "checked": True}]})
+        await asyncio.gather(*tasks)
+        per_sub += [(t - t0) * 1000 for t in arrived]
+        last.append((max(arrived) - t0) * 1000)
+    per_sub.sort()
+    return {
+        "p50_ms": round(per_sub[len(per_sub) // 2], 3),
+        "p99_ms": round(per_sub[int(len(per_sub) * 0.99)], 3),
+        "all_delivered_ms": round(statistics.median(last), 3),
+    }
+
+
+def main():
+    for n in (1_000, 10_000):
+        for from_thread in (False, True):
+            r = asyncio.run(fanout(n, from_thread))
+            print(f"{n:>6} subscribers  from {'thread' if from_thread else 'loop  '}  "
+                  f"p50 {r['p50_ms']:7.3f} ms  p99 {r['p99_ms']:7.3f} ms  last {r['all_delivered_ms']:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Per-item cost of unit canonicalization and conversion in grocery aggregation.
+
+Compares the old raw (name, unit) keying with app.planner.aggregate_groceries (memoized
+unit resolution + conversion), and the plan-time merge of precomputed vectors, whose lines
+already carry their unit group and factor.
+
+Run from the repo root:  python -m benchmarks.bench_units
+"""
+import random
+import time
+
+from app.planner import aggregate_groceries, build_vector, merge_vectors
+from app.queries import IngredientLine
+
+RECIPES = 20_000
+ITEMS = 10
+UNITS = ["g", "kg", "oz", "lb", "cup", "Tbsp", "tablespoon", "tsp", "pcs", "each", "cans", "", "ml", "L"]
+
+
+def raw_aggregate(recipe_lines):
+    agg = {}
+    for lines in recipe_lines:
+        for it in lines:
+            name = it.name.strip()
+            unit = (it.unit or "").strip().lower()
+            key = (name.lower(), unit)
+            if key not in agg:
+                agg[key] = {"name": name, "unit": unit, "quantity": 0.0}
+            agg[key]["quantity"] += float(it.quantity or 0.0)
+    return agg
+
+
+def main():
+    rng = random.Random(3)
+    recipes = [[IngredientLine(f"Ingredient {rng.randrange(300)}", rng.randint(1, 50), rng.choice(UNITS))
+                for _ in range(ITEMS)] for _ in range(RECIPES)]
+    n = RECIPES * ITEMS
+
+    t0 = time.perf_counter(); raw = raw_aggregate(recipes); t_raw = time.perf_counter() - t0
+    t0 = time.perf_counter(); conv = aggregate_groceries(recipes); t_conv = time.perf_counter() - t0
+    vectors = [build_vector(r) for r in recipes]
+    t0 = time.perf_counter(); merge_vectors(vectors); t_merge = time.perf_counter() - t0
+
+    print(f"{n} ingredient lines")
+    print(f"  raw keying        : {t_raw / n * 1e9:6.0f} ns/item  -> {len(raw)} grocery lines")
+    print(f"  registry + convert: {t_conv / n * 1e9:6.0f} ns/item  -> {len(conv)} grocery lines")
+    print(f"  vector merge      : {t_merge / n * 1e9:6.0f} ns/item")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import contextlib
+import pytest
+from sqlalchemy import event
+from app.database import engine
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def of(self, verb: str) -> list[str]:
+        return [s for s in self.statements if s.lstrip().upper().startswith(verb)]
+
+    @property
+    def selects(self) -> list[str]:
+        return self.of("SELECT")
+
+@pytest.fixture
+def count_queries():
+    """Context manager recording every statement the engine sends to the DB."""
+    @contextlib.contextmanager
+    def _count():
+        counter = QueryCounter()
+        event.listen(engine, "before_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            event.remove(engine, "before_cursor_execute", counter)
+    return _count
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    # Tests recreate the schema, so ids get reused; never let cached state leak between tests
+    from app import deps, settings_service
+    settings_service.cache.clear()
+    deps.principal_cache.clear()
+    yield
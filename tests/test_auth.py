@@ -39,3 +39,46 @@ async def test_register_login_me_logout_flow():
         # Access /me without cookie should fail
         r = await ac.get("/me")
         assert r.status_code == 401
+
+@pytest.mark.asyncio
+async def test_principal_cache_skips_user_lookup_and_is_invalidated(count_queries):
+    from app import deps
+    from app.database import SessionLocal
+    from app.models import User
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/auth/register", json={"email": "bob@example.com", "password": "SuperSecret1"})
+        r = await ac.post("/auth/login", json={"email": "bob@example.com", "password": "SuperSecret1"})
+        cookies = r.cookies
+        token = cookies["fmp_session"]
+
+        r = await ac.get("/me", cookies=cookies)
+        assert r.json()["email"] == "bob@example.com"
+        with count_queries() as q:
+            r = await ac.get("/me", cookies=cookies)
+        assert r.status_code == 200
+        assert q.statements == []
+
+        # Logout drops the cached principal
+        await ac.post("/auth/logout", cookies=cookies)
+        assert deps.principal_cache.get(token) is deps.MISSING
+
+        # Deleting the user through the ORM invalidates it too
+        r = await ac.get("/me", cookies=cookies)
+        assert r.status_code == 200
+        db = SessionLocal()
+        db.delete(db.query(User).filter(User.email == "bob@example.com").one()); db.commit(); db.close()
+        r = await ac.get("/me", cookies=cookies)
+        assert r.status_code == 401
+
+@pytest.mark.asyncio
+async def test_login_returns_503_when_hashing_pool_is_saturated(monkeypatch):
+    import threading
+    from app import security
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/auth/register", json={"email": "carol@example.com", "password": "SuperSecret1"})
+        monkeypatch.setattr(security, "_hash_slots", threading.Semaphore(0))
+        r = await ac.post("/auth/login", json={"email": "carol@example.com", "password": "SuperSecret1"})
+        assert r.status_code == 503
+        assert r.headers["retry-after"] == "1"
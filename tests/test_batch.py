@@ -0,0 +1,124 @@
+import json
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.batch import PlanJob, generate_plans
+from app.database import Base, engine, SessionLocal
+from app.models import User, Recipe, Ingredient, RecipeIngredient, Plan, PlanRecipe, GroceryItem
+from app.plan_view import build_plan_view, load_plan
+from app.planner import create_plan, refresh_recipe_vectors
+from app.settings_service import set_cuisine_caps
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _seed_users(db, n_users, n_recipes=6):
+    ing = Ingredient(name="Rice")
+    db.add(ing); db.flush()
+    uids = []
+    for u in range(n_users):
+        user = User(email=f"user{u}@example.com", password_hash="x")
+        db.add(user); db.flush()
+        uids.append(user.id)
+        for i in range(n_recipes):
+            r = Recipe(user_id=user.id, name=f"Recipe {i}", cuisine=["Mexican", "Asian"][i % 2], notes="")
+            db.add(r); db.flush()
+            db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing.id, quantity=1.0, unit="cup"))
+    db.flush()
+    # Leave one user's vectors unset to exercise the backfill
+    refresh_recipe_vectors(db, [rid for rid, in db.query(Recipe.id).filter(Recipe.user_id != uids[0])])
+    db.commit()
+    return uids
+
+
+def _days(db, pid):
+    return [pr.recipe_id for pr in db.query(PlanRecipe).filter(PlanRecipe.plan_id == pid).order_by(PlanRecipe.day_index)]
+
+
+def test_batch_prefetches_per_chunk_and_writes_in_bulk(db, count_queries):
+    uids = _seed_users(db, 6)
+    set_cuisine_caps(db, uids[1], {"Mexican": 1})
+    empty = User(email="empty@example.com", password_hash="x")
+    db.add(empty); db.commit()
+    jobs = [PlanJob(uid, 4) for uid in uids] + [PlanJob(empty.id, 4)]
+    seen = []
+    with count_queries() as q:
+        results, stats = generate_plans(db, jobs, workers=0, chunk_size=4, progress=seen.append)
+    # per chunk: recipes, caps, recent plans, then INSERT plans / plan_recipes / grocery_items; the
+    # snapshots read back recipe names and grocery lines and are stored with one executemany
+    assert len(q.selects) == 2 * 5 + 1  # + the vector backfill's ingredient lookup
+    assert len(q.of("INSERT")) == 2 * 3
+    assert len([u for u in q.of("UPDATE") if "snapshot" in u]) == 2
+    assert [s["done"] for s in seen] == [4, 7]
+    assert stats["created"] == 6 and stats["skipped"] == 1 and stats["plans_per_s"] > 0
+    assert results[-1].plan_id is None
+
+    by_user = {r.user_id: r for r in results}
+    plans = db.query(Plan).filter(Plan.id.in_([r.plan_id for r in results[:-1]])).all()
+    assert {p.user_id: p.seed for p in plans} == {uid: by_user[uid].seed for uid in uids}
+    mexican = [db.get(Recipe, rid).cuisine for rid in _days(db, by_user[uids[1]].plan_id)]
+    assert mexican.count("Mexican") == 1 and len(mexican) == 4
+    for uid in uids:
+        pid = by_user[uid].plan_id
+        rice = db.query(GroceryItem).filter(GroceryItem.plan_id == pid).one()
+        assert (rice.name, rice.unit, rice.quantity) == ("Rice", "cup", len(_days(db, pid)))
+        plan = db.get(Plan, pid)
+        assert json.loads(plan.snapshot) == build_plan_view(load_plan(db, uid, pid))
+    assert db.get(Recipe, 1).ingredient_vector is not None
+
+
+def test_batch_matches_create_plan_for_the_same_seed(db):
+    uids = _seed_users(db, 2)
+    jobs = [PlanJob(uids[0], 3, seed=11), PlanJob(uids[1], 3, seed=12, caps={"Asian": 0})]
+    results, _ = generate_plans(db, jobs, workers=0, avoid_recent=0)
+    for job, res in zip(jobs, results):
+        single = create_plan(db, job.user_id, job.days, job.caps, seed=job.seed, avoid_recent=0)
+        assert _days(db, single.id) == _days(db, res.plan_id)
+
+
+def test_batch_creates_empty_plan_when_caps_leave_nothing_like_create_plan(db):
+    uids = _seed_users(db, 1)
+    caps = {"Mexican": 0, "Asian": 0}
+    results, stats = generate_plans(db, [PlanJob(uids[0], 3, seed=1, caps=caps)], workers=0)
+    single = create_plan(db, uids[0], 3, caps, seed=1)
+    assert results[0].plan_id is not None and stats["created"] == 1 and stats["skipped"] == 0
+    assert _days(db, results[0].plan_id) == _days(db, single.id) == []
+
+
+def test_batch_process_pool(db):
+    uids = _seed_users(db, 3)
+    results, stats = generate_plans(db, [PlanJob(uid, 5) for uid in uids], workers=2)
+    assert stats["created"] == 3
+    assert all(len(_days(db, r.plan_id)) == 5 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_builds_candidate_plans():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/auth/register", json={"email": "me@example.com", "password": "SuperSecret1"})
+        cookies = (await ac.post("/auth/login", json={"email": "me@example.com", "password": "SuperSecret1"})).cookies
+        assert (await ac.post("/plans/batch", cookies=cookies, json={})).status_code == 400
+        await ac.post("/recipes", cookies=cookies, json={"name": "Tacos", "cuisine": "Mexican", "notes": "",
+                                                          "items": [{"ingredient_name": "Tortillas", "quantity": 4, "unit": "pcs"}]})
+        r = await ac.post("/plans/batch", cookies=cookies, json={"days": 2, "seeds": [1, 2]})
+        assert r.status_code == 200
+        plans = r.json()["plans"]
+        assert [p["seed"] for p in plans] == [1, 2]
+        plan = (await ac.get(f"/plans/{plans[1]['id']}", cookies=cookies)).json()
+        assert plan["seed"] == 2 and [x["name"] for x in plan["recipes"]] == ["Tacos"]
+        assert (await ac.post("/plans/batch", cookies=cookies, json={"count": 21})).status_code == 400
+        # Caps that exclude every recipe aren't "no recipes": empty plans, as POST /plans makes
+        r = await ac.post("/plans/batch", cookies=cookies, json={"count": 2, "cuisine_caps": {"Mexican": 0}})
+        assert r.status_code == 200 and all(p["id"] for p in r.json()["plans"])
+        assert (await ac.get(f"/plans/{r.json()['plans'][0]['id']}", cookies=cookies)).json()["recipes"] == []
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from app import cache as cache_mod
+from app.cache import TTLCache, MISSING
+from app.database import Base, engine, SessionLocal
+from app.models import Setting, User
+from app import settings_service
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def test_ttl_cache_lru_eviction_and_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: now[0])
+    c = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1); c.set("b", 2)
+    assert c.get("a") == 1          # a is now most recent
+    c.set("c", 3)                   # evicts b
+    assert c.get("b") is MISSING
+    assert c.get("c") == 3
+    now[0] += 11
+    assert c.get("a") is MISSING and len(c) == 1
+    assert c.stats() == {"size": 1, "maxsize": 2, "hits": 2, "misses": 2}
+
+def test_ttl_cache_is_thread_safe():
+    c = TTLCache(maxsize=50, ttl=60)
+    def work(n):
+        for i in range(2000):
+            c.set((n, i % 80), i)
+            c.get((n, (i * 7) % 80))
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(c) <= 50
+    assert c.hits + c.misses == 8 * 2000
+
+def test_cuisine_caps_read_through_and_write_through(db, count_queries):
+    u = User(email="caps@example.com", password_hash="x")
+    db.add(u); db.commit()
+    uid = u.id
+
+    with count_queries() as q:
+        assert settings_service.get_cuisine_caps(db, uid) == {}
+        assert settings_service.get_cuisine_caps(db, uid) == {}
+    assert len(q.selects) == 1
+
+    settings_service.set_cuisine_caps(db, uid, {"Mexican": 2})
+    with count_queries() as q:
+        caps = settings_service.get_cuisine_caps(db, uid)
+        caps["Mexican"] = 99  # callers get a copy
+        assert settings_service.get_cuisine_caps(db, uid) == {"Mexican": 2}
+    assert q.statements == []
+    assert settings_service.cache.stats()["hits"] == 3
+
+def test_read_through_loaded_before_a_write_is_not_stored(db, monkeypatch):
+    u = User(email="race@example.com", password_hash="x")
+    db.add(u); db.commit()
+    uid = u.id
+    settings_service.set_setting(db, uid, "diet", {"tags": ["veg"]})
+    settings_service.cache.clear()
+
+    # A writer commits and writes through while this reader's SELECT is in flight
+    real_query = db.query
+    def racing_query(*args):
+        result = real_query(*args).filter(Setting.user_id == uid).scalar()
+        with SessionLocal() as other:
+            settings_service.set_setting(other, uid, "diet", {"tags": ["vegan"]})
+        monkeypatch.setattr(db, "query", real_query)
+        return type("Q", (), {"filter": lambda self, *a: self, "scalar": lambda self: result})()
+    monkeypatch.setattr(db, "query", racing_query)
+
+    assert settings_service.get_setting(db, uid, "diet") == {"tags": ["veg"]}
+    value = settings_service.get_setting(db, uid, "diet")
+    assert value == {"tags": ["vegan"]}
+    value["tags"].append("mutated")  # callers get a deep copy
+    assert settings_service.get_setting(db, uid, "diet") == {"tags": ["vegan"]}
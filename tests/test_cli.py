@@ -0,0 +1,83 @@
+import json
+import subprocess
+import sys
+
+import pytest
+from app import cli
+from app.database import Base, engine, SessionLocal
+from app.models import User, Recipe, Plan, PlanRecipe, GroceryItem
+
+# Cold start of `import app.cli`, in microseconds as reported by -X importtime (currently ~10ms)
+CLI_IMPORT_BUDGET_US = 50_000
+HEAVY_MODULES = {"sqlalchemy", "fastapi", "starlette", "pydantic", "passlib", "app.database", "app.models", "app.main"}
+
+
+def _importtime(*args):
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True, timeout=60)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return proc, modules
+
+
+def test_cli_cold_start_stays_light():
+    proc, modules = _importtime("-c", "import app.cli")
+    assert proc.returncode == 0, proc.stderr
+    assert modules["app.cli"] < CLI_IMPORT_BUDGET_US, modules["app.cli"]
+    assert not HEAVY_MODULES & set(modules)
+
+    proc, modules = _importtime("-m", "app.cli", "--help")
+    assert proc.returncode == 0 and "prune" in proc.stdout
+    assert not HEAVY_MODULES & set(modules)
+
+
+@pytest.fixture(autouse=True)
+def _reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+def _run(capsys, *argv):
+    assert cli.main(list(argv)) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_seed_plans_prune_and_stats(capsys):
+    out = _run(capsys, "seed", "--users", "5", "--recipes", "6", "--ingredients", "20", "--items", "3", "--chunk", "2")
+    assert out["users"] == 5 and out["recipes"] == 30
+    with SessionLocal() as db:
+        assert db.query(User).count() == 5
+        assert db.query(Recipe).filter(Recipe.ingredient_vector.is_(None)).count() == 0
+
+    for _ in range(3):
+        out = _run(capsys, "plans", "--days", "3", "--workers", "0", "--chunk", "2")
+        assert out["created"] == 5
+    out = _run(capsys, "plans", "--users", "1,2", "--days", "2", "--caps", '{"Mexican": 0}', "--workers", "0")
+    assert out["created"] == 2
+
+    assert _run(capsys, "prune", "--keep", "2", "--dry-run") == {"would_remove_plans": 7}
+    assert _run(capsys, "prune", "--keep", "2", "--older-than", "1") == {"plans": 0, "plan_recipes": 0, "grocery_items": 0}
+    out = _run(capsys, "prune", "--keep", "2")
+    assert out["plans"] == 7 and out["plan_recipes"] == 7 * 3
+    with SessionLocal() as db:
+        assert db.query(Plan).count() == 10
+        live = {pid for pid, in db.query(Plan.id)}
+        assert {pid for pid, in db.query(PlanRecipe.plan_id)} <= live
+        assert {pid for pid, in db.query(GroceryItem.plan_id)} <= live
+
+    stats = _run(capsys, "stats")
+    assert stats["tables"]["users"] == 5 and stats["tables"]["plans"] == 10
+    assert stats["plans_per_user"] == {"avg": 2.0, "max": 2}
+    assert stats["sqlite"]["page_count"] > 0
+
+    assert "elapsed_s" in _run(capsys, "analyze")
+    assert _run(capsys, "vacuum")["bytes_after"] > 0
+
+
+def test_plans_rejects_bad_days(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["plans", "--days", "0"])
@@ -0,0 +1,21 @@
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+from app.database import make_engine
+
+def test_file_sqlite_engine_applies_pragmas_and_queue_pool(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path}/tuned.db")
+    assert isinstance(eng.pool, QueuePool)
+    with eng.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -64000
+    eng.dispose()
+
+def test_memory_sqlite_engine_shares_one_connection():
+    eng = make_engine("sqlite://")
+    assert isinstance(eng.pool, StaticPool)
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 0
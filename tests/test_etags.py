@@ -0,0 +1,70 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.etags import etag_matches
+from app.main import app
+from app.database import Base, engine
+
+@pytest.fixture(autouse=True)
+def _reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+async def _setup(ac, n=4):
+    await ac.post("/auth/register", json={"email": "e@example.com", "password": "SuperSecret1"})
+    ac.cookies = (await ac.post("/auth/login", json={"email": "e@example.com", "password": "SuperSecret1"})).cookies
+    for i in range(n):
+        await ac.post("/recipes", json={"name": f"Dish {i}", "cuisine": "Any", "notes": "",
+                                        "items": [{"ingredient_name": f"Item {i}", "quantity": 1, "unit": "g"}]})
+
+def test_if_none_match_parsing():
+    assert etag_matches('"a.1"', '"a.1"')
+    assert etag_matches('"x", W/"a.1"', '"a.1"')
+    assert etag_matches("*", '"a.1"')
+    assert not etag_matches('"a.2"', '"a.1"') and not etag_matches(None, '"a.1"')
+
+@pytest.mark.asyncio
+async def test_recipe_listing_revalidates_without_listing_queries(count_queries):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await _setup(ac)
+        r = await ac.get("/recipes", params={"limit": 2})
+        etag = r.headers["etag"]
+        assert r.status_code == 200 and len(r.json()) == 2
+
+        with count_queries() as q:
+            r = await ac.get("/recipes", params={"limit": 2}, headers={"If-None-Match": etag})
+        assert r.status_code == 304 and r.content == b"" and r.headers["etag"] == etag
+        assert len(q.statements) == 1, q.statements
+
+        # Another page of the same data is a different representation
+        assert (await ac.get("/recipes", params={"limit": 3}, headers={"If-None-Match": etag})).status_code == 200
+        await ac.post("/recipes", json={"name": "New", "cuisine": "Any", "notes": "", "items": []})
+        r = await ac.get("/recipes", params={"limit": 2}, headers={"If-None-Match": etag})
+        assert r.status_code == 200 and r.headers["etag"] != etag
+
+@pytest.mark.asyncio
+async def test_plan_etag_moves_with_its_own_changes_only(count_queries):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await _setup(ac)
+        first = (await ac.post("/plans", json={"days": 2})).json()["id"]
+        second = (await ac.post("/plans", json={"days": 2})).json()["id"]
+        r = await ac.get(f"/plans/{first}")
+        etag, plan = r.headers["etag"], r.json()
+
+        with count_queries() as q:
+            r = await ac.get(f"/plans/{first}", headers={"If-None-Match": etag})
+        assert r.status_code == 304 and len(q.statements) == 1
+
+        other = (await ac.get(f"/plans/{second}")).json()["groceries"][0]["id"]
+        await ac.post(f"/grocery/{other}/toggle")
+        assert (await ac.get(f"/plans/{first}", headers={"If-None-Match": etag})).status_code == 304
+
+        await ac.post(f"/grocery/{plan['groceries'][0]['id']}/toggle")
+        r = await ac.get(f"/plans/{first}", headers={"If-None-Match": etag})
+        assert r.status_code == 200 and r.json()["groceries"][0]["checked"] is True
+        etag = r.headers["etag"]
+
+        # Recipe names are part of the plan view
+        rid = plan["recipes"][0]["id"]
+        await ac.patch(f"/recipes/{rid}", json={"name": "Renamed", "cuisine": "Any", "notes": "", "items": []})
+        assert (await ac.get(f"/plans/{first}", headers={"If-None-Match": etag})).status_code == 200
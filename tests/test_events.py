@@ -0,0 +1,131 @@
+import asyncio
+import sys
+import time
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.config import SESSION_COOKIE_NAME
+from app.events import EventHub, hub
+from app.main import app
+from app.database import Base, engine
+
+@pytest.fixture(autouse=True)
+def _reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("from_thread", [False, True])
+async def test_fanout_to_1000_subscribers(from_thread):
+    h = EventHub(8)
+    subs = [h.subscribe(("plan", 1)) for _ in range(1000)]
+    other = h.subscribe(("plan", 2))
+    arrived = []
+
+    async def listen(sub):
+        arrived.append((await sub.queue.get(), time.perf_counter()))
+
+    tasks = [asyncio.create_task(listen(s)) for s in subs]
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    if from_thread:  # as the sync route handlers publish, from a threadpool worker
+        await asyncio.to_thread(h.publish, ("plan", 1), "items", {"items": [{"id": 7, "checked": True}]})
+    else:
+        h.publish(("plan", 1), "items", {"items": [{"id": 7, "checked": True}]})
+    await asyncio.wait_for(asyncio.gather(*tasks), 5)
+
+    assert len(arrived) == 1000 and {m for m, _ in arrived} == {(1, "items", '{"items": [{"id": 7, "checked": true}]}')}
+    assert other.queue.empty()
+    latency = max(t for _, t in arrived) - started
+    assert latency < 0.5, f"fan-out to 1000 subscribers took {latency * 1000:.1f} ms"
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_dropped_without_holding_back_others():
+    h = EventHub(2)
+    fast, slow = h.subscribe("t"), h.subscribe("t")
+    got = []
+    for i in range(5):
+        h.publish("t", "items", i)
+        got.append((await fast.queue.get())[2])
+    assert got == ["0", "1", "2", "3", "4"]
+    assert slow.dropped and slow.queue.get_nowait() is None and slow.queue.empty()
+    assert h.stats() == {"topics": 1, "subscribers": 1, "published": 5, "dropped": 1}
+
+async def _login(ac, email):
+    await ac.post("/auth/register", json={"email": email, "password": "SuperSecret1"})
+    return (await ac.post("/auth/login", json={"email": email, "password": "SuperSecret1"})).cookies
+
+def _stream(path, token):
+    # httpx's ASGITransport buffers whole bodies, so drive the ASGI app directly to read the stream live
+    messages: asyncio.Queue = asyncio.Queue()
+    disconnect = asyncio.Event()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"test"), (b"cookie", f"{SESSION_COOKIE_NAME}={token}".encode())],
+             "client": ("test", 1), "server": ("test", 80)}
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    task = asyncio.create_task(app(scope, receive, messages.put))
+    return messages, disconnect, task
+
+@pytest.mark.asyncio
+async def test_plan_event_stream_relays_item_changes():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        ac.cookies = await _login(ac, "s@example.com")
+        await ac.post("/recipes", json={"name": "Soup", "cuisine": "Any", "notes": "",
+                                        "items": [{"ingredient_name": "Leek", "quantity": 1, "unit": "pcs"}]})
+        pid = (await ac.post("/plans", json={"days": 1})).json()["id"]
+        item = (await ac.get(f"/plans/{pid}")).json()["groceries"][0]["id"]
+
+        messages, disconnect, task = _stream(f"/plans/{pid}/events", ac.cookies[SESSION_COOKIE_NAME])
+        start = await asyncio.wait_for(messages.get(), 5)
+        assert start["status"] == 200 and (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+        assert b"event: ready" in (await asyncio.wait_for(messages.get(), 5))["body"]
+
+        await ac.patch("/grocery", json=[{"id": item, "checked": True}])
+        body = (await asyncio.wait_for(messages.get(), 5))["body"].decode()
+        assert "event: items" in body and f'{{"id": {item}, "checked": true}}' in body
+        await ac.post(f"/plans/{pid}/reroll", json={})
+        assert b"event: plan" in (await asyncio.wait_for(messages.get(), 5))["body"]
+
+        disconnect.set()
+        await asyncio.wait_for(task, 5)
+        assert hub.stats()["subscribers"] == 0
+
+        other = await _login(ac, "t@example.com")
+        assert (await ac.get(f"/plans/{pid}/events", cookies=other)).status_code == 404
+
+@pytest.mark.asyncio
+async def test_stats_from_another_thread_while_topics_churn():
+    # /metrics is a sync route: stats() runs on a threadpool worker while the loop subscribes
+    h = EventHub(8)
+    standing = [h.subscribe(("plan", -n)) for n in range(5000)]  # long dict to iterate
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often so the scrape overlaps the churn
+    stop, errors = False, []
+
+    def scrape():
+        while not stop:
+            try:
+                h.stats()
+            except RuntimeError as e:  # "dictionary changed size during iteration"
+                errors.append(e)
+                return
+
+    scraper = asyncio.get_running_loop().run_in_executor(None, scrape)
+    try:
+        for i in range(20000):
+            h.unsubscribe(h.subscribe(("plan", i)))
+            if errors:
+                break
+    finally:
+        stop = True
+        sys.setswitchinterval(interval)
+        await scraper
+    assert errors == [] and h.stats() == {"topics": 5000, "subscribers": 5000, "published": 0, "dropped": 0}
+    for s in standing:
+        h.unsubscribe(s)
@@ -0,0 +1,52 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.database import Base, engine
+
+@pytest.fixture(autouse=True)
+def _reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+async def _user_with_plan(ac, email, n_items=12):
+    await ac.post("/auth/register", json={"email": email, "password": "SuperSecret1"})
+    cookies = (await ac.post("/auth/login", json={"email": email, "password": "SuperSecret1"})).cookies
+    await ac.post("/recipes", cookies=cookies, json={"name": "Big shop", "cuisine": "Any", "notes": "",
+                  "items": [{"ingredient_name": f"{email} item {i}", "quantity": 1, "unit": "g"} for i in range(n_items)]})
+    pid = (await ac.post("/plans", cookies=cookies, json={"days": 1})).json()["id"]
+    plan = (await ac.get(f"/plans/{pid}", cookies=cookies)).json()
+    return cookies, pid, [g["id"] for g in plan["groceries"]]
+
+@pytest.mark.asyncio
+async def test_patch_sets_and_toggles_owned_items_in_one_update(count_queries):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        mine, pid, ids = await _user_with_plan(ac, "a@example.com")
+        theirs, other_pid, other_ids = await _user_with_plan(ac, "b@example.com")
+        etag = (await ac.get(f"/plans/{pid}", cookies=mine)).headers["etag"]
+
+        body = [{"id": i, "checked": True} for i in ids[:10]] + [{"id": ids[10]}, {"id": other_ids[0], "checked": True}, {"id": 10**6}]
+        with count_queries() as q:
+            r = await ac.patch("/grocery", cookies=mine, json=body)
+        assert r.status_code == 200
+        assert r.json() == {"items": [{"id": i, "checked": True} for i in ids[:11]], "not_found": [other_ids[0], 10**6]}
+        # items UPDATE ... RETURNING, plan-row lock, snapshot read + write, version bump: not one round trip per item
+        assert len(q.of("UPDATE")) == 4 and len(q.selects) == 1, q.statements
+        assert "SET snapshot=plans.snapshot" in q.of("UPDATE")[1]
+
+        # Set semantics are idempotent; a toggle flips again
+        r = await ac.patch("/grocery", cookies=mine, json=[{"id": ids[0], "checked": True}, {"id": ids[10]}])
+        assert r.json()["items"] == [{"id": ids[0], "checked": True}, {"id": ids[10], "checked": False}]
+
+        r = await ac.get(f"/plans/{pid}", cookies=mine, headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert {g["id"]: g["checked"] for g in r.json()["groceries"]} == {i: i in ids[:10] for i in ids}
+        assert not any(g["checked"] for g in (await ac.get(f"/plans/{other_pid}", cookies=theirs)).json()["groceries"])
+
+@pytest.mark.asyncio
+async def test_patch_rejects_empty_and_duplicate_batches():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        cookies, _, ids = await _user_with_plan(ac, "c@example.com", n_items=2)
+        assert (await ac.patch("/grocery", cookies=cookies, json=[])).status_code == 400
+        r = await ac.patch("/grocery", cookies=cookies, json=[{"id": ids[0]}, {"id": ids[0], "checked": False}])
+        assert r.status_code == 400
@@ -0,0 +1,84 @@
+import logging
+import re
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from app import metrics
+from app.main import app
+from app.database import Base, engine
+
+@pytest.fixture(autouse=True)
+def _reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    metrics.reset()
+    yield
+
+async def _login(ac):
+    await ac.post("/auth/register", json={"email": "m@example.com", "password": "SuperSecret1"})
+    ac.cookies = (await ac.post("/auth/login", json={"email": "m@example.com", "password": "SuperSecret1"})).cookies
+
+def _sample(text, metric, **labels):
+    want = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+    m = re.search(rf"^{re.escape(metric + want)} (\S+)$", text, re.M)
+    return float(m.group(1)) if m else None
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.7, 3.0):
+        h.observe(v, ("/x",))
+    text = "\n".join(h.render())
+    assert _sample(text, "t_seconds_bucket", route="/x", le="0.1") == 1
+    assert _sample(text, "t_seconds_bucket", route="/x", le="1") == 3
+    assert _sample(text, "t_seconds_bucket", route="/x", le="+Inf") == 4
+    assert _sample(text, "t_seconds_count", route="/x") == 4
+    assert _sample(text, "t_seconds_sum", route="/x") == pytest.approx(4.25)
+
+@pytest.mark.asyncio
+async def test_requests_are_timed_per_route_with_query_counts(count_queries):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await _login(ac)
+        await ac.post("/recipes", json={"name": "Soup", "cuisine": "Any", "notes": "",
+                                        "items": [{"ingredient_name": "Leek", "quantity": 1, "unit": "pcs"}]})
+        pid = (await ac.post("/plans", json={"days": 1})).json()["id"]
+        with count_queries() as q:
+            r = await ac.get(f"/plans/{pid}")
+        timing = r.headers["server-timing"]
+        assert f'desc="{len(q.statements)} queries"' in timing and "app;dur=" in timing
+        assert (await ac.get("/nope")).status_code == 404
+        text = (await ac.get("/metrics")).text
+
+    assert _sample(text, "fmp_http_request_duration_seconds_count", method="GET", route="/plans/{pid}", status="200") == 1
+    assert _sample(text, "fmp_http_request_duration_seconds_count", method="GET", route="unmatched", status="404") == 1
+    assert _sample(text, "fmp_http_request_db_queries_sum", method="GET", route="/plans/{pid}") == len(q.statements)
+    assert _sample(text, "fmp_http_request_db_queries_bucket", method="GET", route="/plans/{pid}", le="+Inf") == 1
+    assert _sample(text, "fmp_db_queries_total") >= len(q.statements)
+    assert _sample(text, "fmp_cache_size", name="principal") == 1
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_and_counted(monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        with caplog.at_level(logging.WARNING, logger="app.metrics"):
+            await ac.post("/auth/login", json={"email": "nobody@example.com", "password": "x"})
+    assert any("slow query" in r.message and "FROM users" in r.message for r in caplog.records)
+    assert metrics.SLOW_QUERIES.value() >= 1
+
+@pytest.mark.asyncio
+async def test_async_driver_queries_count_toward_the_request():
+    from app.database_async import get_async_engine
+    from app.routers import async_routes
+    from app.auth import router as auth_router
+    a = FastAPI()
+    a.include_router(async_routes.router)
+    a.include_router(auth_router)
+    a.add_middleware(metrics.MetricsMiddleware)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=a), base_url="http://test") as ac:
+            await _login(ac)
+            assert (await ac.get("/recipes")).status_code == 200
+    finally:
+        await get_async_engine().dispose()
+    assert metrics.REQUEST_QUERIES.count(("GET", "/recipes")) == 1
+    assert metrics.REQUEST_QUERIES._series[("GET", "/recipes")][1] >= 1
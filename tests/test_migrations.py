@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, make_engine
+from app.migrations import LATEST, MIGRATIONS, current_version, migrate
+from app.models import Ingredient, RecipeIngredient, Plan
+from app.planner import create_plan
+
+# Schema as created by the first release's create_all (abridged to what the migrations touch)
+BASELINE_DDL = [
+    "CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, email VARCHAR(255) NOT NULL, password_hash VARCHAR(255) NOT NULL, "
+    "created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL)",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE TABLE ingredients (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(255) NOT NULL)",
+    "CREATE UNIQUE INDEX ix_ingredients_name ON ingredients (name)",
+    "CREATE TABLE recipes (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR(255) NOT NULL, "
+    "cuisine VARCHAR(100) NOT NULL, notes VARCHAR(1000) NOT NULL, CONSTRAINT uq_recipe_per_user_name UNIQUE (user_id, name))",
+    "CREATE TABLE settings (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL, \"key\" VARCHAR(255) NOT NULL, "
+    "value VARCHAR(4000) NOT NULL, CONSTRAINT uq_setting_per_user_key UNIQUE (user_id, \"key\"))",
+    "CREATE TABLE plans (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL, days INTEGER NOT NULL, "
+    "created_at DATETIME DEFAULT (CURRENT_TIMESTAMP) NOT NULL, locked INTEGER NOT NULL)",
+    "CREATE TABLE recipe_ingredients (id INTEGER NOT NULL PRIMARY KEY, recipe_id INTEGER NOT NULL, ingredient_id INTEGER NOT NULL, "
+    "quantity FLOAT NOT NULL, unit VARCHAR(50) NOT NULL, CONSTRAINT uq_recipe_ing UNIQUE (recipe_id, ingredient_id))",
+    "CREATE TABLE plan_recipes (id INTEGER NOT NULL PRIMARY KEY, plan_id INTEGER NOT NULL, recipe_id INTEGER NOT NULL, "
+    "day_index INTEGER NOT NULL, CONSTRAINT uq_plan_day UNIQUE (plan_id, day_index))",
+    "CREATE TABLE grocery_items (id INTEGER NOT NULL PRIMARY KEY, plan_id INTEGER NOT NULL, name VARCHAR(255) NOT NULL, "
+    "unit VARCHAR(50) NOT NULL, quantity FLOAT NOT NULL, checked INTEGER NOT NULL)",
+]
+
+
+def _indexes(engine, table):
+    return {ix["name"] for ix in inspect(engine).get_indexes(table)}
+
+
+def test_legacy_database_is_upgraded_in_place(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with engine.begin() as conn:
+        for ddl in BASELINE_DDL:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql("INSERT INTO users (id, email, password_hash) VALUES (1, 'old@example.com', 'x')")
+        conn.exec_driver_sql("INSERT INTO ingredients (id, name) VALUES (1, 'Salt'), (2, 'salt '), (3, 'Pepper')")
+        conn.exec_driver_sql("INSERT INTO recipes (id, user_id, name, cuisine, notes) VALUES (1, 1, 'Soup', 'Any', ''), (2, 1, 'Stew', 'Any', '')")
+        conn.exec_driver_sql("INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit) VALUES "
+                             "(1, 1, 1, 'tsp'), (1, 2, 2, 'tsp'), (1, 3, 1, 'tsp'), (2, 2, 3, 'Tbsp')")
+
+    assert migrate(engine) == [m.name for m in MIGRATIONS[1:]]
+    assert migrate(engine) == []
+    with engine.connect() as conn:
+        assert current_version(conn) == LATEST
+
+    assert {"name_normalized"} <= {c["name"] for c in inspect(engine).get_columns("ingredients")}
+    assert "ingredient_vector" in {c["name"] for c in inspect(engine).get_columns("recipes")}
+    assert "seed" in {c["name"] for c in inspect(engine).get_columns("plans")}
+    assert "ix_ingredients_name_normalized" in _indexes(engine, "ingredients")
+    assert "ix_recipes_user_cuisine_name" in _indexes(engine, "recipes")
+    assert "ix_plans_user_id_id" in _indexes(engine, "plans")
+    assert "ix_grocery_items_plan_name" in _indexes(engine, "grocery_items")
+
+    db = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        assert {(i.id, i.name_normalized) for i in db.query(Ingredient)} == {(1, "salt"), (3, "pepper")}
+        links = {(l.recipe_id, l.ingredient_id, l.quantity) for l in db.query(RecipeIngredient)}
+        assert links == {(1, 1, 1.0), (1, 3, 1.0), (2, 1, 3.0)}
+        # Upgraded rows work with the current code: vectors backfill, seeds persist
+        plan = create_plan(db, 1, 2, {}, seed=5)
+        assert db.get(Plan, plan.id).seed == 5 and len(plan.groceries) == 2
+    finally:
+        db.close()
+
+
+def test_fresh_database_gets_full_schema_and_latest_version(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/fresh.db")
+    assert migrate(engine) == ["create_all"]
+    with engine.connect() as conn:
+        assert current_version(conn) == LATEST
+    assert set(Base.metadata.tables) <= set(inspect(engine).get_table_names())
+    assert "ix_grocery_items_plan_name" in _indexes(engine, "grocery_items")
+    assert migrate(engine) == []
+
+
+def test_importing_the_app_does_not_touch_the_schema(tmp_path):
+    db_file = tmp_path / "untouched.db"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_file}"}
+    proc = subprocess.run([sys.executable, "-c", "import app.main"], env=env, capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    assert not db_file.exists() or not inspect(make_engine(f"sqlite:///{db_file}")).get_table_names()
+
+
+@pytest.mark.asyncio
+async def test_app_startup_runs_pending_migrations(monkeypatch, tmp_path):
+    from app import main
+    engine = make_engine(f"sqlite:///{tmp_path}/boot.db")
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "AUTO_MIGRATE", True)
+    async with main.lifespan(main.app):
+        with engine.connect() as conn:
+            assert current_version(conn) == LATEST
@@ -0,0 +1,89 @@
+import json
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app import plan_view as pv
+from app.batch import PlanJob, generate_plans
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.models import Plan, Recipe, User
+
+@pytest.fixture(autouse=True)
+def _reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+async def _setup(ac, n=8):
+    await ac.post("/auth/register", json={"email": "v@example.com", "password": "SuperSecret1"})
+    ac.cookies = (await ac.post("/auth/login", json={"email": "v@example.com", "password": "SuperSecret1"})).cookies
+    for i in range(n):
+        await ac.post("/recipes", json={"name": f"Dish {i}", "cuisine": "Any", "notes": "",
+                                        "items": [{"ingredient_name": f"Item {i}", "quantity": 1, "unit": "g"},
+                                                  {"ingredient_name": "Salt", "quantity": 1, "unit": "g"}]})
+
+def _rebuilt(pid):
+    db = SessionLocal()
+    try:
+        return pv.build_plan_view(pv.load_plan(db, db.get(Plan, pid).user_id, pid))
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_plan_read_is_one_lookup_and_snapshot_tracks_writes(count_queries):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await _setup(ac)
+        pid = (await ac.post("/plans", json={"days": 5})).json()["id"]
+        with count_queries() as q:
+            plan = (await ac.get(f"/plans/{pid}")).json()
+        assert len(q.statements) == 1 and q.selects
+        assert plan == _rebuilt(pid)
+
+        salt = next(g for g in plan["groceries"] if g["name"] == "Salt")
+        await ac.post(f"/grocery/{salt['id']}/toggle")
+        await ac.post(f"/plans/{pid}/reroll", json={"day_indexes": [0]})
+        await ac.patch(f"/recipes/{plan['recipes'][1]['id']}", json={"name": "Renamed", "cuisine": "Other", "notes": "", "items": []})
+        with count_queries() as q:
+            plan = (await ac.get(f"/plans/{pid}")).json()
+        assert len(q.statements) == 1
+        assert plan == _rebuilt(pid)
+        assert next(g for g in plan["groceries"] if g["name"] == "Salt")["checked"] is True
+        assert plan["recipes"][1]["name"] == "Renamed"
+
+        await ac.delete(f"/recipes/{plan['recipes'][2]['id']}")
+        assert (await ac.get(f"/plans/{pid}")).json() == _rebuilt(pid)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("days", [1, 7])
+async def test_loader_query_count_does_not_grow_with_days(monkeypatch, count_queries, days):
+    monkeypatch.setattr(pv, "PLAN_SNAPSHOTS", False)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await _setup(ac)
+        pid = (await ac.post("/plans", json={"days": days})).json()["id"]
+        with count_queries() as q:
+            plan = (await ac.get(f"/plans/{pid}")).json()
+    # version stamps, then plan + days + recipes in one joined query and grocery lines in one more
+    assert len(q.statements) == 3, q.statements
+    assert len(plan["recipes"]) == days and all(r["name"] for r in plan["recipes"])
+
+def test_batch_plans_get_snapshots_and_legacy_ones_are_built_once(count_queries):
+    db = SessionLocal()
+    try:
+        db.add(User(email="b@example.com", password_hash="x")); db.flush()
+        uid = db.query(User.id).scalar()
+        for i in range(3):
+            db.add(Recipe(user_id=uid, name=f"R{i}", cuisine="Any", notes=""))
+        db.commit()
+        results, _ = generate_plans(db, [PlanJob(uid, 3), PlanJob(uid, 2)], workers=0)
+        for r in results:
+            assert json.loads(db.get(Plan, r.plan_id).snapshot) == _rebuilt(r.plan_id)
+        # Plans from before the snapshot migration have none yet
+        db.query(Plan).update({Plan.snapshot: None}); db.commit()
+
+        view = pv.plan_view(db, uid)
+        assert view["days"] == 2 and view == _rebuilt(view["id"])
+        with count_queries() as q:
+            assert pv.plan_view(db, uid) == view
+        assert len(q.statements) == 1
+        assert pv.plan_view(db, uid + 1) is None
+    finally:
+        db.close()
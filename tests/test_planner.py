@@ -0,0 +1,255 @@
+import random
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pytest
+from app.database import Base, engine, SessionLocal
+from app.models import User, Recipe, Ingredient, RecipeIngredient, GroceryItem
+from app.planner import create_plan, refresh_recipe_vectors, sample_week
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _seed(db, n_recipes, n_items=3):
+    u = User(email="planner@example.com", password_hash="x")
+    db.add(u); db.flush()
+    ings = [Ingredient(name=f"Ingredient {i}") for i in range(n_items * 2)]
+    db.add_all(ings); db.flush()
+    for i in range(n_recipes):
+        r = Recipe(user_id=u.id, name=f"Recipe {i}", cuisine=["Mexican", "Asian", "Italian"][i % 3], notes="")
+        db.add(r); db.flush()
+        for j in range(n_items):
+            db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ings[(i + j) % len(ings)].id, quantity=1.0, unit="Cup "))
+    db.flush()
+    refresh_recipe_vectors(db, [r.id for r in db.query(Recipe.id).filter(Recipe.user_id == u.id)])
+    db.commit()
+    return u.id
+
+
+def _feasible(recipes, caps, days):
+    counts = defaultdict(int)
+    for r in recipes:
+        counts[r.cuisine] += 1
+    return min(days, sum(min(n, caps[c]) if c in caps else n for c, n in counts.items()))
+
+
+def test_sample_week_properties_on_random_inputs():
+    rng = random.Random(7)
+    for _ in range(300):
+        cuisines = ["A", "B", "C", "D"][: rng.randint(1, 4)]
+        recipes = [SimpleNamespace(id=i, cuisine=rng.choice(cuisines)) for i in range(rng.randint(0, 40))]
+        caps = {c: rng.randint(0, 4) for c in rng.sample(cuisines, rng.randint(0, len(cuisines)))}
+        days = rng.randint(1, 14)
+        avoid = {r.id for r in recipes if rng.random() < 0.3}
+        seed = rng.getrandbits(31)
+        chosen = sample_week(recipes, days, caps, random.Random(seed), avoid=avoid)
+        ids = [r.id for r in chosen]
+        assert len(ids) == len(set(ids)) == _feasible(recipes, caps, days)
+        for c, cap in caps.items():
+            assert sum(r.cuisine == c for r in chosen) <= cap
+        # avoided recipes only appear once the rest can't fill the week
+        rest = [r for r in recipes if r.id not in avoid]
+        if _feasible(rest, caps, days) == len(ids):
+            assert not set(ids) & avoid
+        assert [r.id for r in sample_week(recipes, days, caps, random.Random(seed), avoid=avoid)] == ids
+
+
+def test_sample_week_follows_weights():
+    recipes = [SimpleNamespace(id=i, cuisine="A") for i in range(3)]
+    rng = random.Random(1)
+    firsts = defaultdict(int)
+    for _ in range(6000):
+        firsts[sample_week(recipes, 1, {}, rng, weights={0: 1.0, 1: 3.0, 2: 0})[0].id] += 1
+    assert firsts[2] == 0
+    assert 0.70 < firsts[1] / 6000 < 0.80
+
+
+def test_sample_week_infeasible_caps_return_quickly():
+    recipes = [SimpleNamespace(id=i, cuisine="A") for i in range(100_000)]
+    assert sample_week(recipes, 7, {"A": 0}, random.Random(0)) == []
+    assert len(sample_week(recipes, 7, {"A": 3}, random.Random(0))) == 3
+
+
+def test_create_plan_replays_seed_and_avoids_recent_plans(db):
+    from app.models import Plan, PlanRecipe
+    uid = _seed(db, 21)
+    days = lambda pid: [pr.recipe_id for pr in db.query(PlanRecipe).filter(PlanRecipe.plan_id == pid).order_by(PlanRecipe.day_index)]
+    first = create_plan(db, uid, 7, {}, avoid_recent=0)
+    assert first.seed is not None
+    second = create_plan(db, uid, 7, {}, avoid_recent=1)
+    third = create_plan(db, uid, 7, {}, avoid_recent=2)
+    assert len(set(days(first.id) + days(second.id) + days(third.id))) == 21
+    replay = create_plan(db, uid, 7, {}, seed=first.seed, avoid_recent=0)
+    assert db.get(Plan, replay.id).seed == first.seed and days(replay.id) == days(first.id)
+
+
+@pytest.mark.parametrize("n_recipes", [5, 50])
+def test_create_plan_select_count_is_constant(db, count_queries, n_recipes):
+    uid = _seed(db, n_recipes)
+    with count_queries() as q:
+        plan = create_plan(db, uid, 7, {"Mexican": 2})
+    # caps are overridden: recipe rows, recent plans' recipes, ingredient vectors, the plan view
+    # for its snapshot (plan + days + recipes, groceries) and the refresh, which reuses those loaders
+    assert len(q.selects) == 7, q.selects
+    groceries = db.query(GroceryItem).filter(GroceryItem.plan_id == plan.id).all()
+    assert groceries and all(g.unit == "cup" for g in groceries)
+    assert sum(g.quantity for g in groceries) == 3 * min(7, n_recipes)
+
+
+def test_create_plan_writes_children_in_bulk(db, count_queries):
+    uid = _seed(db, 30, n_items=6)
+    with count_queries() as q:
+        plan = create_plan(db, uid, 14, {})
+    # one INSERT for the plan, one executemany per child table
+    assert len(q.of("INSERT")) == 3, q.of("INSERT")
+    assert plan.id and len(plan.plan_recipes) == 14
+    assert [pr.day_index for pr in sorted(plan.plan_recipes, key=lambda p: p.day_index)] == list(range(14))
+    assert len(plan.groceries) == 12
+
+
+def _groceries(db, plan_id):
+    db.expire_all()
+    return {(g.name, g.unit): (g.quantity, g.checked) for g in db.query(GroceryItem).filter(GroceryItem.plan_id == plan_id)}
+
+
+def _rebuilt(db, plan_id):
+    from app.models import PlanRecipe
+    from app.planner import aggregate_groceries
+    from app.queries import ingredient_lines_for_recipes
+    ids = [pr.recipe_id for pr in db.query(PlanRecipe).filter(PlanRecipe.plan_id == plan_id).order_by(PlanRecipe.day_index)]
+    lines = ingredient_lines_for_recipes(db, ids)
+    return {(m["name"], m["unit"]): round(m["quantity"], 2) for m in aggregate_groceries(lines[i] for i in ids).values()}
+
+
+def test_swap_day_applies_grocery_delta_and_keeps_checked(db, count_queries):
+    from app.planner import swap_day
+    uid = _seed(db, 6)
+    plan = create_plan(db, uid, 3, {})
+    pid = plan.id
+    for day in range(3):
+        swap_day(db, uid, pid, day, day + 1)
+    items = db.query(GroceryItem).filter(GroceryItem.plan_id == pid).all()
+    for g in items:
+        g.checked = 1
+    db.commit()
+
+    # Days hold recipes 1-3 (ingredients 0-2, 1-3, 2-4). Recipe 6 uses 5, 0, 1, so swapping
+    # day 0 only moves Ingredient 2 down and adds Ingredient 5.
+    with count_queries() as q:
+        swap_day(db, uid, pid, 0, 6)
+    assert len(q.of("INSERT")) == 1 and len(q.of("UPDATE")) == 3 and not q.of("DELETE")  # incl. the snapshot
+
+    after = _groceries(db, pid)
+    assert {k: v[0] for k, v in after.items()} == _rebuilt(db, pid)
+    assert after[("Ingredient 0", "cup")] == (1.0, 1)
+    assert after[("Ingredient 1", "cup")] == (2.0, 1)
+    assert after[("Ingredient 2", "cup")] == (2.0, 1)  # needs less: stays ticked
+    assert after[("Ingredient 5", "cup")] == (1.0, 0)
+
+    # Recipe 1 in place of recipe 3 drops the only use of Ingredient 4 and needs more of 0
+    swap_day(db, uid, pid, 2, 1)
+    after = _groceries(db, pid)
+    assert ("Ingredient 4", "cup") not in after
+    assert after[("Ingredient 0", "cup")] == (2.0, 0)  # needs more: unticked
+    assert {k: v[0] for k, v in after.items()} == _rebuilt(db, pid)
+
+
+def test_reroll_replaces_days_within_caps(db):
+    from app.models import PlanRecipe
+    from app.planner import reroll_days
+    uid = _seed(db, 12)
+    plan = create_plan(db, uid, 4, {"Mexican": 1})
+    pid = plan.id
+    before = [pr.recipe_id for pr in db.query(PlanRecipe).filter(PlanRecipe.plan_id == pid).order_by(PlanRecipe.day_index)]
+
+    changed = reroll_days(db, uid, pid, [1, 2], {"Mexican": 1})
+    assert changed == [1, 2]
+    rows = db.query(PlanRecipe).filter(PlanRecipe.plan_id == pid).order_by(PlanRecipe.day_index).all()
+    after = [pr.recipe_id for pr in rows]
+    assert after[0] == before[0] and after[3] == before[3]
+    assert not set(after[1:3]) & set(before)
+    cuisines = [db.get(Recipe, rid).cuisine for rid in after]
+    assert cuisines.count("Mexican") <= 1
+    assert {k: v[0] for k, v in _groceries(db, pid).items()} == _rebuilt(db, pid)
+
+
+def test_swaps_and_rerolls_match_a_full_rebuild(db):
+    from app.models import PlanRecipe
+    from app.planner import aggregate_groceries, reroll_days, swap_day
+    from app.queries import ingredient_lines_for_recipes
+    from app.units import convert, unit_group
+    rng = random.Random(7)
+    u = User(email="drift@example.com", password_hash="x")
+    db.add(u); db.flush()
+    ings = [Ingredient(name=f"Ingredient {i}") for i in range(8)]
+    db.add_all(ings); db.flush()
+    for i in range(20):
+        r = Recipe(user_id=u.id, name=f"Recipe {i}", cuisine="Any", notes="")
+        db.add(r); db.flush()
+        for ing in rng.sample(ings, 3):
+            db.add(RecipeIngredient(recipe_id=r.id, ingredient_id=ing.id, quantity=rng.choice([1 / 3, 0.1, 0.7, 2.25, 0.004]),
+                                    unit=rng.choice(["tsp", "tbsp", "cup", "ml"])))
+    db.flush()
+    refresh_recipe_vectors(db, [r.id for r in db.query(Recipe.id).filter(Recipe.user_id == u.id)])
+    db.commit()
+    pid = create_plan(db, u.id, 5, {}, seed=1).id
+
+    for step in range(40):
+        if step % 2:
+            swap_day(db, u.id, pid, rng.randrange(5), rng.randint(1, 20))
+        else:
+            reroll_days(db, u.id, pid, rng.sample(range(5), 2), {}, seed=step)
+        db.expire_all()
+        stored = {(g.name.lower(), unit_group(g.unit)): g for g in db.query(GroceryItem).filter(GroceryItem.plan_id == pid)}
+        ids = [pr.recipe_id for pr in db.query(PlanRecipe).filter(PlanRecipe.plan_id == pid)]
+        lines = ingredient_lines_for_recipes(db, ids)
+        rebuilt = aggregate_groceries(lines[i] for i in ids)
+        # Same lines (nothing lingering at zero) and the same amounts at full precision
+        assert set(stored) == set(rebuilt)
+        for key, meta in rebuilt.items():
+            g = stored[key]
+            assert convert(g.quantity, g.unit, meta["unit"]) == pytest.approx(meta["quantity"], rel=1e-9)
+
+
+def test_grocery_delta_spreads_over_legacy_rows_in_one_unit_group(db):
+    from app.planner import apply_grocery_delta
+    uid = _seed(db, 3)
+    pid = create_plan(db, uid, 1, {}).id
+    # Older plans kept one row per raw unit: 1 cup and 8 tbsp (half a cup) of the same thing
+    db.query(GroceryItem).filter(GroceryItem.plan_id == pid).delete()
+    db.add_all([GroceryItem(plan_id=pid, name="Flour", unit="cup", quantity=1.0, checked=1),
+                GroceryItem(plan_id=pid, name="Flour", unit="tbsp", quantity=8.0, checked=1)])
+    db.commit()
+    key = ("flour", "volume")
+    meta = {"name": "Flour", "unit": "cup"}
+
+    apply_grocery_delta(db, pid, {key: {**meta, "quantity": 1.25}}, {})
+    db.commit()
+    rows = db.query(GroceryItem).filter(GroceryItem.plan_id == pid).all()
+    assert [(g.unit, g.checked) for g in rows] == [("tbsp", 1)] and rows[0].quantity == pytest.approx(4.0)
+
+    apply_grocery_delta(db, pid, {}, {key: {**meta, "quantity": 0.25}})
+    apply_grocery_delta(db, pid, {key: {**meta, "quantity": 0.5}}, {})
+    db.commit()
+    assert db.query(GroceryItem).filter(GroceryItem.plan_id == pid).count() == 0
+
+def test_recipe_vectors_are_backfilled_for_legacy_rows(db):
+    from app.planner import load_recipe_vectors
+    uid = _seed(db, 3)
+    db.query(Recipe).update({Recipe.ingredient_vector: None}); db.commit()
+    vectors = load_recipe_vectors(db, [1, 2])
+    cup = 236.5882365
+    assert vectors[1] == [["ingredient 0", "Ingredient 0", "cup", 1.0, "volume", cup], ["ingredient 1", "Ingredient 1", "cup", 1.0, "volume", cup],
+                          ["ingredient 2", "Ingredient 2", "cup", 1.0, "volume", cup]]
+    db.commit()
+    assert db.get(Recipe, 2).ingredient_vector is not None
+    assert db.get(Recipe, 3).ingredient_vector is None
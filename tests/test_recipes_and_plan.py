@@ -1,7 +1,11 @@
+import json
 import pytest
 from httpx import AsyncClient, ASGITransport
 from app.main import app
-from app.database import Base, engine
+from app.database import Base, SessionLocal, engine
+from app.deps import Principal
+from app.models import Plan
+from app.web import plan_new
 
 @pytest.fixture(autouse=True)
 def _reset_db():
@@ -55,8 +59,10 @@ async def test_recipe_crud_and_plan_with_caps_and_toggle():
         # Shopping list aggregation checks (case-insensitive by ingredient, unit-aware)
         groceries = data["groceries"]
         names = { (g["name"].lower(), g["unit"]) : g for g in groceries }
-        # tortillas pcs should be summed: 10 + 8 = 18
-        assert names.get(("tortillas","pcs"))["quantity"] == 18
+        # tortillas pcs should be summed across whichever of Tacos (10) / Enchiladas (8) were picked
+        tortillas = {"Tacos": 10, "Enchiladas": 8}
+        picked = [x["name"] for x in data["recipes"] if x["name"] in tortillas]
+        assert picked and names.get(("tortillas","pcs"))["quantity"] == sum(tortillas[n] for n in picked)
         # if Mexican exceeded cap, Pozole might not be in plan, so don't assert hominy
 
         # Toggle a grocery item
@@ -69,3 +75,183 @@ async def test_recipe_crud_and_plan_with_caps_and_toggle():
         again = r.json()["groceries"]
         after = next(x for x in again if x["id"] == some_id)
         assert after["checked"] == True
+
+@pytest.mark.asyncio
+async def test_ingredients_resolved_case_insensitively_in_one_lookup(count_queries):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        cookies = await register_and_login(ac)
+        items = [{"ingredient_name": f"Spice {i}", "quantity": 1, "unit": "tsp"} for i in range(20)]
+        r = await ac.post("/recipes", cookies=cookies, json={"name": "Rub", "cuisine": "BBQ", "items": items})
+        assert r.status_code == 200
+        rid = r.json()["id"]
+
+        renamed = [{**it, "ingredient_name": f"  SPICE {i} "} for i, it in enumerate(items)]
+        renamed.append({"ingredient_name": "Salt", "quantity": 1, "unit": "tsp"})
+        with count_queries() as q:
+            r = await ac.patch(f"/recipes/{rid}", cookies=cookies, json={"name": "Rub", "cuisine": "BBQ", "items": renamed})
+        assert r.status_code == 200
+        lookups = [s for s in q.selects if "FROM ingredients" in s]
+        # one lookup for all names, one re-read for the single new ingredient
+        assert len(lookups) == 2, lookups
+
+        r = await ac.get("/recipes", cookies=cookies)
+        names = sorted(it["ingredient_name"] for it in r.json()[0]["items"])
+        assert names == sorted([f"Spice {i}" for i in range(20)] + ["Salt"])
+
+@pytest.mark.asyncio
+async def test_bulk_import_ndjson_reports_row_errors_and_export_round_trips(monkeypatch):
+    from app.routers import recipes as recipes_router
+    monkeypatch.setattr(recipes_router, "BULK_CHUNK_SIZE", 3)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        cookies = await register_and_login(ac)
+        r = await ac.post("/recipes", cookies=cookies, json={"name": "Tacos", "cuisine": "Mexican", "items": []})
+        assert r.status_code == 200
+
+        rows = [
+            {"name": f"Dish {i}", "cuisine": "Test", "items": [{"ingredient_name": "Rice", "quantity": i, "unit": "cup"}]}
+            for i in range(7)
+        ]
+        lines = [json.dumps(x) for x in rows]
+        lines.insert(2, "{not json")
+        lines.insert(4, json.dumps({"name": "Tacos", "cuisine": "Mexican"}))
+        lines.insert(5, json.dumps({"cuisine": "Nameless"}))
+        lines.append(json.dumps(rows[0]))
+        body = ("\n".join(lines) + "\n").encode()
+
+        r = await ac.post("/recipes/bulk", cookies=cookies, content=body, headers={"content-type": "application/x-ndjson"})
+        assert r.status_code == 200
+        out = r.json()
+        assert out["created"] == 7
+        assert [e["row"] for e in out["errors"]] == [3, 5, 6, 11]
+        assert "already exists" in out["errors"][1]["error"]
+        assert "name" in out["errors"][2]["error"]
+
+        r = await ac.post("/recipes/bulk", cookies=cookies, json=[{"name": "Soup", "cuisine": "Any"}])
+        assert r.json() == {"created": 1, "errors": []}
+
+        r = await ac.get("/recipes/export", cookies=cookies)
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        exported = [json.loads(line) for line in r.text.splitlines()]
+        assert len(exported) == 9
+        dish3 = next(x for x in exported if x["name"] == "Dish 3")
+        assert dish3["items"] == [{"ingredient_name": "Rice", "quantity": 3.0, "unit": "cup"}]
+
+@pytest.mark.asyncio
+async def test_list_recipes_keyset_pagination_filters_and_fields(count_queries):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        cookies = await register_and_login(ac)
+        rows = [{"name": n, "cuisine": c, "items": [{"ingredient_name": "Salt", "quantity": 1, "unit": "tsp"}]}
+                for n, c in [("Bibimbap", "Asian"), ("Arepas", "Latin"), ("Burrito", "Mexican"),
+                             ("Adobo", "Asian"), ("Birria", "Mexican"), ("Congee", "Asian")]]
+        r = await ac.post("/recipes/bulk", cookies=cookies, json=rows)
+        assert r.json()["created"] == 6
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+            r = await ac.get("/recipes", cookies=cookies, params=params)
+            assert r.status_code == 200
+            seen += [x["name"] for x in r.json()]
+            cursor = r.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        assert seen == ["Adobo", "Arepas", "Bibimbap", "Birria", "Burrito", "Congee"]
+
+        r = await ac.get("/recipes", cookies=cookies, params={"cuisine": "Asian", "limit": 1})
+        assert [x["name"] for x in r.json()] == ["Adobo"]
+        r = await ac.get("/recipes", cookies=cookies, params={"cuisine": "Asian", "cursor": r.headers["x-next-cursor"]})
+        assert [x["name"] for x in r.json()] == ["Bibimbap", "Congee"]
+
+        r = await ac.get("/recipes", cookies=cookies, params={"prefix": "Bi"})
+        assert [x["name"] for x in r.json()] == ["Bibimbap", "Birria"]
+
+        with count_queries() as q:
+            r = await ac.get("/recipes", cookies=cookies, params={"fields": "id,name"})
+        assert all(set(x) == {"id", "name"} for x in r.json())
+        assert not [s for s in q.selects if "recipe_ingredients" in s]
+
+        r = await ac.get("/recipes", cookies=cookies, params={"fields": "id,password"})
+        assert r.status_code == 400
+        r = await ac.get("/recipes", cookies=cookies, params={"cursor": "garbage"})
+        assert r.status_code == 400
+
+@pytest.mark.asyncio
+async def test_plan_swap_and_reroll_endpoints_keep_untouched_checks():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        cookies = await register_and_login(ac)
+        rows = [{"name": f"Dish {i}", "cuisine": "Any",
+                 "items": [{"ingredient_name": "Salt", "quantity": 1, "unit": "tsp"},
+                           {"ingredient_name": f"Special {i}", "quantity": 1, "unit": ""}]} for i in range(6)]
+        await ac.post("/recipes/bulk", cookies=cookies, json=rows)
+        created = (await ac.post("/plans", cookies=cookies, json={"days": 3})).json()
+        pid = created["id"]
+        plan = (await ac.get(f"/plans/{pid}", cookies=cookies)).json()
+        salt = next(g for g in plan["groceries"] if g["name"] == "Salt")
+        await ac.post(f"/grocery/{salt['id']}/toggle", cookies=cookies)
+
+        before = [x["name"] for x in plan["recipes"]]
+        r = await ac.post(f"/plans/{pid}/reroll", cookies=cookies, json={"day_indexes": [0, 2]})
+        assert r.json()["changed"] == [0, 2]
+        plan = (await ac.get(f"/plans/{pid}", cookies=cookies)).json()
+        names = [x["name"] for x in plan["recipes"]]
+        assert names[1] == before[1] and not {names[0], names[2]} & set(before)
+        # The reroll seed is only reported; the plan keeps the seed it was generated from
+        assert plan["seed"] == created["seed"] != r.json()["seed"]
+        salt_after = next(g for g in plan["groceries"] if g["name"] == "Salt")
+        assert salt_after == {**salt, "checked": True}
+        assert sorted(g["name"] for g in plan["groceries"]) == sorted(["Salt"] + [n.replace("Dish", "Special") for n in names])
+
+        spare = next(i for i in range(6) if f"Dish {i}" not in names)
+        recipe_id = plan["recipes"][0]["id"] - int(names[0].split()[1]) + spare
+        r = await ac.put(f"/plans/{pid}/days/1", cookies=cookies, json={"recipe_id": recipe_id})
+        assert r.status_code == 200
+        plan = (await ac.get(f"/plans/{pid}", cookies=cookies)).json()
+        assert plan["recipes"][1]["name"] == f"Dish {spare}"
+
+        assert (await ac.put(f"/plans/{pid}/days/7", cookies=cookies, json={"recipe_id": 1})).status_code == 400
+        assert (await ac.post(f"/plans/{pid + 1}/reroll", cookies=cookies, json={})).status_code == 404
+
+@pytest.mark.asyncio
+async def test_plan_endpoints_apply_recipe_weights_and_bound_seeds():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        cookies = await register_and_login(ac)
+        ids = [(await ac.post("/recipes", cookies=cookies, json={"name": f"Dish {i}", "cuisine": "Any", "notes": "", "items": []})).json()["id"]
+               for i in range(8)]
+        # Weight 0 keeps a recipe out of the draw entirely
+        weights = {str(rid): (5.0 if rid in ids[:3] else 0) for rid in ids}
+
+        pid = (await ac.post("/plans", cookies=cookies, json={"days": 5, "recipe_weights": weights})).json()["id"]
+        plan = (await ac.get(f"/plans/{pid}", cookies=cookies)).json()
+        assert sorted(x["id"] for x in plan["recipes"]) == ids[:3]
+
+        r = await ac.post(f"/plans/{pid}/reroll", cookies=cookies, json={"recipe_weights": {**weights, str(ids[3]): 1}})
+        plan = (await ac.get(f"/plans/{pid}", cookies=cookies)).json()
+        assert r.status_code == 200 and set(x["id"] for x in plan["recipes"]) <= set(ids[:4])
+
+        r = await ac.post("/plans/batch", cookies=cookies, json={"count": 2, "days": 2, "recipe_weights": weights})
+        for p in r.json()["plans"]:
+            assert {x["id"] for x in (await ac.get(f"/plans/{p['id']}", cookies=cookies)).json()["recipes"]} <= set(ids[:3])
+
+        # Seeds must fit Plan.seed's signed 64-bit column; weights must be finite and non-negative
+        for path, body in [("/plans", {"seed": 2**63}), ("/plans", {"seed": -1}), ("/plans/batch", {"seeds": [1, 2**64]}),
+                           (f"/plans/{pid}/reroll", {"seed": 2**63}), ("/plans", {"recipe_weights": {str(ids[0]): -1}})]:
+            assert (await ac.post(path, cookies=cookies, json=body)).status_code == 422, (path, body)
+        assert (await ac.post("/plans", cookies=cookies, json={"seed": 2**63 - 1})).json()["seed"] == 2**63 - 1
+
+@pytest.mark.asyncio
+async def test_web_plan_new_with_other_length_keeps_earlier_plans():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        cookies = await register_and_login(ac)
+        for i in range(4):
+            await ac.post("/recipes", cookies=cookies, json={"name": f"Dish {i}", "cuisine": "Any", "notes": "", "items": []})
+        first = (await ac.post("/plans", cookies=cookies, json={"days": 2})).json()["id"]
+    with SessionLocal() as db:
+        r = plan_new(days=3, user=Principal(1, "me@example.com"), db=db)
+        assert r.status_code == 303
+        plans = db.query(Plan).order_by(Plan.id).all()
+        assert [(p.id, p.days) for p in plans] == [(first, 2), (first + 1, 3)]
@@ -0,0 +1,88 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app import cli
+from app.main import app
+from app.database import Base, SessionLocal, engine
+from app.search import search_recipes, search_recipes_like, search_terms
+
+@pytest.fixture(autouse=True)
+def _reset_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+async def _login(ac, email):
+    await ac.post("/auth/register", json={"email": email, "password": "SuperSecret1"})
+    return (await ac.post("/auth/login", json={"email": email, "password": "SuperSecret1"})).cookies
+
+def _recipe(name, cuisine="Any", notes="", ingredients=()):
+    return {"name": name, "cuisine": cuisine, "notes": notes,
+            "items": [{"ingredient_name": i, "quantity": 1, "unit": "pcs"} for i in ingredients]}
+
+@pytest.mark.asyncio
+async def test_search_ranks_fields_matches_ingredients_and_stays_per_user():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        mine = ac.cookies = await _login(ac, "a@example.com")
+        await ac.post("/recipes", json=_recipe("Weeknight stew", notes="good with a curry paste on top"))
+        await ac.post("/recipes", json=_recipe("Chickpea curry", "Indian", ingredients=["Chickpeas", "Spinach"]))
+        await ac.post("/recipes", json=_recipe("Green salad", ingredients=["Spinach", "Crème fraîche"]))
+        other = await _login(ac, "b@example.com")
+        await ac.post("/recipes", cookies=other, json=_recipe("Curry night", ingredients=["Chickpeas"]))
+        ac.cookies = mine
+
+        names = lambda r: [x["name"] for x in r.json()]
+        # A name match outranks a notes match; other users' recipes never show up
+        assert names(await ac.get("/recipes/search", params={"q": "curry"})) == ["Chickpea curry", "Weeknight stew"]
+        # Prefix terms, ingredient names, diacritics folded, every term required
+        assert names(await ac.get("/recipes/search", params={"q": "chick"})) == ["Chickpea curry"]
+        assert names(await ac.get("/recipes/search", params={"q": "spinach creme"})) == ["Green salad"]
+        # FTS5 syntax in the query is treated as plain words
+        assert names(await ac.get("/recipes/search", params={"q": 'owner:u2 OR "curry'})) == []
+        assert (await ac.get("/recipes/search", params={"q": " -*- "})).json() == []
+        # Terms never match the owner token
+        assert names(await ac.get("/recipes/search", params={"q": "u"})) == []
+        assert names(await ac.get("/recipes/search", params={"q": "u1"})) == []
+        assert names(await ac.get("/recipes/search", params={"q": "u1 curry"})) == []
+        r = await ac.get("/recipes/search", params={"q": "curry"}, cookies=other)
+        assert names(r) == ["Curry night"] and set(r.json()[0]) == {"id", "name", "cuisine", "notes"}
+
+@pytest.mark.asyncio
+async def test_search_pages_and_follows_writes():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        ac.cookies = await _login(ac, "a@example.com")
+        ids = [(await ac.post("/recipes", json=_recipe(f"Soup {i}", notes="soup " * (i % 3)))).json()["id"] for i in range(7)]
+
+        seen, cursor = [], None
+        while True:
+            r = await ac.get("/recipes/search", params={"q": "soup", "limit": 3, **({"cursor": cursor} if cursor else {})})
+            seen += [x["id"] for x in r.json()]
+            cursor = r.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        assert sorted(seen) == ids and len(seen) == 7
+        assert (await ac.get("/recipes/search", params={"q": "soup", "cursor": "nope"})).status_code == 400
+
+        await ac.patch(f"/recipes/{ids[0]}", json=_recipe("Leek broth", ingredients=["Leek"]))
+        await ac.delete(f"/recipes/{ids[1]}")
+        r = await ac.get("/recipes/search", params={"q": "soup", "limit": 50})
+        assert sorted(x["id"] for x in r.json()) == ids[2:]
+        assert [x["id"] for x in (await ac.get("/recipes/search", params={"q": "leek"})).json()] == [ids[0]]
+
+        # The bulk import path indexes its rows too
+        await ac.post("/recipes/bulk", content='{"name": "Miso soup", "cuisine": "Japanese", "notes": "", "items": []}\n',
+                      headers={"content-type": "application/x-ndjson"})
+        assert [x["name"] for x in (await ac.get("/recipes/search", params={"q": "miso"})).json()] == ["Miso soup"]
+
+def test_rebuild_command_and_like_fallback_agree(capsys):
+    assert cli.main(["seed", "--users", "2", "--recipes", "30", "--ingredients", "40", "--items", "3"]) == 0
+    capsys.readouterr()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM recipe_search")
+    assert cli.main(["rebuild-search"]) == 0
+    assert '"indexed": 60' in capsys.readouterr().out
+
+    with SessionLocal() as db:
+        fts, _ = search_recipes(db, 1, "synthetic 7", 100)
+        like, _ = search_recipes_like(db, 1, search_terms("synthetic 7"), 100)
+    # Token prefixes vs substrings: "7" also hits "17" and "27" under LIKE
+    assert fts and {r.id for r in fts} < {r.id for r in like}
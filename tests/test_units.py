@@ -0,0 +1,40 @@
+import pytest
+from app.planner import aggregate_groceries, build_vector, merge_vectors
+from app.queries import IngredientLine
+from app.units import convert, lookup, normalize_unit, unit_group
+
+def test_aliases_resolve_to_canonical_units():
+    assert normalize_unit("Tablespoons") == normalize_unit("tbsp") == normalize_unit("Tbs.") == "tbsp"
+    assert normalize_unit(" LBS ") == "lb"
+    assert normalize_unit("Fl. Oz") == "fl oz"
+    assert normalize_unit("Cans") == "cans"  # unknown units are kept
+    assert unit_group("") == "" and lookup("") is None
+
+def test_convert_within_a_dimension_only():
+    assert convert(16, "oz", "lb") == pytest.approx(1.0)
+    assert convert(3, "tsp", "tbsp") == pytest.approx(1.0)
+    assert convert(1, "dozen", "pcs") == 12
+    with pytest.raises(ValueError):
+        convert(1, "cup", "g")
+
+def test_aggregation_merges_convertible_quantities():
+    lines = [
+        [IngredientLine("Beef", 1, "lb"), IngredientLine("Soy Sauce", 2, "tablespoons")],
+        [IngredientLine("beef", 16, "oz"), IngredientLine("Soy Sauce", 1, "tbsp"), IngredientLine("Beef", 1, "cup")],
+    ]
+    agg = aggregate_groceries(lines)
+    assert agg[("beef", "mass")] == {"name": "Beef", "unit": "lb", "quantity": pytest.approx(2.0)}
+    assert agg[("soy sauce", "volume")]["quantity"] == 3 and agg[("soy sauce", "volume")]["unit"] == "tbsp"
+    assert agg[("beef", "volume")]["unit"] == "cup"
+    merged = merge_vectors(build_vector(x) for x in lines)
+    assert {k: (v["unit"], pytest.approx(v["quantity"])) for k, v in merged.items()} == \
+           {k: (v["unit"], v["quantity"]) for k, v in agg.items()}
+
+def test_vector_merge_does_not_consult_the_registry(monkeypatch):
+    from app import units
+    vectors = [build_vector([IngredientLine("Beef", 1, "lb"), IngredientLine("Rice", 1, "cup")]),
+               build_vector([IngredientLine("beef", 8, "oz"), IngredientLine("Rice", 100, "ml")])]
+    monkeypatch.setattr(units, "lookup", lambda unit: pytest.fail(f"registry lookup for {unit!r}"))
+    merged = merge_vectors(vectors)
+    assert merged[("beef", "mass")]["quantity"] == pytest.approx(1.5)
+    assert merged[("rice", "volume")]["quantity"] == pytest.approx(1 + 100 / 236.5882365)